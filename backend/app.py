@@ -1,25 +1,53 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
-import uuid
 import atexit
+import logging
+import time
 import re
+import gzip
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+from typing import Dict
 
-# Import database with error handling
+# Import database with error handling; the connection itself is opened
+# lazily on first use in each worker process
 try:
-    from database.mongodb import db
+    from database.mongodb import db, current_operation, InsufficientStock, OrderPlacementConflict
     print("✅ Database module imported")
 except Exception as e:
     print(f"⚠️ Database import failed: {e}")
     print("🔄 Running in test mode without database")
     db = None
 
+from services.payments import PaymentEngine, SimulatedGateway
+from services.passwords import PasswordService, PasswordServiceBusy
+from services.rate_limit import RateLimiter, RateLimitExceeded, parse_rate
+from services.logs import configure_logging, get_logger, log_event, new_request_id
+from services.quotes import QuoteEngine
+from services.orders import OrderValidator, OrderValidationError
+from services.bulk_orders import NDJSON_MIMETYPE, OrderImporter, read_ndjson, to_ndjson
+from services import metrics
+
 app = Flask(__name__)
 
+# JSON lines through a background queue; LOG_LEVEL=WARNING silences the
+# per-request events
+log_handler = configure_logging()
+logger = get_logger('api')
+LOG_REQUEST_SAMPLE_RATE = float(os.environ.get('LOG_REQUEST_SAMPLE_RATE', 1.0))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+
+# Per-route request metrics and MongoDB command timings for /api/metrics
+metrics.instrument_app(app)
+if db:
+    metrics.register_mongo_listener(current_operation)
+
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-string')
@@ -33,18 +61,247 @@ bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
 CORS(app, origins=["*"])  # Allow all origins for now, restrict in production
 
+# Payments are charged on a background executor so request threads never
+# wait on gateway latency
+PAYMENT_MAX_WAIT_SECONDS = float(os.environ.get('PAYMENT_MAX_WAIT_SECONDS', 25))
+payment_engine = PaymentEngine(
+    SimulatedGateway(),
+    store=lambda: db.payments if db else None
+)
+
+# Password hashing runs on a bounded process pool so login storms cannot
+# starve the other endpoints
+password_service = PasswordService()
+
+# Cut-glass prices are quoted on the server; the price table follows the
+# catalog version so it is rebuilt only when products change
+quote_engine = QuoteEngine(
+    catalog=lambda: db.products.find_all_products(),
+    version=lambda: db.products.catalog_version()
+)
+order_validator = OrderValidator(quotes=quote_engine)
+
+# Bulk import/export for the ERP sync, authorized with ADMIN_API_TOKEN.
+# Imported prices come from the ERP, so they are not checked against quotes.
+# ERP totals include their own discounts and charges, so only the items are checked
+order_importer = OrderImporter(
+    OrderValidator(check_total=False),
+    lambda orders, normalized: db.orders.create_orders(orders, normalized=normalized)
+)
+ORDER_EXPORT_BATCH_SIZE = int(os.environ.get('ORDER_EXPORT_BATCH_SIZE', 500))
+
+# Login and registration attempts are throttled per client IP and per email
+# before any database or hashing work. RATE_LIMIT_BACKEND=mongodb shares the
+# counters between workers; the default keeps them in each process.
+AUTH_RATE_LIMITS = {
+    'login': {
+        'ip': parse_rate(os.environ.get('LOGIN_RATE_LIMIT_PER_IP', '30/60')),
+        'email': parse_rate(os.environ.get('LOGIN_RATE_LIMIT_PER_EMAIL', '5/60'))
+    },
+    'register': {
+        'ip': parse_rate(os.environ.get('REGISTER_RATE_LIMIT_PER_IP', '10/3600')),
+        'email': parse_rate(os.environ.get('REGISTER_RATE_LIMIT_PER_EMAIL', '3/3600'))
+    }
+}
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+auth_rate_limiter = RateLimiter(
+    backend=lambda: db.rate_limits if db and RATE_LIMIT_BACKEND == 'mongodb' else None,
+    enabled=os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+)
+
+def collect_service_metrics():
+    """Copy cache and password pool statistics into the metrics registry"""
+    if db and db.connected:
+        user_cache = db.users.cache_stats()
+        metrics.cache_hits.set_total(user_cache['hits'], cache='users')
+        metrics.cache_misses.set_total(user_cache['misses'], cache='users')
+        stock_levels = db.products.stock.levels.stats()
+        metrics.cache_hits.set_total(stock_levels['hits'], cache='stock_levels')
+        metrics.cache_misses.set_total(stock_levels['misses'], cache='stock_levels')
+    passwords = password_service.stats()
+    password_jobs_in_flight.set(passwords['in_flight'])
+    password_jobs_rejected.set_total(passwords['rejected'])
+
+password_jobs_in_flight = metrics.registry.gauge(
+    'edgecraft_password_jobs_in_flight', 'Password hash/verify jobs running or queued')
+password_jobs_rejected = metrics.registry.counter(
+    'edgecraft_password_jobs_rejected_total', 'Password jobs rejected because the pool was saturated')
+metrics.registry.add_collector(collect_service_metrics)
+
 # Ensure database connection is closed when the server process exits
 if db:
     atexit.register(db.close)
+atexit.register(payment_engine.shutdown, wait=False)
+atexit.register(password_service.shutdown, wait=False)
+atexit.register(log_handler.stop)
+
+@app.before_request
+def assign_request_id():
+    g.request_id = new_request_id()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def log_request(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+        log_event(
+            logger, logging.INFO, 'request', sample_rate=LOG_REQUEST_SAMPLE_RATE,
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            duration_ms=round((time.perf_counter() - g.request_started) * 1000, 2)
+        )
+    return response
 
 # Helper functions
 def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    return generate_password_hash(password)
+    """Hash password with the configured PBKDF2 work factor"""
+    return password_service.hash(password)
 
 def check_password(password: str, password_hash: str) -> bool:
     """Check password against hash"""
-    return check_password_hash(password_hash, password)
+    return password_service.verify(password, password_hash)
+
+def client_ip() -> str:
+    """Client address, taken from X-Forwarded-For when behind trusted proxies"""
+    if TRUSTED_PROXY_COUNT:
+        forwarded = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_COUNT:
+            return forwarded[-TRUSTED_PROXY_COUNT]
+    return request.remote_addr or 'unknown'
+
+def check_auth_rate_limit(action: str, email: str) -> None:
+    """Raise RateLimitExceeded when the client or the email is over its limit"""
+    limits = AUTH_RATE_LIMITS[action]
+    auth_rate_limiter.hit(f"{action}:ip", client_ip(), *limits['ip'])
+    auth_rate_limiter.hit(f"{action}:email", str(email).strip().lower(), *limits['email'])
+
+def rate_limited_response(error: RateLimitExceeded):
+    """429 telling the client when to retry"""
+    response = jsonify({'error': 'Too many attempts, please try again later'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def password_busy_response(error: PasswordServiceBusy):
+    """503 telling the client when to retry an auth request"""
+    response = jsonify({'error': 'Authentication is busy, please retry shortly'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+# Idempotency-Key support: the first response for a key is stored and
+# replayed to retries; concurrent duplicates wait for it
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+
+def replay_response(stored: Dict):
+    response = app.response_class(stored['body'], status=stored['status'], mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent_response(user_id: str, key: str, handler):
+    """Run ``handler`` once per (user, key) and replay its response afterwards"""
+    if len(key) > 255:
+        return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+
+    fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        claim = db.idempotency.claim(user_id, key, fingerprint,
+                                     IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LEASE_SECONDS)
+        if claim is None:
+            break
+        if claim.get('fingerprint') != fingerprint:
+            return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+        if claim.get('state') == 'completed':
+            return replay_response(claim['response'])
+        if time.monotonic() >= deadline:
+            response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+    response, status = handler()
+    try:
+        # Conflicts such as out-of-stock items depend on state that changes,
+        # so like server errors they must not be replayed to a retry
+        if status >= 500 or status == 409:
+            db.idempotency.release(user_id, key)
+        else:
+            db.idempotency.complete(user_id, key, status, response.get_data(as_text=True))
+    except Exception as e:
+        logger.warning('idempotency_store_failed', extra={'fields': {'error': str(e)}})
+    return response, status
+
+# Pre-encoded catalog responses, keyed by route and argument
+CATALOG_RESPONSE_CACHE_SIZE = int(os.environ.get('CATALOG_RESPONSE_CACHE_SIZE', 512))
+CATALOG_GZIP_MIN_BYTES = int(os.environ.get('CATALOG_GZIP_MIN_BYTES', 1024))
+_catalog_responses = OrderedDict()
+_catalog_responses_lock = threading.Lock()
+
+def _catalog_last_modified(version) -> datetime:
+    """When the catalog snapshot behind a version token was built.
+
+    Deletes and stock flag changes bump the version without touching any
+    product timestamp, so the product timestamps cannot be used.
+    """
+    built_at = version[1] if isinstance(version, tuple) else None
+    return (built_at or datetime.utcnow()).replace(microsecond=0)
+
+def _encoded_catalog_entry(key, build_payload):
+    """Return the pre-encoded body for a catalog response, rebuilding it
+    only when the catalog version has changed since it was encoded"""
+    version = db.products.catalog_version()
+    with _catalog_responses_lock:
+        entry = _catalog_responses.get(key)
+        if entry is not None and entry['version'] == version:
+            _catalog_responses.move_to_end(key)
+            metrics.cache_hits.inc(cache='catalog_responses')
+            return entry
+    metrics.cache_misses.inc(cache='catalog_responses')
+
+    payload = build_payload()
+    if payload is None:
+        return None
+
+    body = app.json.dumps(payload).encode('utf-8')
+    entry = {
+        'version': version,
+        'body': body,
+        'gzip': gzip.compress(body) if len(body) >= CATALOG_GZIP_MIN_BYTES else None,
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+        'last_modified': _catalog_last_modified(version)
+    }
+
+    with _catalog_responses_lock:
+        _catalog_responses[key] = entry
+        _catalog_responses.move_to_end(key)
+        while len(_catalog_responses) > CATALOG_RESPONSE_CACHE_SIZE:
+            _catalog_responses.popitem(last=False)
+
+    return entry
+
+def _catalog_response(entry):
+    """Build a conditional response from a pre-encoded catalog entry"""
+    use_gzip = entry['gzip'] is not None and request.accept_encodings.quality('gzip') > 0
+    response = app.response_class(
+        entry['gzip'] if use_gzip else entry['body'],
+        mimetype='application/json'
+    )
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f"{entry['etag']}-gzip")
+    else:
+        response.set_etag(entry['etag'])
+    response.vary.add('Accept-Encoding')
+    response.last_modified = entry['last_modified']
+    response.cache_control.no_cache = True
+
+    return response.make_conditional(request)
 
 # Routes
 @app.route('/api/products', methods=['GET'])
@@ -52,14 +309,32 @@ def get_products():
     try:
         category = request.args.get('category')
         
-        if category:
-            products = db.products.find_products_by_category(category)
-        else:
-            products = db.products.find_all_products()
+        if any(arg in request.args for arg in ('limit', 'after', 'fields')):
+            try:
+                limit = request.args.get('limit', type=int)
+                if 'limit' in request.args and limit is None:
+                    raise ValueError("Limit must be an integer")
+                fields = request.args.get('fields')
+                page = db.products.find_products_page(
+                    category=category,
+                    limit=limit,
+                    after=request.args.get('after'),
+                    fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify(page), 200
         
-        return jsonify({
-            'products': products
-        }), 200
+        def build_payload():
+            if category:
+                products = db.products.find_products_by_category(category)
+            else:
+                products = db.products.find_all_products()
+            return {'products': products}
+        
+        entry = _encoded_catalog_entry(('products', category), build_payload)
+        return _catalog_response(entry)
         
     except Exception as e:
         return jsonify({'error': 'Failed to get products'}), 500
@@ -88,16 +363,57 @@ def create_product():
 @app.route('/api/products/<product_id>', methods=['GET'])
 def get_product(product_id):
     try:
-        product = db.products.find_product_by_id(product_id)
+        def build_payload():
+            product = db.products.find_product_by_id(product_id)
+            if not product:
+                return None
+            return {'product': product}
+        
+        entry = _encoded_catalog_entry(('product', product_id), build_payload)
         
-        if not product:
+        if not entry:
             return jsonify({'error': 'Product not found'}), 404
         
-        return jsonify({'product': product}), 200
+        return _catalog_response(entry)
         
     except Exception as e:
         return jsonify({'error': 'Failed to get product'}), 500
 
+@app.route('/api/products/<product_id>/stock', methods=['GET'])
+def get_product_stock(product_id):
+    try:
+        stock = db.products.stock_level(product_id)
+        if not stock:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        return jsonify(stock), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get product stock'}), 500
+
+@app.route('/api/quotes', methods=['POST'])
+def create_quotes():
+    try:
+        data = request.get_json(silent=True) or {}
+        lines = data.get('lines')
+        if not isinstance(lines, list) or not lines:
+            return jsonify({'error': 'Lines must be a non-empty array'}), 400
+        
+        try:
+            quotes = quote_engine.quote(lines)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        total = sum(quote['line_total'] for quote in quotes if 'line_total' in quote)
+        return jsonify({
+            'quotes': quotes,
+            'total': round(total, 2)
+        }), 200
+        
+    except Exception as e:
+        logger.exception('quote_failed', extra={'fields': {'error': str(e)}})
+        return jsonify({'error': 'Failed to quote prices'}), 500
+
 @app.route('/api/cart', methods=['GET'])
 @jwt_required()
 def get_cart():
@@ -135,6 +451,8 @@ def add_to_cart():
         else:
             return jsonify({'error': 'Failed to add item to cart'}), 500
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to add item to cart'}), 500
 
@@ -197,16 +515,15 @@ def register():
         
         # Validate required fields
         if not all(k in data for k in ('name', 'email', 'password')):
-            print("❌ Missing required fields")
             return jsonify({'error': 'Missing required fields'}), 400
         
+        check_auth_rate_limit('register', data['email'])
+        
         # Check if user already exists
         existing_user = db.users.find_user_by_email(data['email'])
         if existing_user:
-            print("❌ Email already registered")
             return jsonify({'error': 'Email already registered'}), 400
         
-        print("✅ Creating new user")
         # Create new user
         user_data = {
             'name': data['name'],
@@ -215,7 +532,7 @@ def register():
         }
         
         user = db.users.create_user(user_data)
-        print("👤 User created successfully")
+        logger.info('user_registered', extra={'fields': {'user_id': user['id']}})
         
         # Remove password hash from response
         del user['password_hash']
@@ -225,7 +542,6 @@ def register():
         
         # Create access token
         access_token = create_access_token(identity=user['id'])
-        print("🎫 Access token created for new user")
         
         return jsonify({
             'message': 'User registered successfully',
@@ -234,10 +550,15 @@ def register():
         }), 201
         
     except ValueError as e:
-        print(f"❌ Validation error: {e}")
         return jsonify({'error': str(e)}), 400
+    except RateLimitExceeded as e:
+        logger.warning('register_throttled', extra={'fields': {'scope': e.scope}})
+        return rate_limited_response(e)
+    except PasswordServiceBusy as e:
+        logger.warning('register_password_service_busy')
+        return password_busy_response(e)
     except Exception as e:
-        print(f"💥 Registration error: {e}")
+        logger.exception('register_failed', extra={'fields': {'error': str(e)}})
         return jsonify({'error': 'Registration failed'}), 500
 
 @app.route('/api/login', methods=['POST'])
@@ -246,43 +567,50 @@ def login():
         if not db:
             return jsonify({'error': 'Database not available'}), 503
             
-        print("🔐 Login attempt received")
         data = request.get_json()
-        print(f"📧 Login data: {data.get('email', 'No email')}")
         
         if not all(k in data for k in ('email', 'password')):
-            print("❌ Missing email or password")
             return jsonify({'error': 'Missing email or password'}), 400
         
+        check_auth_rate_limit('login', data['email'])
+        
         user = db.users.find_user_by_email(data['email'])
-        print(f"👤 User found: {user is not None}")
         
         if user and check_password(data['password'], user['password_hash']):
-            print("✅ Password verified")
+            if password_service.needs_rehash(user['password_hash']):
+                try:
+                    db.users.update_user(user['id'], {'password_hash': hash_password(data['password'])})
+                    logger.info('password_rehashed', extra={'fields': {'user_id': user['id']}})
+                except Exception as e:
+                    logger.warning('password_rehash_failed', extra={'fields': {'error': str(e)}})
             # Check if user is admin based on email
             if 'admin' in user['email'].lower():
                 user['role'] = 'admin'
-                print("🔑 Admin role assigned")
             else:
                 user['role'] = 'user'
-                print("👤 User role assigned")
                 
             # Remove password hash from response
             del user['password_hash']
             
             access_token = create_access_token(identity=user['id'])
-            print("🎫 Access token created")
+            logger.info('login_succeeded', extra={'fields': {'user_id': user['id']}})
             return jsonify({
                 'message': 'Login successful',
                 'access_token': access_token,
                 'user': user
             }), 200
         else:
-            print("❌ Invalid credentials")
+            logger.info('login_failed')
             return jsonify({'error': 'Invalid credentials'}), 401
             
+    except RateLimitExceeded as e:
+        logger.warning('login_throttled', extra={'fields': {'scope': e.scope}})
+        return rate_limited_response(e)
+    except PasswordServiceBusy as e:
+        logger.warning('login_password_service_busy')
+        return password_busy_response(e)
     except Exception as e:
-        print(f"💥 Login error: {e}")
+        logger.exception('login_error', extra={'fields': {'error': str(e)}})
         return jsonify({'error': 'Login failed'}), 500
 
 @app.route('/api/profile', methods=['GET'])
@@ -306,49 +634,38 @@ def get_profile():
 @app.route('/api/orders', methods=['POST'])
 @jwt_required()
 def create_order():
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key and db:
+        return idempotent_response(get_jwt_identity(), idempotency_key, place_order)
+    return place_order()
+
+def place_order():
     try:
         if not db:
             return jsonify({'error': 'Database not available'}), 503
             
         user_id = get_jwt_identity()
         data = request.get_json()
-        print(f"📦 Order data received: {data}")
+        log_event(logger, logging.DEBUG, 'order_payload', sample_rate=LOG_PAYLOAD_SAMPLE_RATE, payload=data)
         
         # Enhanced validation with detailed error messages
         # Validate required fields
         required_fields = ['items', 'total_amount', 'payment_method', 'billing_info']
         missing_fields = [field for field in required_fields if field not in data]
         if missing_fields:
-            print(f"❌ Missing required fields: {missing_fields}")
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
         
-        # Validate items array
-        if not isinstance(data['items'], list) or len(data['items']) == 0:
-            print("❌ Items must be a non-empty array")
-            return jsonify({'error': 'Items must be a non-empty array'}), 400
-        
-        # Validate each item in the array
-        for i, item in enumerate(data['items']):
-            item_required = ['id', 'name', 'price', 'quantity']
-            item_missing = [field for field in item_required if field not in item]
-            if item_missing:
-                return jsonify({'error': f'Item {i+1} missing fields: {", ".join(item_missing)}'}), 400
-            
-            # Validate item data types
-            if not isinstance(item['price'], (int, float)) or item['price'] <= 0:
-                return jsonify({'error': f'Item {i+1} has invalid price'}), 400
-            if not isinstance(item['quantity'], int) or item['quantity'] <= 0:
-                return jsonify({'error': f'Item {i+1} has invalid quantity'}), 400
-        
-        # Validate total_amount
-        if not isinstance(data['total_amount'], (int, float)) or data['total_amount'] <= 0:
-            return jsonify({'error': 'Invalid total amount'}), 400
+        # Items, quotes and total are checked together; the normalized
+        # items go straight to insertion
+        try:
+            validated = order_validator.validate(data['items'], data['total_amount'])
+        except OrderValidationError as e:
+            return jsonify({'error': str(e), **e.details}), 400
         
         # Validate billing_info structure
         billing_required = ['email', 'phone', 'address', 'city', 'state', 'pincode']
         billing_missing = [field for field in billing_required if field not in data['billing_info']]
         if billing_missing:
-            print(f"❌ Missing billing info fields: {billing_missing}")
             return jsonify({'error': f'Missing billing information: {", ".join(billing_missing)}'}), 400
 
         # Validate billing info data with sanitization
@@ -376,37 +693,39 @@ def create_order():
         # Create order data
         order_data = {
             'user_id': user_id,
-            'total_amount': data['total_amount'],
+            'total_amount': validated.total_amount,
             'payment_method': data['payment_method'],
             'billing_info': sanitized_billing_info,
             'status': 'confirmed',
-            'items': data['items']
+            'items': validated.items
         }
         
-        print(f"✅ Creating order with data: {order_data}")
-        order = db.orders.create_order(order_data)
-        print(f"✅ Order created successfully: {order.get('order_number', 'Unknown')}")
-        
-        # Clear cart after successful order
-        try:
-            db.carts.clear_cart(user_id)
-            print("✅ Cart cleared successfully")
-        except Exception as cart_error:
-            print(f"⚠️ Failed to clear cart: {cart_error}")
-            # Don't fail the order creation if cart clearing fails
+        # Inserts the order, reserves stock and clears the cart together
+        order = db.checkout.place_order(order_data, normalized=True)
+        logger.info('order_created', extra={'fields': {
+            'order_number': order.get('order_number'),
+            'item_count': len(order_data['items']),
+            'total_amount': order.get('total_amount')
+        }})
         
         return jsonify({
             'message': 'Order created successfully',
             'order': order
         }), 201
         
+    except InsufficientStock as e:
+        logger.info('order_out_of_stock', extra={'fields': {'product_ids': e.product_ids}})
+        return jsonify({'error': 'Some items are out of stock', 'product_ids': e.product_ids}), 409
+    except OrderPlacementConflict as e:
+        logger.warning('order_placement_conflict')
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
     except ValueError as e:
-        print(f"❌ Validation error in create_order: {e}")
+        logger.info('order_rejected', extra={'fields': {'error': str(e)}})
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"💥 Error in create_order: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('order_failed', extra={'fields': {'error': str(e)}})
         return jsonify({'error': f'Failed to create order: {str(e)}'}), 500
 
 @app.route('/api/orders', methods=['GET'])
@@ -414,11 +733,16 @@ def create_order():
 def get_orders():
     try:
         user_id = get_jwt_identity()
-        orders = db.orders.find_orders_by_user(user_id)
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and limit is None:
+            return jsonify({'error': 'Limit must be an integer'}), 400
         
-        return jsonify({
-            'orders': orders
-        }), 200
+        try:
+            page = db.orders.find_orders_by_user(user_id, limit=limit, after=request.args.get('after'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(page), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to get orders'}), 500
@@ -451,8 +775,12 @@ def create_review():
         if not 1 <= data['rating'] <= 5:
             return jsonify({'error': 'Rating must be between 1 and 5'}), 400
         
+        # Store the author's display name with the review so listings need no join
+        user = db.users.find_user_by_id(user_id)
+        
         review_data = {
             'user_id': user_id,
+            'user_name': user.get('name') if user else None,
             'product_id': data['product_id'],
             'rating': data['rating'],
             'comment': data.get('comment', '')
@@ -471,11 +799,19 @@ def create_review():
 @app.route('/api/reviews/<product_id>', methods=['GET'])
 def get_reviews(product_id):
     try:
-        reviews = db.reviews.find_reviews_by_product(product_id)
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and limit is None:
+            return jsonify({'error': 'Limit must be an integer'}), 400
+        
+        try:
+            page = db.reviews.find_reviews_by_product(product_id, limit=limit, after=request.args.get('after'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         stats = db.reviews.get_product_rating_stats(product_id)
         
         return jsonify({
-            'reviews': reviews,
+            'reviews': page['reviews'],
+            'next_cursor': page['next_cursor'],
             'stats': stats
         }), 200
         
@@ -528,25 +864,60 @@ def process_payment():
             if not bank:
                 return jsonify({'error': 'Bank selection is required for net banking'}), 400
         
-        # Simulate payment processing delay
-        import time
-        time.sleep(2)
-        
-        # Simulate successful payment
-        payment_id = f"pay_{uuid.uuid4().hex[:12]}"
+        details = {
+            key: data[key]
+            for key in ('card_details', 'upi_id', 'bank')
+            if key in data
+        }
+        payment = payment_engine.submit(get_jwt_identity(), payment_method, amount, details)
         
-        return jsonify({
-            'status': 'success',
-            'payment_id': payment_id,
+        response = jsonify({
+            'status': payment['status'],
+            'payment_id': payment['payment_id'],
             'amount': amount,
             'payment_method': payment_method,
-            'message': 'Payment processed successfully'
-        }), 200
+            'message': payment['message']
+        })
+        response.headers['Location'] = f"/api/payment/{payment['payment_id']}"
+        return response, 202
         
     except Exception as e:
-        print(f"💥 Payment processing error: {e}")
+        logger.exception('payment_submit_failed', extra={'fields': {'error': str(e)}})
         return jsonify({'error': 'Payment processing failed'}), 500
 
+@app.route('/api/payment/<payment_id>', methods=['GET'])
+@jwt_required()
+def get_payment(payment_id):
+    try:
+        wait = min(max(request.args.get('wait', 0, type=float), 0), PAYMENT_MAX_WAIT_SECONDS)
+        payment = payment_engine.get(payment_id, user_id=get_jwt_identity(), wait=wait)
+        
+        if not payment:
+            return jsonify({'error': 'Payment not found'}), 404
+        
+        payment.pop('user_id', None)
+        return jsonify(payment), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get payment'}), 500
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is serving requests; no I/O"""
+    return jsonify({'status': 'alive'}), 200
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: a cached, time-limited database ping"""
+    try:
+        ready = bool(db) and db.ping()
+    except Exception:
+        ready = False
+    
+    if ready:
+        return jsonify({'status': 'ready', 'database': 'connected'}), 200
+    return jsonify({'status': 'not ready', 'database': 'disconnected'}), 503
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     try:
@@ -577,6 +948,87 @@ def get_db_stats():
     except Exception as e:
         return jsonify({'error': 'Failed to get database stats'}), 500
 
+def admin_token_error():
+    """Error response unless the request carries the admin API token"""
+    token = os.environ.get('ADMIN_API_TOKEN')
+    if not token:
+        return jsonify({'error': 'Admin API is not enabled'}), 403
+    # Bytes, since compare_digest rejects non-ASCII str
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f'Bearer {token}'.encode('utf-8')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+def parse_export_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    # Orders store naive UTC timestamps
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@app.route('/api/admin/orders/import', methods=['POST'])
+def import_orders():
+    """Create orders from an NDJSON body, streaming one result line per input line"""
+    denied = admin_token_error()
+    if denied:
+        return denied
+    if not db:
+        return jsonify({'error': 'Database not available'}), 503
+    
+    lines = read_ndjson(request.stream, order_importer.max_line_bytes)
+    
+    def generate():
+        try:
+            for result in order_importer.run(lines):
+                yield to_ndjson(result)
+        except Exception as e:
+            logger.exception('order_import_failed', extra={'fields': {'error': str(e)}})
+            yield to_ndjson({'error': 'Import failed, later lines were not processed'})
+    
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+@app.route('/api/admin/orders/export', methods=['GET'])
+def export_orders():
+    """Stream orders created in [from, to) as NDJSON, oldest first"""
+    denied = admin_token_error()
+    if denied:
+        return denied
+    if not db:
+        return jsonify({'error': 'Database not available'}), 503
+    
+    try:
+        created_from = parse_export_date('from')
+        created_to = parse_export_date('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 dates'}), 400
+    
+    orders = db.orders.iter_orders(created_from, created_to, batch_size=ORDER_EXPORT_BATCH_SIZE)
+    
+    def generate():
+        try:
+            for order in orders:
+                yield to_ndjson(order, app.json.dumps)
+        except Exception as e:
+            logger.exception('order_export_failed', extra={'fields': {'error': str(e)}})
+            yield to_ndjson({'error': 'Export failed, the output is incomplete'})
+        finally:
+            orders.close()
+    
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics for every worker of this server"""
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').encode('utf-8')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'.encode('utf-8')):
+            return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -589,7 +1041,7 @@ def internal_error(error):
 if __name__ == '__main__':
     try:
         print("🚀 Starting Edgecraft Glass API Server on port", PORT)
-        print("📊 Database connection:", "✅ Connected" if db else "❌ Not available")
+        print("📊 Database connection:", "✅ Connects on first request" if db else "❌ Not available")
         print("🔐 JWT authentication enabled")
         print("🌐 CORS enabled for all origins")
         print("📱 API endpoints ready")
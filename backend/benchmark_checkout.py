@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Checkout throughput benchmark
+
+Places orders for one hot product from many threads at once through
+``OrderPlacement`` and reports orders per second, retries and conflicts,
+then checks that no more units were sold than were in stock.
+
+Runs against the server in MONGODB_URI using a throwaway database:
+
+    MONGODB_URI=mongodb://localhost:27017/?replicaSet=rs0 python benchmark_checkout.py
+    ORDER_TRANSACTIONS=off python benchmark_checkout.py --threads 32 --stock 500
+    python benchmark_checkout.py --shards 8     # hot product on stock counters
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+def run(threads: int, orders: int, stock: int, units: int, shards: int = 0):
+    os.environ['MONGODB_DB_NAME'] = f"edgecraft_bench_{uuid.uuid4().hex[:8]}"
+    from database.mongodb import EdgecraftDB, InsufficientStock, OrderPlacementConflict
+
+    db = EdgecraftDB()
+    try:
+        product_id = db.products.create_product({
+            'name': 'Benchmark Panel',
+            'category': 'benchmark',
+            'price': 10.0,
+            'stock_quantity': stock
+        })['id']
+        if shards:
+            db.products.enable_stock_shards(product_id, shards)
+        transactions = db.checkout.mode == 'on' or (
+            db.checkout.mode == 'auto' and db.checkout.supports_transactions()
+        )
+        print(f"Database: {db.mongodb.db.name} (transactions: {'on' if transactions else 'off'})")
+        print(f"Placing {orders} orders of {units} unit(s) from {threads} threads, "
+              f"stock {stock} in {shards or 1} counter(s)")
+
+        outcomes = {'placed': 0, 'out_of_stock': 0, 'conflict': 0, 'error': 0}
+        lock = threading.Lock()
+
+        def place(n: int):
+            user_id = f"bench-user-{n % threads}"
+            order_data = {
+                'user_id': user_id,
+                'items': [{'id': f"{product_id}-{n}", 'name': 'Benchmark Panel',
+                           'price': 10.0, 'quantity': units}],
+                'total_amount': 10.0 * units,
+                'payment_method': 'Credit Card',
+                'billing_info': {
+                    'email': f"{user_id}@example.com",
+                    'phone': '9999999999',
+                    'address': '1 Benchmark Road',
+                    'city': 'Chennai',
+                    'state': 'Tamil Nadu',
+                    'pincode': '600001'
+                },
+                'status': 'pending'
+            }
+            try:
+                db.checkout.place_order(order_data)
+                outcome = 'placed'
+            except InsufficientStock:
+                outcome = 'out_of_stock'
+            except OrderPlacementConflict:
+                outcome = 'conflict'
+            except Exception as e:
+                print(f"   error: {e}")
+                outcome = 'error'
+            with lock:
+                outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(place, range(orders)))
+        elapsed = time.perf_counter() - started
+
+        # Read the stock level from the database, not the catalog cache
+        if shards:
+            remaining = db.products.stock.totals([product_id], fresh=True)[product_id]
+        else:
+            remaining = db.mongodb.db.products.find_one({'name': 'Benchmark Panel'})['stock_quantity']
+        sold = stock - remaining
+        placed_units = outcomes['placed'] * units
+
+        print(f"Elapsed:       {elapsed:.2f}s")
+        print(f"Throughput:    {outcomes['placed'] / elapsed:.1f} orders/s "
+              f"({orders / elapsed:.1f} attempts/s)")
+        print(f"Outcomes:      {outcomes}")
+        print(f"Placement:     {db.checkout.stats}")
+        print(f"Stock:         {stock} -> {remaining} ({sold} sold, {placed_units} ordered)")
+
+        if remaining < 0 or sold != placed_units:
+            print("FAIL: stock does not match the orders placed")
+            return 1
+        # An empty run would pass the stock check trivially
+        if outcomes['error'] or not outcomes['placed']:
+            print("FAIL: orders failed or none were placed")
+            return 1
+        print("OK: no oversell")
+        return 0
+    finally:
+        db.mongodb.client.drop_database(db.mongodb.db.name)
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--stock', type=int, default=800)
+    parser.add_argument('--units', type=int, default=1)
+    parser.add_argument('--shards', type=int, default=0, help='stock counters for the hot product')
+    args = parser.parse_args()
+    sys.exit(run(args.threads, args.orders, args.stock, args.units, args.shards))
+
+if __name__ == '__main__':
+    main()
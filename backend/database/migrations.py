@@ -0,0 +1,221 @@
+"""
+Data migrations for MongoDB collections
+
+Usage:
+    python -m database.migrations indexes [--keep-stale]
+    python -m database.migrations orders [--batch-size N]
+    python -m database.migrations ratings [--batch-size N]
+    python -m database.migrations reviews [--batch-size N]
+    python -m database.migrations stock [--product ID --shards N]
+"""
+
+import argparse
+from datetime import datetime
+from typing import Dict, List
+from pymongo import UpdateOne, ReplaceOne
+from bson import ObjectId
+from bson.errors import InvalidId
+from database.mongodb import (
+    db, OrderOperations, ReviewOperations, ORDER_SCHEMA_VERSION, INDEXES, SCHEMA_VERSION
+)
+
+def index_name(keys: List) -> str:
+    """Default MongoDB name for an index on ``keys``"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+def _index_matches(existing: Dict, keys: List, options: Dict) -> bool:
+    existing_keys = [(field, int(direction)) for field, direction in existing['key'].items()]
+    return (
+        existing_keys == list(keys)
+        and bool(existing.get('unique', False)) == bool(options.get('unique', False))
+        and existing.get('expireAfterSeconds') == options.get('expireAfterSeconds')
+    )
+
+def reconcile_indexes(drop_stale: bool = True) -> Dict:
+    """Make every collection's indexes match INDEXES and record SCHEMA_VERSION.
+
+    Missing indexes are built in the background, indexes whose definition
+    changed are rebuilt, and undeclared ones (such as the legacy orderId
+    index) are dropped unless ``drop_stale`` is False.
+    """
+    database = db.mongodb.db
+    report = {'created': [], 'dropped': []}
+
+    for collection_name, declared in INDEXES.items():
+        collection = database[collection_name]
+        existing = {index['name']: index for index in collection.list_indexes()}
+        wanted = {index_name(keys): (keys, options) for keys, options in declared}
+
+        for name, index in existing.items():
+            if name == '_id_':
+                continue
+            if name in wanted:
+                if _index_matches(index, *wanted[name]):
+                    continue
+            elif not drop_stale:
+                continue
+            collection.drop_index(name)
+            report['dropped'].append(f"{collection_name}.{name}")
+
+        for name, (keys, options) in wanted.items():
+            if name in existing and _index_matches(existing[name], keys, options):
+                continue
+            collection.create_index(keys, name=name, background=True, **options)
+            report['created'].append(f"{collection_name}.{name}")
+
+    database.meta.update_one(
+        {'_id': 'schema'},
+        {'$set': {'version': SCHEMA_VERSION, 'migrated_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+    print(f"✅ Indexes reconciled (schema version {SCHEMA_VERSION}): "
+          f"{len(report['created'])} created, {len(report['dropped'])} dropped")
+    return report
+
+def backfill_orders(batch_size: int = 500) -> int:
+    """Normalize legacy Decimal128/string totals and prices and stamp the
+    current schema version. Safe to re-run: only unmigrated orders are read."""
+    collection = db.orders.collection
+    query = {'schema_version': {'$not': {'$gte': ORDER_SCHEMA_VERSION}}}
+    # schema_version is read back for the compare-and-set filter below
+    projection = {'total_amount': 1, 'items': 1, 'schema_version': 1}
+
+    migrated = 0
+    operations = []
+
+    def flush():
+        nonlocal migrated, operations
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+            operations = []
+
+    for order in collection.find(query, projection, batch_size=batch_size):
+        update = OrderOperations.normalize_amounts(order)
+        update['schema_version'] = ORDER_SCHEMA_VERSION
+        operations.append(UpdateOne(
+            {'_id': order['_id'], 'schema_version': order.get('schema_version')},
+            {'$set': update}
+        ))
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+
+    print(f"✅ Migrated {migrated} orders to schema version {ORDER_SCHEMA_VERSION}")
+    return migrated
+
+def rebuild_rating_stats(batch_size: int = 500) -> int:
+    """Recompute every per-product rating summary from the reviews collection"""
+    pipeline = [
+        # Legacy reviews without a numeric rating are not counted
+        {'$match': {'rating': {'$type': ['int', 'long', 'double']}}},
+        {'$group': {
+            '_id': {'product_id': '$product_id', 'rating': '$rating'},
+            'count': {'$sum': 1},
+            'sum': {'$sum': '$rating'}
+        }}
+    ]
+
+    summaries = {}
+    for group in db.reviews.collection.aggregate(pipeline, allowDiskUse=True):
+        product_id = group['_id']['product_id']
+        bucket = ReviewOperations.rating_bucket(group['_id']['rating'])
+        summary = summaries.setdefault(product_id, {'count': 0, 'sum': 0, 'distribution': {}})
+        summary['count'] += group['count']
+        summary['sum'] += group['sum']
+        summary['distribution'][bucket] = summary['distribution'].get(bucket, 0) + group['count']
+
+    collection = db.reviews.rating_stats
+    operations = [
+        ReplaceOne({'_id': product_id}, summary, upsert=True)
+        for product_id, summary in summaries.items()
+    ]
+    for start in range(0, len(operations), batch_size):
+        collection.bulk_write(operations[start:start + batch_size], ordered=False)
+    collection.delete_many({'_id': {'$nin': list(summaries)}})
+
+    print(f"✅ Rebuilt rating stats for {len(summaries)} products")
+    return len(summaries)
+
+def backfill_review_authors(batch_size: int = 500) -> int:
+    """Denormalize the author's display name onto reviews written before
+    create_review started storing it"""
+    collection = db.reviews.collection
+    query = {'user_name': {'$exists': False}}
+
+    updated = 0
+    batch = []
+
+    def flush():
+        nonlocal updated, batch
+        user_ids = set()
+        for review in batch:
+            try:
+                user_ids.add(ObjectId(review['user_id']))
+            except (InvalidId, TypeError, KeyError):
+                pass
+        names = {
+            str(user['_id']): user.get('name')
+            for user in db.users.collection.find({'_id': {'$in': list(user_ids)}}, {'name': 1})
+        }
+        operations = [
+            UpdateOne({'_id': review['_id']}, {'$set': {'user_name': names.get(str(review.get('user_id')))}})
+            for review in batch
+        ]
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+        batch = []
+
+    for review in collection.find(query, {'user_id': 1}, batch_size=batch_size):
+        batch.append(review)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    print(f"✅ Backfilled author names on {updated} reviews")
+    return updated
+
+def shard_stock(product_id: str, shards: int) -> int:
+    """Split a hot product's stock over ``shards`` counters, or fold it back with ``shards`` 0"""
+    if shards:
+        units = db.products.enable_stock_shards(product_id, shards)
+        print(f"✅ Moved {units} units of {product_id} into {shards} stock counters")
+    else:
+        units = db.products.disable_stock_shards(product_id)
+        print(f"✅ Moved {units} units of {product_id} back to stock_quantity")
+    return units
+
+def rebalance_stock() -> int:
+    """Even out the stock counters of every sharded product"""
+    moved = 0
+    sharded = db.products.collection.find({'stock_shards': {'$exists': True}}, {'_id': 1})
+    for product in sharded:
+        moved += db.products.stock.rebalance(str(product['_id']))
+
+    print(f"✅ Rebalanced stock counters, {moved} units moved")
+    return moved
+
+COMMANDS = {
+    'indexes': lambda args: reconcile_indexes(drop_stale=not args.keep_stale),
+    'orders': lambda args: backfill_orders(batch_size=args.batch_size),
+    'ratings': lambda args: rebuild_rating_stats(batch_size=args.batch_size),
+    'reviews': lambda args: backfill_review_authors(batch_size=args.batch_size),
+    'stock': lambda args: shard_stock(args.product, args.shards) if args.product else rebalance_stock(),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Edgecraft Glass database migrations')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--keep-stale', action='store_true',
+                        help='do not drop indexes that are no longer declared')
+    parser.add_argument('--product', help='product whose stock to shard (stock command)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='stock counters for --product, 0 to unshard')
+    args = parser.parse_args(argv)
+
+    COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,120 @@
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError, PyMongoError
+import pymongo
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from bson import ObjectId
 from bson.decimal128 import Decimal128
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import uuid
 import time
-from typing import Dict, List, Optional, Any
+import threading
+import base64
+import random
+import functools
+import inspect
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+logger = logging.getLogger('edgecraft.db')
+
+_operation = threading.local()
+
+def current_operation() -> Optional[str]:
+    """Name of the data layer method running on this thread, e.g. ``OrderOperations.create_order``"""
+    return getattr(_operation, 'name', None)
+
+def traced_operations(cls):
+    """Record the running public method of ``cls`` for current_operation()"""
+    for attr, method in list(vars(cls).items()):
+        if attr.startswith('_') or not inspect.isfunction(method):
+            continue
+
+        def wrap(method, name=f"{cls.__name__}.{attr}"):
+            @functools.wraps(method)
+            def traced(*args, **kwargs):
+                previous = getattr(_operation, 'name', None)
+                _operation.name = name
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    _operation.name = previous
+            return traced
+
+        setattr(cls, attr, wrap(method))
+    return cls
+
+def encode_cursor(created_at: datetime, document_id: ObjectId) -> str:
+    """Encode a keyset pagination position on (created_at, _id)"""
+    raw = f"{created_at.isoformat()}|{document_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, document_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), ObjectId(document_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_filter(after: Optional[str]) -> Dict:
+    """Query clause selecting documents after a cursor in (created_at, _id) descending order"""
+    if not after:
+        return {}
+    created_at, document_id = decode_cursor(after)
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': document_id}}
+    ]}
+
+# Declared indexes per collection as (keys, options). Bump SCHEMA_VERSION
+# whenever this changes and run ``python -m database.migrations indexes``.
+INDEXES = {
+    'users': [
+        ([("email", 1)], {'unique': True}),
+        ([("created_at", 1)], {}),
+    ],
+    'products': [
+        ([("name", 1)], {}),
+        ([("created_at", -1), ("_id", -1)], {}),
+        ([("category", 1), ("created_at", -1), ("_id", -1)], {}),
+    ],
+    'carts': [
+        ([("user_id", 1)], {'unique': True}),
+        ([("updated_at", 1)], {}),
+    ],
+    'orders': [
+        ([("order_number", 1)], {'unique': True}),
+        ([("user_id", 1), ("created_at", -1), ("_id", -1)], {}),
+        ([("created_at", 1)], {}),
+        ([("status", 1)], {}),
+    ],
+    'reviews': [
+        ([("product_id", 1), ("user_id", 1)], {}),
+        ([("product_id", 1), ("created_at", -1), ("_id", -1)], {}),
+        ([("created_at", 1)], {}),
+    ],
+    'payments': [
+        ([("user_id", 1)], {}),
+    ],
+    'rate_limits': [
+        ([("expires_at", 1)], {'expireAfterSeconds': 0}),
+    ],
+    'idempotency_keys': [
+        ([("expires_at", 1)], {'expireAfterSeconds': 0}),
+    ],
+    'stock_counters': [
+        ([("product_id", 1), ("shard", 1)], {}),
+    ],
+}
+SCHEMA_VERSION = 4
 
 class MongoDB:
     def __init__(self):
         self.client = None
         self.db = None
+        self.schema_version = None
         self.connect()
     
     def connect(self):
@@ -34,8 +137,8 @@ class MongoDB:
                 
             print(f"✅ Connected to MongoDB: {db_name}")
             
-            # Create indexes
-            self._create_indexes()
+            # Indexes are managed by the migration command; only check that it has run
+            self._check_schema_version()
             
         except Exception as e:
             print(f"❌ Failed to connect to MongoDB: {e}")
@@ -43,36 +146,16 @@ class MongoDB:
             self.db = None
             raise Exception(f"Failed to connect to MongoDB: {str(e)}")
 
-    def _create_indexes(self):
-        """Create database indexes for better performance"""
+    def _check_schema_version(self):
+        """Read the schema version recorded by the last migration run"""
         try:
-            # Users collection indexes
-            self.db.users.create_index("email", unique=True)
-            self.db.users.create_index("created_at")
-            
-            # Products collection indexes
-            self.db.products.create_index("category")
-            self.db.products.create_index("name")
-            self.db.products.create_index("created_at")
-            
-            # Carts collection indexes
-            self.db.carts.create_index("user_id", unique=True)
-            self.db.carts.create_index("updated_at")
-            
-            # Orders collection indexes
-            self.db.orders.create_index("order_number", unique=True)
-            self.db.orders.create_index("user_id")
-            self.db.orders.create_index("created_at")
-            self.db.orders.create_index("status")
-            
-            # Reviews collection indexes
-            self.db.reviews.create_index([("product_id", 1), ("user_id", 1)])
-            self.db.reviews.create_index("created_at")
-            
-            print("✅ Database indexes created successfully")
-            
+            schema = self.db.meta.find_one({'_id': 'schema'})
+            self.schema_version = schema.get('version') if schema else None
+            if self.schema_version != SCHEMA_VERSION:
+                print(f"⚠️ Database schema version {self.schema_version} does not match {SCHEMA_VERSION}; "
+                      f"run: python -m database.migrations indexes")
         except Exception as e:
-            print(f"⚠️ Index creation warning: {e}")
+            print(f"⚠️ Schema version check failed: {e}")
     
     def close_connection(self):
         """Close MongoDB connection"""
@@ -80,10 +163,95 @@ class MongoDB:
             self.client.close()
             print("🔌 MongoDB connection closed")
 
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL.
+
+    ``None`` is a valid cached value, which lets callers remember misses.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Tuple[bool, Any]:
+        """Return ``(found, value)`` for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, ttl: float = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def peek(self, key) -> Any:
+        """Return a cached value without touching counters or recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else None
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
 # User Operations
+@traced_operations
 class UserOperations:
+    """User lookups backed by a per-worker TTL/LRU cache.
+
+    Profiles are cached by id and by email. Unknown ids are remembered for a
+    shorter time so bogus tokens do not reach MongoDB on every request;
+    unknown emails are never cached because another worker may register them.
+    """
+
     def __init__(self, db):
         self.collection = db.users
+        self.cache = TTLCache(
+            int(os.getenv('USER_CACHE_SIZE', '1024')),
+            float(os.getenv('USER_CACHE_TTL_SECONDS', '60'))
+        )
+        self.negative_ttl = float(os.getenv('USER_CACHE_NEGATIVE_TTL_SECONDS', '10'))
+
+    def _remember(self, user: Dict) -> None:
+        self.cache.set(('id', user['id']), user)
+        self.cache.set(('email', user['email']), user)
+
+    def _forget(self, user_id: str) -> None:
+        cached = self.cache.peek(('id', user_id))
+        if cached:
+            self.cache.pop(('email', cached['email']))
+        self.cache.pop(('id', user_id))
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters of the user cache in this worker"""
+        return self.cache.stats()
     
     def create_user(self, user_data: Dict) -> Dict:
         """Create a new user"""
@@ -94,6 +262,7 @@ class UserOperations:
             result = self.collection.insert_one(user_data)
             user_data['id'] = str(result.inserted_id)
             del user_data['_id']
+            self._forget(user_data['id'])
             
             return user_data
             
@@ -104,22 +273,33 @@ class UserOperations:
     
     def find_user_by_email(self, email: str) -> Optional[Dict]:
         """Find user by email"""
+        found, user = self.cache.get(('email', email))
+        if found:
+            return dict(user)
         try:
             user = self.collection.find_one({"email": email})
             if user:
                 user['id'] = str(user['_id'])
                 del user['_id']
+                self._remember(user)
+                return dict(user)
             return user
         except Exception as e:
             raise Exception(f"Failed to find user: {e}")
     
     def find_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Find user by ID"""
+        found, user = self.cache.get(('id', user_id))
+        if found:
+            return dict(user) if user else None
         try:
             user = self.collection.find_one({"_id": ObjectId(user_id)})
             if user:
                 user['id'] = str(user['_id'])
                 del user['_id']
+                self._remember(user)
+                return dict(user)
+            self.cache.set(('id', user_id), None, ttl=self.negative_ttl)
             return user
         except Exception as e:
             raise Exception(f"Failed to find user: {e}")
@@ -132,14 +312,72 @@ class UserOperations:
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
+            self._forget(user_id)
             return result.modified_count > 0
         except Exception as e:
             raise Exception(f"Failed to update user: {e}")
 
+@traced_operations
+class OrderNumberAllocator:
+    """Hands out order numbers from blocks reserved on a shared counter.
+
+    Each block is reserved with a single atomic ``$inc`` on the counter
+    document, so numbers are unique across every worker and most orders
+    need no extra round trip at all.
+    """
+
+    COUNTER_ID = 'order_number'
+
+    def __init__(self, counters_collection, block_size: int = None):
+        if block_size is None:
+            block_size = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', '50'))
+        self.collection = counters_collection
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _reserve_block(self) -> None:
+        counter = self.collection.find_one_and_update(
+            {'_id': self.COUNTER_ID},
+            {'$inc': {'seq': self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._end = counter['seq']
+        self._next = self._end - self.block_size + 1
+
+    def allocate(self) -> str:
+        with self._lock:
+            if self._next == 0 or self._next > self._end:
+                self._reserve_block()
+            sequence = self._next
+            self._next += 1
+
+        timestamp = datetime.utcnow().strftime('%Y%m%d')
+        return f"EG{timestamp}{sequence:06d}"
+
+# Order documents at this version store total_amount and item prices as floats
+ORDER_SCHEMA_VERSION = 2
+
 # Order Operations
+@traced_operations
 class OrderOperations:
+    # Fields returned in order history listings; full detail comes from find_order_by_id
+    SUMMARY_PROJECTION = {
+        'order_number': 1,
+        'created_at': 1,
+        'status': 1,
+        'total_amount': 1,
+        'payment_method': 1,
+        'item_count': {'$size': {'$ifNull': ['$items', []]}}
+    }
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
     def __init__(self, db):
         self.collection = db.orders
+        self.order_numbers = OrderNumberAllocator(db.counters)
 
     @staticmethod
     def _parse_numeric_value(value: Any) -> Optional[float]:
@@ -172,19 +410,43 @@ class OrderOperations:
                 return 0
         return 0
 
-    def _calculate_order_total(self, items: List[Dict]) -> float:
+    @classmethod
+    def _calculate_order_total(cls, items: List[Dict]) -> float:
         total = 0.0
         for item in items or []:
-            price = self._parse_numeric_value(item.get('price')) or 0.0
-            quantity = max(self._parse_int_value(item.get('quantity')), 0)
+            price = cls._parse_numeric_value(item.get('price')) or 0.0
+            quantity = max(cls._parse_int_value(item.get('quantity')), 0)
             total += price * quantity
         return round(total, 2)
 
+    @classmethod
+    def normalize_amounts(cls, order: Dict) -> Dict:
+        """Return ``total_amount`` and ``items`` with numeric values parsed to floats"""
+        normalized_total = cls._parse_numeric_value(order.get('total_amount'))
+        if normalized_total is None:
+            normalized_total = cls._calculate_order_total(order.get('items', []))
+
+        normalized_items = []
+        for item in order.get('items', []):
+            normalized_item = dict(item)
+            price = cls._parse_numeric_value(normalized_item.get('price'))
+            if price is None:
+                price = 0.0
+            normalized_item['price'] = price
+            normalized_items.append(normalized_item)
+
+        return {'total_amount': normalized_total, 'items': normalized_items}
+
     def _normalize_order(self, raw_order: Dict) -> Dict:
+        """Convert a stored order into its API representation without writing back.
+
+        Orders written before ORDER_SCHEMA_VERSION are normalized in memory
+        here; ``python -m database.migrations orders`` persists the same
+        normalization in bulk.
+        """
         order = dict(raw_order)
 
         order['id'] = str(order['_id'])
-        original_id = order['_id']
         del order['_id']
 
         if 'orderId' not in order or not order['orderId']:
@@ -194,110 +456,193 @@ class OrderOperations:
             if isinstance(order.get(date_field), datetime):
                 order[date_field] = order[date_field].isoformat()
 
-        normalized_total = self._parse_numeric_value(order.get('total_amount'))
-        if normalized_total is None:
-            normalized_total = self._calculate_order_total(order.get('items', []))
-        order['total_amount'] = normalized_total
+        if order.get('schema_version', 0) < ORDER_SCHEMA_VERSION:
+            order.update(self.normalize_amounts(order))
+
+        return order
+    
+    def _normalize_new_order(self, order_data: Dict) -> None:
+        order_data['total_amount'] = self._parse_numeric_value(order_data.get('total_amount'))
+        if order_data['total_amount'] is None or order_data['total_amount'] <= 0:
+            raise ValueError("Invalid total amount")
 
         normalized_items = []
-        for item in order.get('items', []):
+        for item in order_data['items']:
             normalized_item = dict(item)
             price = self._parse_numeric_value(normalized_item.get('price'))
-            if price is None:
-                price = 0.0
+            if price is None or price <= 0:
+                raise ValueError("Invalid item price")
             normalized_item['price'] = price
+            quantity = self._parse_int_value(normalized_item.get('quantity'))
+            if quantity <= 0:
+                raise ValueError("Invalid item quantity")
+            normalized_item['quantity'] = quantity
             normalized_items.append(normalized_item)
-        order['items'] = normalized_items
 
-        if normalized_total is not None and raw_order.get('total_amount') != normalized_total:
-            try:
-                self.collection.update_one(
-                    {'_id': original_id},
-                    {'$set': {'total_amount': normalized_total}}
-                )
-            except Exception as update_error:
-                print(f"⚠️ Failed to update normalized total for order {order.get('order_number')}: {update_error}")
+        order_data['items'] = normalized_items
 
-        return order
-    
-    def create_order(self, order_data: Dict) -> Dict:
-        """Create a new order"""
-        try:
-            print(f"📦 Creating order in database with data: {order_data}")
-            
-            # Validate required fields
-            required_fields = ['user_id', 'total_amount', 'payment_method', 'billing_info', 'items']
-            for field in required_fields:
-                if field not in order_data:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            # Ensure items is a list
-            if not isinstance(order_data['items'], list):
-                raise ValueError("Items must be a list")
-
-            order_data['total_amount'] = self._parse_numeric_value(order_data.get('total_amount'))
-            if order_data['total_amount'] is None or order_data['total_amount'] <= 0:
-                raise ValueError("Invalid total amount")
-
-            normalized_items = []
-            for item in order_data['items']:
-                normalized_item = dict(item)
-                price = self._parse_numeric_value(normalized_item.get('price'))
-                if price is None or price <= 0:
-                    raise ValueError("Invalid item price")
-                normalized_item['price'] = price
-                quantity = self._parse_int_value(normalized_item.get('quantity'))
-                if quantity <= 0:
-                    raise ValueError("Invalid item quantity")
-                normalized_item['quantity'] = quantity
-                normalized_items.append(normalized_item)
-
-            order_data['items'] = normalized_items
-
-            # Set timestamps
-            order_data['created_at'] = datetime.utcnow()
-            order_data['updated_at'] = datetime.utcnow()
-            order_data['_id'] = ObjectId()
-            
-            # Generate order number if not provided
-            if 'order_number' not in order_data or not order_data['order_number']:
-                order_data['order_number'] = self._generate_order_number()
+    def _prepare_new_order(self, order_data: Dict, normalized: bool) -> None:
+        """Validate a new order and stamp the fields every stored order carries"""
+        # Validate required fields
+        required_fields = ['user_id', 'total_amount', 'payment_method', 'billing_info', 'items']
+        for field in required_fields:
+            if field not in order_data:
+                raise ValueError(f"Missing required field: {field}")
+        
+        # Ensure items is a list
+        if not isinstance(order_data['items'], list):
+            raise ValueError("Items must be a list")
+
+        if not normalized:
+            self._normalize_new_order(order_data)
+
+        # Set timestamps
+        order_data['created_at'] = datetime.utcnow()
+        order_data['updated_at'] = datetime.utcnow()
+        order_data['_id'] = ObjectId()
+        order_data['schema_version'] = ORDER_SCHEMA_VERSION
+        
+        # Generate order number if not provided
+        if 'order_number' not in order_data or not order_data['order_number']:
+            order_data['order_number'] = self._generate_order_number()
 
-            # Ensure legacy orderId field is populated for existing indexes
-            if not order_data.get('orderId'):
-                order_data['orderId'] = order_data['order_number']
+        # Populate legacy orderId for databases that still carry its unique
+        # index (dropped by ``python -m database.migrations indexes``)
+        if not order_data.get('orderId'):
+            order_data['orderId'] = order_data['order_number']
+
+    def create_order(self, order_data: Dict, session=None, normalized: bool = False) -> Dict:
+        """Create a new order, optionally inside a transaction ``session``.
+
+        ``normalized`` skips re-parsing items and total that the caller has
+        already validated (see ``services.orders.OrderValidator``).
+        """
+        try:
+            self._prepare_new_order(order_data, normalized)
             
-            print(f"📦 Inserting order with order_number: {order_data['order_number']}")
-            result = self.collection.insert_one(order_data)
+            result = self.collection.insert_one(order_data, session=session)
             
             if not result.inserted_id:
                 raise Exception("Failed to insert order into database")
             
             created_order = self._normalize_order(order_data)
 
-            print(f"✅ Order created successfully with ID: {created_order['id']}")
+            logger.debug('order_inserted', extra={'fields': {
+                'order_id': created_order['id'],
+                'order_number': created_order['order_number']
+            }})
             return created_order
             
         except ValueError as e:
-            print(f"❌ Validation error in create_order: {e}")
             raise e
         except Exception as e:
-            print(f"💥 Database error in create_order: {e}")
-            import traceback
-            traceback.print_exc()
+            # Inside a transaction the caller retries on the driver's error
+            # labels, which wrapping would lose
+            if session is not None and isinstance(e, PyMongoError):
+                raise
+            logger.exception('order_insert_failed', extra={'fields': {'error': str(e)}})
             raise Exception(f"Database error: {str(e)}")
     
-    def find_orders_by_user(self, user_id: str) -> List[Dict]:
-        """Find all orders for a user"""
+    def create_orders(self, orders: List[Dict], normalized: bool = False) -> List[Dict]:
+        """Insert a batch of orders with one unordered ``insert_many``.
+
+        Returns one result per order, in order: ``{'order': ...}`` for orders
+        that were stored and ``{'error': ...}`` for the rest. One bad order
+        does not stop the others.
+        """
+        results: List[Optional[Dict]] = [None] * len(orders)
+        pending = []
+        for position, order_data in enumerate(orders):
+            try:
+                self._prepare_new_order(order_data, normalized)
+                pending.append(position)
+            except ValueError as e:
+                results[position] = {'error': str(e)}
+
+        failed = {}
+        if pending:
+            try:
+                self.collection.insert_many([orders[position] for position in pending], ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    message = 'Duplicate order number' if error.get('code') == 11000 else error.get('errmsg', 'Write failed')
+                    failed[pending[error['index']]] = message
+            except Exception as e:
+                logger.exception('order_batch_insert_failed', extra={'fields': {'error': str(e)}})
+                raise Exception(f"Failed to insert orders: {e}")
+
+        for position in pending:
+            if position in failed:
+                results[position] = {'error': failed[position]}
+            else:
+                results[position] = {'order': self._normalize_order(orders[position])}
+        return results
+    
+    def iter_orders(self, created_from: datetime = None, created_to: datetime = None,
+                    batch_size: int = 500) -> Iterator[Dict]:
+        """Stream orders created in ``[created_from, created_to)``, oldest first.
+
+        Orders come from a server-side cursor ``batch_size`` at a time, so
+        memory use does not grow with the number of orders exported.
+        """
+        query: Dict[str, Any] = {}
+        if created_from or created_to:
+            query['created_at'] = {}
+            if created_from:
+                query['created_at']['$gte'] = created_from
+            if created_to:
+                query['created_at']['$lt'] = created_to
+
         try:
-            orders = list(self.collection.find(
-                {"user_id": user_id}
-            ).sort("created_at", -1))
+            cursor = self.collection.find(query).sort([("created_at", 1), ("_id", 1)]).batch_size(batch_size)
+        except Exception as e:
+            raise Exception(f"Failed to export orders: {e}")
+        try:
+            for raw_order in cursor:
+                yield self._normalize_order(raw_order)
+        finally:
+            cursor.close()
+    
+    def find_orders_by_user(self, user_id: str, limit: int = None, after: str = None) -> Dict:
+        """Find one page of order summaries for a user, newest first"""
+        if limit is None:
+            limit = self.DEFAULT_PAGE_SIZE
+        if limit < 1 or limit > self.MAX_PAGE_SIZE:
+            raise ValueError(f"Limit must be between 1 and {self.MAX_PAGE_SIZE}")
 
-            return [self._normalize_order(order) for order in orders]
+        query = keyset_filter(after)
+        query['user_id'] = user_id
+
+        try:
+            orders = list(self.collection.find(query, self.SUMMARY_PROJECTION)
+                          .sort([("created_at", -1), ("_id", -1)])
+                          .limit(limit + 1))
         except Exception as e:
             raise Exception(f"Failed to find orders: {e}")
 
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        next_cursor = None
+        if has_more:
+            last = orders[-1]
+            next_cursor = encode_cursor(last['created_at'], last['_id'])
+
+        summaries = []
+        for order in orders:
+            total = self._parse_numeric_value(order.get('total_amount'))
+            created_at = order.get('created_at')
+            summaries.append({
+                'id': str(order['_id']),
+                'order_number': order.get('order_number'),
+                'created_at': created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+                'status': order.get('status'),
+                'total_amount': total if total is not None else 0.0,
+                'payment_method': order.get('payment_method'),
+                'item_count': order.get('item_count', 0)
+            })
+
+        return {'orders': summaries, 'next_cursor': next_cursor}
+
     def find_order_by_id(self, order_id: str, user_id: str = None) -> Optional[Dict]:
         """Find order by ID"""
         try:
@@ -327,30 +672,346 @@ class OrderOperations:
     def _generate_order_number(self) -> str:
         """Generate unique order number"""
         try:
-            import uuid
+            return self.order_numbers.allocate()
+        except Exception as e:
+            logger.warning('order_number_allocation_failed', extra={'fields': {'error': str(e)}})
+            # Fall back to a random number; the unique index still guards it
             timestamp = datetime.utcnow().strftime('%Y%m%d')
-            unique_id = str(uuid.uuid4())[:6].upper()
-            order_number = f"EG{timestamp}{unique_id}"
-            
-            # Ensure uniqueness by checking if order number already exists
-            existing = self.collection.find_one({"order_number": order_number})
-            if existing:
-                # If exists, add more randomness
-                unique_id = str(uuid.uuid4())[:8].upper()
-                order_number = f"EG{timestamp}{unique_id}"
-            
-            print(f"📦 Generated order number: {order_number}")
-            return order_number
-            
+            return f"EG{timestamp}{uuid.uuid4().hex[:10].upper()}"
+
+class CatalogCache:
+    """Versioned in-memory snapshot of the product catalog.
+
+    The snapshot is rebuilt lazily whenever the shared version document in the
+    ``meta`` collection changes. Every catalog write bumps that version, so all
+    gunicorn workers converge within ``poll_interval`` seconds without having to
+    rescan the products collection on every request.
+    """
+
+    VERSION_DOC_ID = 'catalog'
+
+    def __init__(self, collection, meta_collection, poll_interval: float = None):
+        self.collection = collection
+        self.meta = meta_collection
+        if poll_interval is None:
+            poll_interval = float(os.getenv('CATALOG_CACHE_POLL_SECONDS', '5'))
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = 0.0
+        self.built_at: Optional[datetime] = None
+
+    def _read_version(self):
+        """Read the shared catalog version; ``None`` if it cannot be read."""
+        try:
+            doc = self.meta.find_one({'_id': self.VERSION_DOC_ID})
+        except PyMongoError as e:
+            logger.warning('catalog_version_read_failed', extra={'fields': {'error': str(e)}})
+            return None
+        return doc.get('version', 0) if doc else 0
+
+    def _rebuild(self, version):
+        products = list(self.collection.find().sort("created_at", -1))
+        by_id = {}
+        by_category: Dict[str, List[Dict]] = {}
+        for product in products:
+            product['id'] = str(product['_id'])
+            del product['_id']
+            # Stock changes with every order without bumping the version, so
+            # it is read live through stock_level instead of being snapshotted
+            product.pop('stock_quantity', None)
+            by_id[product['id']] = product
+            by_category.setdefault(product.get('category'), []).append(product)
+
+        self._snapshot = (products, by_id, by_category)
+        self._version = version
+        self.built_at = datetime.utcnow()
+        return self._snapshot
+
+    def _fresh_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.poll_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._checked_at < self.poll_interval:
+                return snapshot
+            version = self._read_version()
+            if snapshot is None or version is None or version != self._version:
+                snapshot = self._rebuild(version)
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    @property
+    def version(self):
+        """Version token of the current snapshot, refreshing it if stale."""
+        self._fresh_snapshot()
+        return (self._version, self.built_at)
+
+    def all(self) -> List[Dict]:
+        products, _, _ = self._fresh_snapshot()
+        return [dict(product) for product in products]
+
+    def by_category(self, category: str) -> List[Dict]:
+        _, _, by_category = self._fresh_snapshot()
+        return [dict(product) for product in by_category.get(category, [])]
+
+    def get(self, product_id: str) -> Optional[Dict]:
+        _, by_id, _ = self._fresh_snapshot()
+        product = by_id.get(product_id)
+        return dict(product) if product is not None else None
+
+    def invalidate(self) -> None:
+        """Drop the local snapshot and bump the shared version for other workers."""
+        with self._lock:
+            self._snapshot = None
+            self._checked_at = 0.0
+        try:
+            self.meta.update_one(
+                {'_id': self.VERSION_DOC_ID},
+                {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.warning('catalog_version_bump_failed', extra={'fields': {'error': str(e)}})
+
+@traced_operations
+class StockCounters:
+    """Inventory of hot products split over several counter documents.
+
+    A product with ``stock_shards`` set keeps its stock in the
+    ``stock_counters`` collection, one document per shard, instead of in
+    ``stock_quantity``. Each reservation decrements a randomly picked shard,
+    so concurrent checkouts for one product mostly update different
+    documents instead of queueing on a single one. Shards drift apart as
+    they drain and are evened out by ``rebalance``, which only moves units
+    between shards and never changes the total.
+    """
+
+    def __init__(self, collection, rebalance_interval: float = None, level_ttl: float = None):
+        self.collection = collection
+        if rebalance_interval is None:
+            rebalance_interval = float(os.getenv('STOCK_REBALANCE_SECONDS', '30'))
+        if level_ttl is None:
+            level_ttl = float(os.getenv('STOCK_LEVEL_CACHE_SECONDS', '2'))
+        self.rebalance_interval = rebalance_interval
+        self.levels = TTLCache(maxsize=10000, ttl=level_ttl)
+        self._lock = threading.Lock()
+        self._uneven: Dict[str, float] = {}
+        self._rebalanced_at: Dict[str, float] = {}
+
+    @staticmethod
+    def _counter_id(product_id: str, shard: int) -> str:
+        return f"{product_id}:{shard}"
+
+    @staticmethod
+    def split(total: int, shards: int) -> List[int]:
+        """Spread ``total`` units as evenly as possible over ``shards`` counters"""
+        base, extra = divmod(max(total, 0), shards)
+        return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+    def create(self, product_id: str, total: int, shards: int) -> None:
+        """Create the counters of a product that is being sharded"""
+        try:
+            self.collection.delete_many({'product_id': product_id})
+            self.collection.insert_many([
+                {'_id': self._counter_id(product_id, shard), 'product_id': product_id, 'shard': shard, 'count': count}
+                for shard, count in enumerate(self.split(total, shards))
+            ])
+            self.levels.pop(product_id)
+        except Exception as e:
+            raise Exception(f"Failed to create stock counters: {e}")
+
+    def drain(self, product_id: str) -> int:
+        """Delete the counters of a product and return the units they held"""
+        try:
+            total = 0
+            for counter in self.collection.find({'product_id': product_id}, {'_id': 1}):
+                removed = self.collection.find_one_and_delete({'_id': counter['_id']})
+                total += (removed or {}).get('count', 0)
+            self.levels.pop(product_id)
+            return total
         except Exception as e:
-            print(f"💥 Error generating order number: {e}")
-            # Fallback to timestamp-based number
-            import time
-            return f"EG{int(time.time())}"
+            raise Exception(f"Failed to drain stock counters: {e}")
 
+    def totals(self, product_ids: List[str], fresh: bool = False, session=None) -> Dict[str, int]:
+        """Units in stock per product, summed over the shards in one aggregation.
+
+        Totals are cached for ``STOCK_LEVEL_CACHE_SECONDS`` unless ``fresh``.
+        """
+        totals = {}
+        missing = []
+        for product_id in product_ids:
+            found, total = (False, None) if fresh else self.levels.get(product_id)
+            if found:
+                totals[product_id] = total
+            else:
+                missing.append(product_id)
+        if not missing:
+            return totals
+
+        try:
+            counted = {product_id: 0 for product_id in missing}
+            pipeline = [
+                {'$match': {'product_id': {'$in': missing}}},
+                {'$group': {'_id': '$product_id', 'count': {'$sum': '$count'}}}
+            ]
+            for group in self.collection.aggregate(pipeline, session=session):
+                counted[group['_id']] = group['count']
+        except Exception as e:
+            if session is not None and isinstance(e, PyMongoError):
+                raise
+            raise Exception(f"Failed to read stock counters: {e}")
+
+        for product_id, total in counted.items():
+            self.levels.set(product_id, total)
+        totals.update(counted)
+        return totals
+
+    def decrement(self, product_id: str, units: int, shards: int, session=None) -> bool:
+        """Take units from stock; False when all shards together hold too few"""
+        shard = random.randrange(shards)
+        result = self.collection.update_one(
+            {'_id': self._counter_id(product_id, shard), 'count': {'$gte': units}},
+            {'$inc': {'count': -units}},
+            session=session
+        )
+        if result.modified_count:
+            return True
+        return self._decrement_across(product_id, units, session)
+
+    def _decrement_across(self, product_id: str, units: int, session=None) -> bool:
+        # The picked shard is short, so take the units from the fullest
+        # shards and flag the product for rebalancing
+        for attempt in range(3):
+            counters = list(self.collection.find({'product_id': product_id}, {'count': 1}, session=session))
+            if sum(counter['count'] for counter in counters) < units:
+                return False
+
+            taken = []
+            remaining = units
+            for counter in sorted(counters, key=lambda counter: -counter['count']):
+                take = min(counter['count'], remaining)
+                if take <= 0:
+                    continue
+                result = self.collection.update_one(
+                    {'_id': counter['_id'], 'count': {'$gte': take}},
+                    {'$inc': {'count': -take}},
+                    session=session
+                )
+                if result.modified_count:
+                    taken.append((counter['_id'], take))
+                    remaining -= take
+                if not remaining:
+                    break
+
+            if not remaining:
+                with self._lock:
+                    self._uneven.setdefault(product_id, time.monotonic())
+                return True
+
+            # Another checkout drained a shard first; give the units back and retry
+            for counter_id, take in taken:
+                self.collection.update_one({'_id': counter_id}, {'$inc': {'count': take}}, session=session)
+        return False
+
+    def increment(self, product_id: str, units: int, shards: int, session=None) -> None:
+        """Put units back into a randomly picked shard"""
+        self.collection.update_one(
+            {'_id': self._counter_id(product_id, random.randrange(shards))},
+            {'$inc': {'count': units}, '$setOnInsert': {'product_id': product_id}},
+            upsert=True,
+            session=session
+        )
+
+    def rebalance(self, product_id: str) -> int:
+        """Even out the shards of a product and return the units moved.
+
+        Units are taken from a full shard before they are added to an empty
+        one, so a concurrent checkout can at worst see too little stock for a
+        moment, never too much.
+        """
+        try:
+            counters = sorted(
+                self.collection.find({'product_id': product_id}, {'count': 1}),
+                key=lambda counter: -counter['count']
+            )
+            if not counters:
+                return 0
+            targets = self.split(sum(counter['count'] for counter in counters), len(counters))
+            surplus = [[c['_id'], c['count'] - t] for c, t in zip(counters, targets) if c['count'] > t]
+            deficit = [[c['_id'], t - c['count']] for c, t in zip(counters, targets) if c['count'] < t]
+
+            moved = 0
+            while surplus and deficit:
+                source, target = surplus[0], deficit[0]
+                amount = min(source[1], target[1])
+                result = self.collection.update_one(
+                    {'_id': source[0], 'count': {'$gte': amount}},
+                    {'$inc': {'count': -amount}}
+                )
+                if not result.modified_count:
+                    # Checkouts drained this shard meanwhile; leave it as it is
+                    surplus.pop(0)
+                    continue
+                self.collection.update_one({'_id': target[0]}, {'$inc': {'count': amount}})
+                moved += amount
+                source[1] -= amount
+                target[1] -= amount
+                if not source[1]:
+                    surplus.pop(0)
+                if not target[1]:
+                    deficit.pop(0)
+
+            with self._lock:
+                self._uneven.pop(product_id, None)
+                self._rebalanced_at[product_id] = time.monotonic()
+            return moved
+        except Exception as e:
+            raise Exception(f"Failed to rebalance stock counters: {e}")
+
+    def rebalance_due(self) -> int:
+        """Rebalance products whose shards went uneven, at most once per interval each"""
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                product_id for product_id in self._uneven
+                if now - self._rebalanced_at.get(product_id, 0.0) >= self.rebalance_interval
+            ]
+        moved = 0
+        for product_id in due:
+            moved += self.rebalance(product_id)
+        return moved
+
+@traced_operations
 class ProductOperations:
+    # Fields that may be requested through a projection
+    PROJECTABLE_FIELDS = (
+        'name', 'category', 'description', 'basePrice', 'image',
+        'specifications', 'in_stock', 'stock_quantity', 'stock_shards', 'created_at', 'updated_at'
+    )
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
     def __init__(self, db):
         self.collection = db.products
+        self.cache = CatalogCache(self.collection, db.meta)
+        self.stock = StockCounters(db.stock_counters)
+    
+    def _with_stock(self, products: List[Dict]) -> List[Dict]:
+        """Fill in stock_quantity and in_stock of sharded products from their counters.
+
+        Only for uncached reads; the pre-encoded catalog bodies carry no live stock.
+        """
+        sharded = [product for product in products if product.get('stock_shards')]
+        if sharded:
+            totals = self.stock.totals([product['id'] for product in sharded])
+            for product in sharded:
+                product['stock_quantity'] = totals.get(product['id'], 0)
+                product['in_stock'] = product.get('in_stock', True) is not False and product['stock_quantity'] > 0
+        return products
     
     def create_product(self, product_data: Dict) -> Dict:
         """Create a new product"""
@@ -361,29 +1022,34 @@ class ProductOperations:
             result = self.collection.insert_one(product_data)
             product_data['id'] = str(result.inserted_id)
             del product_data['_id']
+            self.cache.invalidate()
             
             return product_data
             
         except Exception as e:
             raise Exception(f"Failed to create product: {e}")
     
+    def catalog_version(self):
+        """Version token of the cached catalog, changes on every catalog write"""
+        return self.cache.version
+    
     def find_all_products(self) -> List[Dict]:
         """Find all products"""
         try:
-            products = list(self.collection.find().sort("created_at", -1))
-            
-            for product in products:
-                product['id'] = str(product['_id'])
-                del product['_id']
-            
-            return products
+            return self.cache.all()
         except Exception as e:
             raise Exception(f"Failed to find products: {e}")
     
     def find_product_by_id(self, product_id: str) -> Optional[Dict]:
         """Find product by ID"""
         try:
-            product = self.collection.find_one({"_id": ObjectId(product_id)})
+            product = self.cache.get(product_id)
+            if product:
+                return product
+
+            # Fall back to the database for products created by another
+            # worker since this worker's snapshot was last refreshed
+            product = self.collection.find_one({"_id": ObjectId(product_id)}, {"stock_quantity": 0})
             if product:
                 product['id'] = str(product['_id'])
                 del product['_id']
@@ -394,26 +1060,139 @@ class ProductOperations:
     def find_products_by_category(self, category: str) -> List[Dict]:
         """Find products by category"""
         try:
-            products = list(self.collection.find(
-                {"category": category}
-            ).sort("created_at", -1))
-            
-            for product in products:
-                product['id'] = str(product['_id'])
-                del product['_id']
-            
-            return products
+            return self.cache.by_category(category)
         except Exception as e:
             raise Exception(f"Failed to find products by category: {e}")
     
+    def find_products_page(self, category: str = None, limit: int = None,
+                           after: str = None, fields: List[str] = None) -> Dict:
+        """Find one page of products, newest first, using keyset pagination"""
+        if limit is None:
+            limit = self.DEFAULT_PAGE_SIZE
+        if limit < 1 or limit > self.MAX_PAGE_SIZE:
+            raise ValueError(f"Limit must be between 1 and {self.MAX_PAGE_SIZE}")
+
+        projection = None
+        if fields:
+            unknown = [field for field in fields if field not in self.PROJECTABLE_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            # created_at is always fetched because the cursor is built from it
+            projection = {field: 1 for field in fields}
+            projection['created_at'] = 1
+            if 'stock_quantity' in fields or 'in_stock' in fields:
+                projection['stock_shards'] = 1
+
+        query = keyset_filter(after)
+        if category:
+            query['category'] = category
+
+        try:
+            products = list(self.collection.find(query, projection)
+                            .sort([("created_at", -1), ("_id", -1)])
+                            .limit(limit + 1))
+        except Exception as e:
+            raise Exception(f"Failed to find products: {e}")
+
+        has_more = len(products) > limit
+        products = products[:limit]
+        next_cursor = None
+        if has_more:
+            last = products[-1]
+            next_cursor = encode_cursor(last['created_at'], last['_id'])
+
+        for product in products:
+            product['id'] = str(product['_id'])
+            del product['_id']
+        self._with_stock(products)
+        if fields:
+            # Drop the fields only fetched or derived for the cursor and stock
+            wanted = set(fields) | {'id'}
+            products = [{key: value for key, value in product.items() if key in wanted} for product in products]
+
+        return {'products': products, 'next_cursor': next_cursor}
+    
+    def stock_shards(self, product_id: str) -> int:
+        """Number of stock counters of a product as of the catalog snapshot, 0 if unsharded"""
+        product = self.cache.get(product_id)
+        return int((product or {}).get('stock_shards') or 0)
+    
+    def stock_level(self, product_id: str) -> Optional[Dict]:
+        """Current stock of one product for display, without rebuilding the catalog"""
+        if not ObjectId.is_valid(product_id):
+            return None
+        try:
+            product = self.collection.find_one(
+                {"_id": ObjectId(product_id)}, {"stock_quantity": 1, "stock_shards": 1, "in_stock": 1}
+            )
+            if product is None:
+                return None
+            product['id'] = product_id
+            self._with_stock([product])
+            quantity = product.get('stock_quantity')
+            return {
+                'product_id': product_id,
+                'stock_quantity': quantity,
+                'in_stock': product.get('in_stock', True) is not False and (quantity is None or quantity > 0)
+            }
+        except Exception as e:
+            raise Exception(f"Failed to read stock level: {e}")
+    
+    def enable_stock_shards(self, product_id: str, shards: int) -> int:
+        """Move a product's stock_quantity into ``shards`` counters and return the units moved"""
+        if shards < 2:
+            raise ValueError("A sharded product needs at least 2 stock counters")
+        try:
+            # Unsetting stock_quantity first means checkouts running meanwhile
+            # find no stock rather than too much
+            product = self.collection.find_one_and_update(
+                {"_id": ObjectId(product_id), "stock_shards": {"$exists": False}},
+                {"$set": {"stock_shards": shards, "updated_at": datetime.utcnow()}, "$unset": {"stock_quantity": ""}},
+                return_document=ReturnDocument.BEFORE
+            )
+            if product is None:
+                raise ValueError("Product not found or already sharded")
+            total = OrderOperations._parse_int_value(product.get('stock_quantity'))
+            self.stock.create(product_id, total, shards)
+            self.cache.invalidate()
+            return total
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to shard product stock: {e}")
+    
+    def disable_stock_shards(self, product_id: str) -> int:
+        """Fold a product's counters back into stock_quantity and return the units moved"""
+        try:
+            result = self.collection.update_one(
+                {"_id": ObjectId(product_id), "stock_shards": {"$exists": True}},
+                {"$set": {"stock_quantity": 0, "updated_at": datetime.utcnow()}, "$unset": {"stock_shards": ""}}
+            )
+            if not result.modified_count:
+                raise ValueError("Product not found or not sharded")
+            total = self.stock.drain(product_id)
+            self.collection.update_one({"_id": ObjectId(product_id)}, {"$inc": {"stock_quantity": total}})
+            self.cache.invalidate()
+            return total
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to unshard product stock: {e}")
+    
     def update_product(self, product_id: str, update_data: Dict) -> bool:
         """Update product information"""
         try:
             update_data['updated_at'] = datetime.utcnow()
+            update = {"$set": update_data}
+            if 'in_stock' in update_data:
+                # An explicit flag is the admin's, not the sold-out logic's
+                update["$unset"] = {"sold_out_by_stock": ""}
             result = self.collection.update_one(
                 {"_id": ObjectId(product_id)},
-                {"$set": update_data}
+                update
             )
+            if result.modified_count > 0:
+                self.cache.invalidate()
             return result.modified_count > 0
         except Exception as e:
             raise Exception(f"Failed to update product: {e}")
@@ -422,11 +1201,14 @@ class ProductOperations:
         """Delete product"""
         try:
             result = self.collection.delete_one({"_id": ObjectId(product_id)})
+            if result.deleted_count > 0:
+                self.cache.invalidate()
             return result.deleted_count > 0
         except Exception as e:
             raise Exception(f"Failed to delete product: {e}")
 
 # Cart Operations
+@traced_operations
 class CartOperations:
     def __init__(self, db):
         self.collection = db.carts
@@ -463,22 +1245,52 @@ class CartOperations:
             raise Exception(f"Failed to find cart: {e}")
     
     def add_item_to_cart(self, user_id: str, item_data: Dict) -> bool:
-        """Add item to cart"""
+        """Add item to cart, merging quantities for an item already in the cart"""
+        quantity = item_data.get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise ValueError("Quantity must be a positive integer")
         try:
-            # Find existing cart or create new one
-            cart = self.find_cart_by_user(user_id)
-            if not cart:
-                cart = self.create_cart(user_id)
-            
-            # Add item to cart
-            result = self.collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$push": {"items": item_data},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            return result.modified_count > 0
+            now = datetime.utcnow()
+            # Client values are wrapped in $literal so a string starting with
+            # "$" is not evaluated as a field path or expression
+            item_id = {"$literal": item_data.get('id')}
+            quantity = {"$literal": quantity}
+
+            # Single round trip: the pipeline update creates the cart when it
+            # does not exist yet and either bumps the quantity of the matching
+            # item or appends the new one
+            pipeline = [
+                {"$set": {
+                    "items": {"$let": {
+                        "vars": {"items": {"$ifNull": ["$items", []]}},
+                        "in": {"$cond": [
+                            {"$in": [item_id, "$$items.id"]},
+                            {"$map": {
+                                "input": "$$items",
+                                "as": "item",
+                                "in": {"$cond": [
+                                    {"$eq": ["$$item.id", item_id]},
+                                    {"$mergeObjects": ["$$item", {
+                                        "quantity": {"$add": [{"$ifNull": ["$$item.quantity", 0]}, quantity]}
+                                    }]},
+                                    "$$item"
+                                ]}
+                            }},
+                            {"$concatArrays": ["$$items", [{"$literal": item_data}]]}
+                        ]}
+                    }},
+                    "created_at": {"$ifNull": ["$created_at", now]},
+                    "updated_at": now
+                }}
+            ]
+
+            try:
+                result = self.collection.update_one({"user_id": user_id}, pipeline, upsert=True)
+            except DuplicateKeyError:
+                # A concurrent first add created the cart; the retry matches it
+                result = self.collection.update_one({"user_id": user_id}, pipeline, upsert=True)
+
+            return result.modified_count > 0 or result.upserted_id is not None
         except Exception as e:
             raise Exception(f"Failed to add item to cart: {e}")
     
@@ -512,43 +1324,61 @@ class CartOperations:
         except Exception as e:
             raise Exception(f"Failed to remove item from cart: {e}")
     
-    def clear_cart(self, user_id: str) -> bool:
-        """Clear all items from cart"""
+    def clear_cart(self, user_id: str, session=None) -> bool:
+        """Clear all items from cart, creating an empty cart if none exists"""
         try:
-            print(f"🛒 Clearing cart for user: {user_id}")
-            
-            # Check if cart exists first
-            cart = self.find_cart_by_user(user_id)
-            if not cart:
-                print(f"⚠️ No cart found for user {user_id}, creating empty cart")
-                self.create_cart(user_id)
-                return True
+            now = datetime.utcnow()
+            update = {
+                "$set": {
+                    "items": [],
+                    "updated_at": now
+                },
+                "$setOnInsert": {"created_at": now}
+            }
             
-            result = self.collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$set": {
-                        "items": [],
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
+            try:
+                result = self.collection.update_one({"user_id": user_id}, update, upsert=True, session=session)
+            except DuplicateKeyError:
+                # A concurrent request created the cart; the retry matches it
+                result = self.collection.update_one({"user_id": user_id}, update, upsert=True, session=session)
             
-            success = result.modified_count > 0 or result.matched_count > 0
-            print(f"🛒 Cart clear result - matched: {result.matched_count}, modified: {result.modified_count}")
-            return success
+            logger.debug('cart_cleared', extra={'fields': {
+                'user_id': user_id,
+                'created': result.upserted_id is not None
+            }})
+            return True
             
         except Exception as e:
-            print(f"💥 Error clearing cart: {e}")
+            # Keep transaction error labels for OrderPlacement's retries
+            if session is not None and isinstance(e, PyMongoError):
+                raise
             raise Exception(f"Failed to clear cart: {str(e)}")
 
 # Review Operations
+@traced_operations
 class ReviewOperations:
+    LISTING_PROJECTION = {
+        'product_id': 1,
+        'rating': 1,
+        'comment': 1,
+        'created_at': 1,
+        'user_name': 1
+    }
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
     def __init__(self, db):
         self.collection = db.reviews
+        # Per-product rating summaries: {_id: product_id, count, sum, distribution: {"1".."5": n}}
+        self.rating_stats = db.product_ratings
+    
+    @staticmethod
+    def rating_bucket(rating) -> str:
+        """Distribution bucket ("1".."5") a rating is counted in"""
+        return str(min(max(int(round(rating)), 1), 5))
     
     def create_review(self, review_data: Dict) -> Dict:
-        """Create a new review"""
+        """Create a new review and fold its rating into the product summary"""
         try:
             review_data['created_at'] = datetime.utcnow()
             review_data['_id'] = ObjectId()
@@ -557,72 +1387,64 @@ class ReviewOperations:
             review_data['id'] = str(result.inserted_id)
             del review_data['_id']
             
+            rating = review_data['rating']
+            self.rating_stats.update_one(
+                {"_id": review_data['product_id']},
+                {"$inc": {
+                    "count": 1,
+                    "sum": rating,
+                    f"distribution.{self.rating_bucket(rating)}": 1
+                }},
+                upsert=True
+            )
+            
             return review_data
             
         except Exception as e:
             raise Exception(f"Failed to create review: {e}")
     
-    def find_reviews_by_product(self, product_id: str) -> List[Dict]:
-        """Find all reviews for a product"""
+    def find_reviews_by_product(self, product_id: str, limit: int = None, after: str = None) -> Dict:
+        """Find one page of reviews for a product, newest first"""
+        if limit is None:
+            limit = self.DEFAULT_PAGE_SIZE
+        if limit < 1 or limit > self.MAX_PAGE_SIZE:
+            raise ValueError(f"Limit must be between 1 and {self.MAX_PAGE_SIZE}")
+
+        query = keyset_filter(after)
+        query['product_id'] = product_id
+
         try:
-            # Aggregate reviews with user information
-            pipeline = [
-                {"$match": {"product_id": product_id}},
-                {"$lookup": {
-                    "from": "users",
-                    "localField": "user_id",
-                    "foreignField": "_id",
-                    "as": "user_info"
-                }},
-                {"$unwind": "$user_info"},
-                {"$project": {
-                    "product_id": 1,
-                    "rating": 1,
-                    "comment": 1,
-                    "created_at": 1,
-                    "user_name": "$user_info.name"
-                }},
-                {"$sort": {"created_at": -1}}
-            ]
-            
-            reviews = list(self.collection.aggregate(pipeline))
-            
-            for review in reviews:
-                review['id'] = str(review['_id'])
-                del review['_id']
-            
-            return reviews
+            reviews = list(self.collection.find(query, self.LISTING_PROJECTION)
+                           .sort([("created_at", -1), ("_id", -1)])
+                           .limit(limit + 1))
         except Exception as e:
             raise Exception(f"Failed to find reviews: {e}")
+
+        has_more = len(reviews) > limit
+        reviews = reviews[:limit]
+        next_cursor = None
+        if has_more:
+            last = reviews[-1]
+            next_cursor = encode_cursor(last['created_at'], last['_id'])
+
+        for review in reviews:
+            review['id'] = str(review['_id'])
+            del review['_id']
+            review.setdefault('user_name', None)
+
+        return {'reviews': reviews, 'next_cursor': next_cursor}
     
     def get_product_rating_stats(self, product_id: str) -> Dict:
         """Get rating statistics for a product"""
         try:
-            pipeline = [
-                {"$match": {"product_id": product_id}},
-                {"$group": {
-                    "_id": None,
-                    "average_rating": {"$avg": "$rating"},
-                    "total_reviews": {"$sum": 1},
-                    "rating_distribution": {
-                        "$push": "$rating"
-                    }
-                }}
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
+            stats = self.rating_stats.find_one({"_id": product_id})
             
-            if result:
-                stats = result[0]
-                # Calculate rating distribution
-                distribution = [0, 0, 0, 0, 0]
-                for rating in stats['rating_distribution']:
-                    distribution[rating - 1] += 1
-                
+            if stats and stats.get('count'):
+                distribution = stats.get('distribution', {})
                 return {
-                    'average_rating': round(stats['average_rating'], 1),
-                    'total_reviews': stats['total_reviews'],
-                    'rating_distribution': distribution
+                    'average_rating': round(stats['sum'] / stats['count'], 1),
+                    'total_reviews': stats['count'],
+                    'rating_distribution': [distribution.get(str(rating), 0) for rating in range(1, 6)]
                 }
             
             return {
@@ -634,35 +1456,533 @@ class ReviewOperations:
         except Exception as e:
             raise Exception(f"Failed to get rating stats: {e}")
 
+# Payment Operations
+@traced_operations
+class PaymentOperations:
+    def __init__(self, db):
+        self.collection = db.payments
+    
+    def create_payment(self, payment_data: Dict) -> Dict:
+        """Record a submitted payment"""
+        try:
+            payment_data['_id'] = payment_data['payment_id']
+            self.collection.insert_one(payment_data)
+            del payment_data['_id']
+            return payment_data
+        except Exception as e:
+            raise Exception(f"Failed to create payment: {e}")
+    
+    def update_payment(self, payment_id: str, update_data: Dict) -> bool:
+        """Record the outcome of a payment"""
+        try:
+            result = self.collection.update_one(
+                {"_id": payment_id},
+                {"$set": update_data}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            raise Exception(f"Failed to update payment: {e}")
+    
+    def find_payment_by_id(self, payment_id: str) -> Optional[Dict]:
+        """Find payment by ID"""
+        try:
+            payment = self.collection.find_one({"_id": payment_id})
+            if payment:
+                del payment['_id']
+            return payment
+        except Exception as e:
+            raise Exception(f"Failed to find payment: {e}")
+
+@traced_operations
+class RateLimitOperations:
+    """Shared window counters for services.rate_limit.RateLimiter"""
+
+    def __init__(self, db):
+        self.collection = db.rate_limits
+
+    @staticmethod
+    def _counter_id(key: str, window_start: float) -> str:
+        return f"{key}|{int(window_start)}"
+
+    def incr(self, key: str, window_start: float, ttl: float) -> int:
+        """Count a hit in a window and return the window's total"""
+        try:
+            counter = self.collection.find_one_and_update(
+                {"_id": self._counter_id(key, window_start)},
+                {
+                    "$inc": {"count": 1},
+                    "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(seconds=ttl)}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return counter['count']
+        except Exception as e:
+            raise Exception(f"Failed to count rate limit hit: {e}")
+
+    def get(self, key: str, window_start: float) -> int:
+        """Total hits recorded in a window"""
+        try:
+            counter = self.collection.find_one({"_id": self._counter_id(key, window_start)})
+            return counter['count'] if counter else 0
+        except Exception as e:
+            raise Exception(f"Failed to read rate limit counter: {e}")
+
+@traced_operations
+class IdempotencyOperations:
+    """Claims on client-supplied idempotency keys and their stored responses.
+
+    A claim is a document keyed by ``<user_id>:<key>``; the primary key makes
+    the first insert win. Claims expire through a TTL index on ``expires_at``.
+    """
+
+    IN_PROGRESS = 'in_progress'
+    COMPLETED = 'completed'
+
+    def __init__(self, db):
+        self.collection = db.idempotency_keys
+
+    @staticmethod
+    def _claim_id(user_id: str, key: str) -> str:
+        return f"{user_id}:{key}"
+
+    def claim(self, user_id: str, key: str, fingerprint: str, ttl: float, lease: float) -> Optional[Dict]:
+        """Claim a key for processing.
+
+        Returns ``None`` when the caller now owns the key, otherwise the
+        existing claim. An in-progress claim whose lease has run out (its
+        owner died) is taken over.
+        """
+        now = datetime.utcnow()
+        claim = {
+            '_id': self._claim_id(user_id, key),
+            'user_id': user_id,
+            'fingerprint': fingerprint,
+            'state': self.IN_PROGRESS,
+            'created_at': now,
+            'locked_until': now + timedelta(seconds=lease),
+            'expires_at': now + timedelta(seconds=ttl)
+        }
+        # A claim can expire between the insert and the lookup; try again then
+        for _ in range(3):
+            try:
+                self.collection.insert_one(claim)
+                return None
+            except DuplicateKeyError:
+                pass
+            except Exception as e:
+                raise Exception(f"Failed to claim idempotency key: {e}")
+
+            try:
+                taken_over = self.collection.find_one_and_update(
+                    {
+                        '_id': claim['_id'],
+                        'state': self.IN_PROGRESS,
+                        'fingerprint': fingerprint,
+                        'locked_until': {'$lt': now}
+                    },
+                    {'$set': {'locked_until': claim['locked_until']}}
+                )
+                existing = None if taken_over else self.find_claim(user_id, key)
+            except Exception as e:
+                raise Exception(f"Failed to claim idempotency key: {e}")
+            if taken_over:
+                return None
+            if existing:
+                return existing
+        raise Exception("Failed to claim idempotency key: claim keeps disappearing")
+
+    def find_claim(self, user_id: str, key: str) -> Optional[Dict]:
+        try:
+            return self.collection.find_one({'_id': self._claim_id(user_id, key)})
+        except Exception as e:
+            raise Exception(f"Failed to find idempotency key: {e}")
+
+    def complete(self, user_id: str, key: str, status: int, body: str) -> bool:
+        """Store the response to replay for this key"""
+        try:
+            result = self.collection.update_one(
+                {'_id': self._claim_id(user_id, key)},
+                {'$set': {
+                    'state': self.COMPLETED,
+                    'response': {'status': status, 'body': body},
+                    'completed_at': datetime.utcnow()
+                }}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            raise Exception(f"Failed to store idempotent response: {e}")
+
+    def release(self, user_id: str, key: str) -> bool:
+        """Drop an unfinished claim so the client can retry"""
+        try:
+            result = self.collection.delete_one(
+                {'_id': self._claim_id(user_id, key), 'state': self.IN_PROGRESS}
+            )
+            return result.deleted_count > 0
+        except Exception as e:
+            raise Exception(f"Failed to release idempotency key: {e}")
+
+class InsufficientStock(ValueError):
+    """Raised when an order asks for more units than a product has left"""
+
+    def __init__(self, product_ids: List[str]):
+        super().__init__("Insufficient stock for: " + ", ".join(product_ids))
+        self.product_ids = product_ids
+
+class OrderPlacementConflict(Exception):
+    """Raised when an order keeps losing write conflicts on hot products"""
+
+@traced_operations
+class OrderPlacement:
+    """Places an order, reserves its stock and clears the cart together.
+
+    On replica sets and sharded clusters the three writes run in one
+    multi-document transaction, retried a bounded number of times when hot
+    products cause write conflicts. Standalone servers have no transactions,
+    so stock is reserved with the same conditional updates and given back
+    with compensating writes if a later step fails.
+
+    Products with ``stock_shards`` reserve from their stock counters (see
+    ``StockCounters``). Products without ``stock_quantity`` and items that
+    do not reference a catalog product (e.g. gift items) are not stock
+    tracked.
+    """
+
+    def __init__(self, db, orders: 'OrderOperations', carts: 'CartOperations',
+                 products: 'ProductOperations', mode: str = None, max_retries: int = None):
+        self.db = db
+        self.products_collection = db.products
+        self.orders = orders
+        self.carts = carts
+        self.products = products
+        if mode is None:
+            mode = os.getenv('ORDER_TRANSACTIONS', 'auto')
+        if max_retries is None:
+            max_retries = int(os.getenv('ORDER_PLACEMENT_RETRIES', '5'))
+        self.mode = mode
+        self.max_retries = max_retries
+        self._supports_transactions = None
+        self._stats_lock = threading.Lock()
+        self.stats = {'placed': 0, 'retries': 0, 'conflicts': 0, 'insufficient': 0, 'compensations': 0}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @staticmethod
+    def stock_units(item: Dict) -> int:
+        """Pieces of glass an order line takes from stock"""
+        quantity = OrderOperations._parse_int_value(item.get('quantity')) or 1
+        customization = item.get('customization') or {}
+        pieces = OrderOperations._parse_int_value(customization.get('quantity')) or 1
+        return max(quantity, 1) * max(pieces, 1)
+
+    @staticmethod
+    def product_id_of(item: Dict) -> Optional[str]:
+        """Catalog product referenced by an order line.
+
+        Cart lines carry ids like ``<product id>-<timestamp>``.
+        """
+        candidate = str(item.get('product_id') or item.get('id') or '').split('-', 1)[0]
+        return candidate if ObjectId.is_valid(candidate) else None
+
+    @classmethod
+    def requested_stock(cls, items: List[Dict]) -> List[Tuple[str, int]]:
+        """Units per product, sorted by id so concurrent orders lock in the same order"""
+        requested: Dict[str, int] = {}
+        for item in items:
+            product_id = cls.product_id_of(item)
+            if product_id:
+                requested[product_id] = requested.get(product_id, 0) + cls.stock_units(item)
+        return sorted(requested.items())
+
+    def supports_transactions(self) -> bool:
+        if self.mode in ('on', 'off'):
+            return self.mode == 'on'
+        if self._supports_transactions is None:
+            try:
+                hello = self.db.client.admin.command('hello')
+                self._supports_transactions = bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+            except Exception as e:
+                logger.warning('transaction_support_check_failed', extra={'fields': {'error': str(e)}})
+                return False
+        return self._supports_transactions
+
+    def _reserve(self, product_id: str, units: int, session=None) -> bool:
+        """Take units from stock; False when the product is tracked but short"""
+        shards = self.products.stock_shards(product_id)
+        if self._take(product_id, units, shards, session):
+            return True
+        product = self.products_collection.find_one(
+            {"_id": ObjectId(product_id)}, {"stock_quantity": 1, "stock_shards": 1}, session=session
+        )
+        # Unknown products and products without a stock level are not tracked
+        if product is None or (product.get('stock_quantity') is None and not product.get('stock_shards')):
+            return True
+        actual = int(product.get('stock_shards') or 0)
+        if actual != shards:
+            # Sharded or unsharded since this worker's catalog snapshot
+            return self._take(product_id, units, actual, session)
+        return False
+
+    def _take(self, product_id: str, units: int, shards: int, session=None) -> bool:
+        if shards:
+            return self.products.stock.decrement(product_id, units, shards, session)
+        result = self.products_collection.update_one(
+            {"_id": ObjectId(product_id), "stock_quantity": {"$gte": units}},
+            {"$inc": {"stock_quantity": -units}, "$set": {"updated_at": datetime.utcnow()}},
+            session=session
+        )
+        return bool(result.modified_count)
+
+    def _mark_sold_out(self, product_ids: List[str], session=None) -> bool:
+        """Flag products that ran out as not in stock; True if any flag changed"""
+        sharded = [pid for pid in product_ids if self.products.stock_shards(pid)]
+        sold_out = []
+        if sharded:
+            totals = self.products.stock.totals(sharded, fresh=True, session=session)
+            sold_out = [pid for pid in sharded if totals.get(pid, 0) <= 0]
+        result = self.products_collection.update_many(
+            {"in_stock": {"$ne": False}, "$or": [
+                {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}, "stock_quantity": {"$lte": 0}},
+                {"_id": {"$in": [ObjectId(pid) for pid in sold_out]}}
+            ]},
+            # Tagged so a compensated order restores only flags the stock flipped
+            {"$set": {"in_stock": False, "sold_out_by_stock": True}},
+            session=session
+        )
+        return bool(result.modified_count)
+
+    def _place_in_transaction(self, order_data: Dict, requested: List[Tuple[str, int]], normalized: bool) -> Dict:
+        delay = 0.01
+        for attempt in range(self.max_retries + 1):
+            with self.db.client.start_session() as session:
+                try:
+                    with session.start_transaction():
+                        short = [pid for pid, units in requested if not self._reserve(pid, units, session)]
+                        if short:
+                            raise InsufficientStock(short)
+                        order = self.orders.create_order(order_data, session=session, normalized=normalized)
+                        self.carts.clear_cart(order_data['user_id'], session=session)
+                        sold_out = bool(requested) and self._mark_sold_out([pid for pid, _ in requested], session)
+                        self._commit(session)
+                    # Only now can other workers rebuild from the flipped flags
+                    if sold_out:
+                        self.products.cache.invalidate()
+                    return order
+                except PyMongoError as e:
+                    if not e.has_error_label('TransientTransactionError') or attempt == self.max_retries:
+                        if e.has_error_label('TransientTransactionError'):
+                            self._count('conflicts')
+                            raise OrderPlacementConflict("Too many concurrent orders for these products, please retry")
+                        raise
+                    self._count('retries')
+                    order_data.pop('_id', None)
+            # Jittered backoff so hot-product retries do not collide again
+            time.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, 0.2)
+        raise OrderPlacementConflict("Too many concurrent orders for these products, please retry")
+
+    def _commit(self, session) -> None:
+        # Retrying the commit (not the transaction) cannot place the order twice
+        for attempt in range(self.max_retries + 1):
+            try:
+                session.commit_transaction()
+                return
+            except PyMongoError as e:
+                if not e.has_error_label('UnknownTransactionCommitResult') or attempt == self.max_retries:
+                    raise
+
+    def _place_with_compensation(self, order_data: Dict, requested: List[Tuple[str, int]], normalized: bool) -> Dict:
+        reserved: List[Tuple[str, int]] = []
+        try:
+            for product_id, units in requested:
+                if not self._reserve(product_id, units):
+                    raise InsufficientStock([product_id])
+                reserved.append((product_id, units))
+            order = self.orders.create_order(order_data, normalized=normalized)
+        except Exception:
+            self._release(reserved)
+            raise
+
+        if requested:
+            try:
+                if self._mark_sold_out([pid for pid, _ in requested]):
+                    self.products.cache.invalidate()
+            except Exception as e:
+                logger.warning('sold_out_flag_failed', extra={'fields': {'error': str(e)}})
+        try:
+            self.carts.clear_cart(order_data['user_id'])
+        except Exception as e:
+            # The order stands; a stale cart only costs the user a click
+            logger.warning('cart_clear_failed', extra={'fields': {'error': str(e)}})
+        return order
+
+    def _release(self, reserved: List[Tuple[str, int]]) -> None:
+        """Compensate reservations of an order that was not placed"""
+        restocked = False
+        for product_id, units in reserved:
+            try:
+                shards = self.products.stock_shards(product_id)
+                if shards:
+                    self.products.stock.increment(product_id, units, shards)
+                else:
+                    self.products_collection.update_one({"_id": ObjectId(product_id)}, {"$inc": {"stock_quantity": units}})
+                # A product an admin took off sale stays off sale
+                result = self.products_collection.update_one(
+                    {"_id": ObjectId(product_id), "in_stock": False, "sold_out_by_stock": True},
+                    {"$set": {"in_stock": True}, "$unset": {"sold_out_by_stock": ""}}
+                )
+                restocked = restocked or bool(result.modified_count)
+                self._count('compensations')
+            except Exception as e:
+                logger.error('stock_release_failed', extra={'fields': {
+                    'product_id': product_id, 'units': units, 'error': str(e)
+                }})
+        if restocked:
+            self.products.cache.invalidate()
+
+    def place_order(self, order_data: Dict, normalized: bool = False) -> Dict:
+        """Create the order, reserve stock and clear the user's cart.
+
+        ``normalized`` is passed on to ``OrderOperations.create_order``.
+        """
+        requested = self.requested_stock(order_data.get('items') or [])
+        try:
+            if self.supports_transactions():
+                order = self._place_in_transaction(order_data, requested, normalized)
+            else:
+                order = self._place_with_compensation(order_data, requested, normalized)
+        except InsufficientStock:
+            self._count('insufficient')
+            raise
+        self._count('placed')
+        try:
+            self.products.stock.rebalance_due()
+        except Exception as e:
+            logger.warning('stock_rebalance_failed', extra={'fields': {'error': str(e)}})
+        return order
+
 # Main Database Class
 class EdgecraftDB:
+    STATS_COLLECTIONS = ('users', 'products', 'carts', 'orders', 'reviews')
+
     def __init__(self):
         self.mongodb = MongoDB()
+        self.stats_cache_seconds = float(os.getenv('DB_STATS_CACHE_SECONDS', '30'))
+        self.ping_cache_seconds = float(os.getenv('DB_PING_CACHE_SECONDS', '2'))
+        self.ping_timeout = float(os.getenv('DB_PING_TIMEOUT_SECONDS', '1'))
+        self._stats = None
+        self._stats_at = 0.0
+        self._ping = None
+        self._ping_at = 0.0
+        self._probe_lock = threading.Lock()
         self.users = UserOperations(self.mongodb.db)
         self.products = ProductOperations(self.mongodb.db)
         self.carts = CartOperations(self.mongodb.db)
         self.orders = OrderOperations(self.mongodb.db)
         self.reviews = ReviewOperations(self.mongodb.db)
+        self.payments = PaymentOperations(self.mongodb.db)
+        self.rate_limits = RateLimitOperations(self.mongodb.db)
+        self.idempotency = IdempotencyOperations(self.mongodb.db)
+        self.checkout = OrderPlacement(self.mongodb.db, self.orders, self.carts, self.products)
     
     def close(self):
         """Close database connection"""
         self.mongodb.close_connection()
     
     def get_db_stats(self) -> Dict:
-        """Get database statistics"""
+        """Get database statistics.
+
+        Counts come from collection metadata (``estimated_document_count``)
+        and are reused for ``DB_STATS_CACHE_SECONDS``.
+        """
+        with self._probe_lock:
+            if self._stats is not None and time.monotonic() - self._stats_at < self.stats_cache_seconds:
+                return dict(self._stats)
         try:
+            database = self.mongodb.db
             stats = {
-                'users_count': self.mongodb.db.users.count_documents({}),
-                'products_count': self.mongodb.db.products.count_documents({}),
-                'carts_count': self.mongodb.db.carts.count_documents({}),
-                'orders_count': self.mongodb.db.orders.count_documents({}),
-                'reviews_count': self.mongodb.db.reviews.count_documents({}),
-                'database_name': self.mongodb.db.name,
-                'collections': self.mongodb.db.list_collection_names()
+                f"{name}_count": getattr(database, name).estimated_document_count()
+                for name in self.STATS_COLLECTIONS
             }
-            return stats
+            stats['database_name'] = database.name
+            stats['collections'] = database.list_collection_names()
         except Exception as e:
             raise Exception(f"Failed to get database stats: {e}")
+        with self._probe_lock:
+            self._stats = stats
+            self._stats_at = time.monotonic()
+        return dict(stats)
+
+    def ping(self) -> bool:
+        """Ping the server within DB_PING_TIMEOUT_SECONDS.
+
+        The outcome is reused for ``DB_PING_CACHE_SECONDS`` so frequent
+        readiness probes cost at most one round trip per interval.
+        """
+        with self._probe_lock:
+            if self._ping is not None and time.monotonic() - self._ping_at < self.ping_cache_seconds:
+                return self._ping
+        try:
+            with pymongo.timeout(self.ping_timeout):
+                self.mongodb.client.admin.command('ping')
+            ok = True
+        except Exception as e:
+            logger.warning('db_ping_failed', extra={'fields': {'error': str(e)}})
+            ok = False
+        with self._probe_lock:
+            self._ping = ok
+            self._ping_at = time.monotonic()
+        return ok
+
+class LazyEdgecraftDB:
+    """Process-local handle that creates EdgecraftDB on first use.
+
+    Importing this module does no network I/O. Each process, including every
+    forked gunicorn worker, opens its own MongoClient the first time it
+    touches the database, so clients are never shared across a fork.
+    """
+
+    def __init__(self, factory=EdgecraftDB):
+        self._factory = factory
+        self._instance = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> EdgecraftDB:
+        pid = os.getpid()
+        if self._instance is None or self._pid != pid:
+            with self._lock:
+                if self._instance is None or self._pid != pid:
+                    self._instance = self._factory()
+                    self._pid = pid
+        return self._instance
+
+    def __getattr__(self, name):
+        # Introspection (mock, copy, inspect) must not open a connection
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._get(), name)
+
+    @property
+    def connected(self) -> bool:
+        """Whether this process has already opened its database handle"""
+        return self._instance is not None and self._pid == os.getpid()
+
+    def reset(self) -> None:
+        """Forget a handle inherited from the parent process (gunicorn post_fork)"""
+        self._lock = threading.Lock()
+        self._instance = None
+        self._pid = None
+
+    def close(self) -> None:
+        """Close this process's connection if one was opened"""
+        if self.connected:
+            self._instance.close()
+        self._instance = None
+        self._pid = None
 
-# Initialize database instance
-db = EdgecraftDB()
+# Initialize database handle; connects lazily on first use in each process
+db = LazyEdgecraftDB()
@@ -0,0 +1,106 @@
+"""
+Gunicorn configuration for Edgecraft Glass API
+
+Workers and threads are sized from the CPU count and can be overridden per
+deploy through environment variables:
+
+    WEB_CONCURRENCY              number of worker processes
+    GUNICORN_MAX_WORKERS         cap for the CPU based default (8)
+    GUNICORN_WORKER_CLASS        gthread, gevent, sync or auto (default)
+    GUNICORN_THREADS             threads per gthread worker (4)
+    GUNICORN_WORKER_CONNECTIONS  concurrent connections per gevent worker (1000)
+    GUNICORN_TIMEOUT             worker timeout in seconds (30)
+    GUNICORN_KEEPALIVE           keep-alive in seconds (5)
+    GUNICORN_MAX_REQUESTS        recycle workers after N requests (1000)
+    GUNICORN_MAX_REQUESTS_JITTER random spread for recycling (100)
+    GUNICORN_PRELOAD             load the app before forking (true for gthread)
+    GUNICORN_ACCESS_LOG          access log target, off unless set (e.g. "-")
+    GUNICORN_LOG_LEVEL           error log level (info)
+    METRICS_MULTIPROC_DIR        where workers share metrics snapshots
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.lower() in ('1', 'true', 'yes') if value else default
+
+def _select_worker_class() -> str:
+    """Use gevent when it is installed, threaded sync workers otherwise"""
+    requested = os.getenv('GUNICORN_WORKER_CLASS', 'auto')
+    if requested != 'auto':
+        return requested
+    try:
+        import gevent  # noqa: F401
+        return 'gevent'
+    except ImportError:
+        return 'gthread'
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+worker_class = _select_worker_class()
+workers = _env_int('WEB_CONCURRENCY', min(cpu_count * 2 + 1, _env_int('GUNICORN_MAX_WORKERS', 8)))
+threads = _env_int('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 1000)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Preloading is safe because the database handle connects lazily per worker
+# (see post_fork). gevent patches the standard library after the fork, so it
+# must import the app in the worker instead.
+preload_app = _env_bool('GUNICORN_PRELOAD', worker_class != 'gevent')
+
+# Workers write metrics snapshots here so /api/metrics can report on all of them
+os.environ.setdefault(
+    'METRICS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), f"edgecraft-metrics-{bind.rsplit(':', 1)[-1]}")
+)
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def on_starting(server):
+    from services.metrics import MultiProcessStore
+    MultiProcessStore(None, os.environ['METRICS_MULTIPROC_DIR']).clear()
+
+def when_ready(server):
+    server.log.info(
+        "Edgecraft Glass API ready: %s workers x %s threads (%s), preload=%s",
+        workers, threads, worker_class, preload_app
+    )
+
+def post_fork(server, worker):
+    """Give each worker its own MongoDB client instead of the parent's"""
+    from database.mongodb import db
+    db.reset()
+    server.log.info("Worker %s spawned", worker.pid)
+
+def worker_int(worker):
+    worker.log.info("Worker %s interrupted", worker.pid)
+
+def worker_abort(worker):
+    worker.log.warning("Worker %s aborted (timeout after %ss)", worker.pid, timeout)
+
+def worker_exit(server, worker):
+    from services import metrics
+    if metrics.multiprocess:
+        metrics.multiprocess.flush()
+    server.log.info("Worker %s exited", worker.pid)
+
+def child_exit(server, worker):
+    """Runs in the master after a worker process has been reaped"""
+    from services.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+    server.log.info("Worker %s reaped", worker.pid)
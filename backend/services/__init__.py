@@ -0,0 +1 @@
+# Application Services Package for Edgecraft Glass Platform
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Bulk order import and export for Edgecraft Glass Platform
+
+Both directions speak NDJSON (one JSON document per line) and stream: the
+import reads the request body line by line and inserts orders in chunks
+with one unordered ``insert_many`` each, writing a result line per input
+line as soon as its chunk is stored; the export writes orders straight
+from a server-side cursor. Memory use is bounded by the chunk size either
+way, not by the number of orders.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.orders import OrderValidator, OrderValidationError
+
+logger = logging.getLogger('edgecraft.bulk_orders')
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Fields an imported order may set; anything else on the line is ignored
+IMPORT_FIELDS = ('user_id', 'items', 'total_amount', 'payment_method', 'billing_info',
+                 'status', 'order_number', 'external_id')
+
+def read_ndjson(stream, max_line_bytes: int) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """Yield ``(line number, document, error)`` for each non-blank line of a stream"""
+    number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Skip the rest of an oversized line without holding it in memory
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes)
+            yield number, None, f'Line is longer than {max_line_bytes} bytes'
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f'Invalid JSON: {e}'
+
+def to_ndjson(document: Dict, dumps: Callable[[Any], str] = json.dumps) -> bytes:
+    return (dumps(document) + '\n').encode('utf-8')
+
+class OrderImporter:
+    """Validates NDJSON order lines and inserts them in chunks.
+
+    ``create_orders`` is ``OrderOperations.create_orders``; each chunk is a
+    single unordered ``insert_many``, so one bad row does not stop the rest.
+    Imported orders do not reserve stock or touch carts.
+    """
+
+    def __init__(self, validator: OrderValidator, create_orders: Callable[[List[Dict]], List[Dict]],
+                 chunk_size: int = None, max_line_bytes: int = None):
+        if chunk_size is None:
+            chunk_size = int(os.getenv('ORDER_IMPORT_CHUNK_SIZE', '500'))
+        if max_line_bytes is None:
+            max_line_bytes = int(os.getenv('ORDER_IMPORT_MAX_LINE_BYTES', str(1024 * 1024)))
+        self.validator = validator
+        self.create_orders = create_orders
+        self.chunk_size = chunk_size
+        self.max_line_bytes = max_line_bytes
+
+    def prepare(self, document: Any) -> Dict:
+        """Turn one NDJSON document into order data ready for insertion"""
+        if not isinstance(document, dict):
+            raise OrderValidationError('Order must be a JSON object')
+        missing = [field for field in ('user_id', 'items', 'total_amount', 'payment_method', 'billing_info')
+                   if field not in document]
+        if missing:
+            raise OrderValidationError(f'Missing required fields: {", ".join(missing)}')
+        if not isinstance(document['user_id'], str) or not document['user_id']:
+            raise OrderValidationError('user_id must be a non-empty string')
+        if not isinstance(document['billing_info'], dict):
+            raise OrderValidationError('billing_info must be an object')
+        for field in ('status', 'order_number', 'external_id'):
+            if field in document and not isinstance(document[field], str):
+                raise OrderValidationError(f'{field} must be a string')
+
+        validated = self.validator.validate(document['items'], document['total_amount'])
+        order_data = {field: document[field] for field in IMPORT_FIELDS if field in document}
+        order_data['items'] = validated.items
+        order_data['total_amount'] = validated.total_amount
+        order_data.setdefault('status', 'confirmed')
+        order_data['source'] = 'import'
+        return order_data
+
+    def run(self, lines: Iterable[Tuple[int, Any, Optional[str]]]) -> Iterator[Dict]:
+        """Yield one result per input line, in input order, then a summary"""
+        summary = {'created': 0, 'failed': 0}
+        # (line number, order data, error) for each line of the current chunk
+        chunk: List[Tuple[int, Optional[Dict], Optional[str]]] = []
+        pending = 0
+
+        def flush() -> Iterator[Dict]:
+            orders = [order_data for _, order_data, _ in chunk if order_data is not None]
+            stored = iter(self.create_orders(orders, normalized=True) if orders else [])
+            for number, order_data, error in chunk:
+                result = next(stored) if order_data is not None else {'error': error}
+                if 'order' in result:
+                    summary['created'] += 1
+                    order = result['order']
+                    yield {'line': number, 'status': 'created', 'id': order['id'],
+                           'order_number': order['order_number']}
+                else:
+                    summary['failed'] += 1
+                    yield {'line': number, 'status': 'error', 'error': result['error']}
+            chunk.clear()
+
+        for number, document, error in lines:
+            order_data = None
+            if error is None:
+                try:
+                    order_data = self.prepare(document)
+                    pending += 1
+                except OrderValidationError as e:
+                    error = str(e)
+            chunk.append((number, order_data, error))
+            if pending >= self.chunk_size or len(chunk) >= self.chunk_size * 2:
+                yield from flush()
+                pending = 0
+        if chunk:
+            yield from flush()
+
+        logger.info('orders_imported', extra={'fields': dict(summary)})
+        yield {'summary': summary}
@@ -0,0 +1,146 @@
+"""
+Structured logging for Edgecraft Glass Platform
+
+Log records are handed to a queue and written as JSON lines by a background
+listener thread, so a request thread only pays for putting a record on the
+queue. When the queue is full records are dropped and counted rather than
+blocking the request.
+
+Events are logged with a short name and structured fields:
+
+    logger.info("order_created", extra={'fields': {'order_number': number}})
+    log_event(logger, logging.DEBUG, "order_payload", sample_rate=0.01, payload=data)
+
+``LOG_LEVEL`` (default INFO) sets the threshold; ``LOG_LEVEL=WARNING`` turns
+per-request logging off entirely.
+"""
+
+from datetime import datetime, timezone
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+
+from flask import g, has_request_context, request
+
+ROOT_LOGGER = 'edgecraft'
+
+_RESERVED = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'fields', 'request_id'}
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single JSON line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+            'pid': record.process
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestIdFilter(logging.Filter):
+    """Tags records with the id of the request that emitted them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks and owns one listener per process.
+
+    The listener thread is started on first use in each process, so a
+    handler configured before a gunicorn fork keeps working in the workers.
+    """
+
+    def __init__(self, target: logging.Handler, maxsize: int):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread, not in the request
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        """Flush queued records and stop this process's listener"""
+        if self._listener and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+def configure_logging(level: str = None, stream=None, queue_size: int = None) -> NonBlockingQueueHandler:
+    """Route the ``edgecraft`` loggers through a JSON queue handler"""
+    if level is None:
+        level = os.getenv('LOG_LEVEL', 'INFO')
+    if queue_size is None:
+        queue_size = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    target = logging.StreamHandler(stream or sys.stdout)
+    target.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(target, queue_size)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+        if isinstance(existing, NonBlockingQueueHandler):
+            existing.stop()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    root.propagate = False
+    return handler
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def log_event(logger: logging.Logger, level: int, event: str, sample_rate: float = 1.0, **fields) -> None:
+    """Log an event with fields, keeping only ``sample_rate`` of them"""
+    if not logger.isEnabledFor(level):
+        return
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.log(level, event, extra={'fields': fields})
+
+def new_request_id() -> str:
+    """Use the caller's X-Request-ID when present, otherwise make one"""
+    incoming = request.headers.get('X-Request-ID', '')
+    if incoming and len(incoming) <= 128:
+        return incoming
+    return uuid.uuid4().hex
@@ -0,0 +1,388 @@
+"""
+Prometheus-style metrics for Edgecraft Glass Platform
+
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format. Under gunicorn every worker keeps its
+own registry; when ``METRICS_MULTIPROC_DIR`` is set each worker periodically
+writes a snapshot there and ``/api/metrics`` merges the snapshots of all
+workers. The master archives a worker's counters when it exits (see
+``mark_process_dead``) so totals survive worker recycling.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger('edgecraft.metrics')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE_FILE = 'archive.json'
+
+class Metric:
+    """A metric family: one value per combination of label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def samples(self) -> Dict[Tuple[str, ...], object]:
+        with self._lock:
+            return {key: (list(value) if isinstance(value, list) else value)
+                    for key, value in self._values.items()}
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """Mirror a cumulative count kept elsewhere (e.g. cache statistics)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    """Values are ``[count per bucket..., sum, count]``"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._ratios: List[Tuple[str, str, str, str]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """Register a callback that refreshes metrics before each snapshot"""
+        self._collectors.append(collect)
+
+    def add_ratio(self, name: str, documentation: str, hits: str, misses: str) -> None:
+        """Expose ``hits / (hits + misses)`` per label set after merging"""
+        self._ratios.append((name, documentation, hits, misses))
+
+    def snapshot(self) -> Dict:
+        """Serializable state of every metric in this process"""
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.warning('metrics_collector_failed', extra={'fields': {'error': str(e)}})
+
+        families = {}
+        for metric in list(self._metrics.values()):
+            families[metric.name] = {
+                'kind': metric.kind,
+                'help': metric.documentation,
+                'labels': list(metric.labels),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': [[list(key), value] for key, value in metric.samples().items()]
+            }
+        return families
+
+    def render(self, snapshots: Iterable[Dict] = None) -> str:
+        """Prometheus text format for this process or for merged snapshots"""
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        return render(merge(snapshots), self._ratios)
+
+def merge(snapshots: Iterable[Dict]) -> Dict:
+    """Add up snapshots from several processes"""
+    merged: Dict[str, Dict] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, dict(family, samples={}))
+            for key, value in family['samples']:
+                key = tuple(key)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = current + value
+    return merged
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def render(families: Dict, ratios: Iterable[Tuple[str, str, str, str]] = ()) -> str:
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        labels = family['labels']
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for key in sorted(family['samples']):
+            value = family['samples'][key]
+            if family['kind'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels, key)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(family['buckets'], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, key, {'le': repr(float(bound))})} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, key, {'le': '+Inf'})} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels, key)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels, key)} {value[-1]}")
+
+    for name, documentation, hits_name, misses_name in ratios:
+        hits = families.get(hits_name)
+        if not hits:
+            continue
+        misses = families.get(misses_name, {'samples': {}})['samples']
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for key in sorted(hits['samples']):
+            total = hits['samples'][key] + misses.get(key, 0)
+            ratio = hits['samples'][key] / total if total else 0
+            lines.append(f"{name}{_format_labels(hits['labels'], key)} {_format_value(round(ratio, 6))}")
+    return '\n'.join(lines) + '\n'
+
+class MultiProcessStore:
+    """Snapshot files shared by the gunicorn workers of one server"""
+
+    def __init__(self, registry: Registry, directory: str, flush_interval: float = 5.0):
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, name: str, data: Dict) -> None:
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, name: str) -> Optional[Dict]:
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self) -> None:
+        """Write this process's snapshot"""
+        self._write(f"{os.getpid()}.json", self.registry.snapshot())
+
+    def ensure_flusher(self) -> None:
+        """Start the background flush thread once per process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning('metrics_flush_failed', extra={'fields': {'error': str(e)}})
+
+    def collect(self) -> List[Dict]:
+        """Snapshots of every live worker plus the archive of exited ones"""
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') and name != f"{os.getpid()}.json":
+                snapshot = self._read(name)
+                if snapshot:
+                    snapshots.append(snapshot)
+        snapshots.append(self.registry.snapshot())
+        return snapshots
+
+    def mark_process_dead(self, pid: int) -> None:
+        """Fold an exited worker's counters into the archive, dropping its gauges"""
+        snapshot = self._read(f"{pid}.json")
+        if snapshot is None:
+            return
+        kept = {name: family for name, family in snapshot.items() if family['kind'] != 'gauge'}
+        archive = self._read(ARCHIVE_FILE) or {}
+        merged = merge([archive, kept])
+        for family in merged.values():
+            family['samples'] = [[list(key), value] for key, value in family['samples'].items()]
+        self._write(ARCHIVE_FILE, merged)
+        os.remove(self._path(f"{pid}.json"))
+
+    def clear(self) -> None:
+        """Remove snapshots left over from a previous server run"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                os.remove(self._path(name))
+
+# Metrics collected by the API
+registry = Registry()
+
+http_requests = registry.counter(
+    'edgecraft_http_requests_total', 'HTTP requests handled', ('method', 'route', 'status'))
+http_latency = registry.histogram(
+    'edgecraft_http_request_duration_seconds', 'HTTP request latency', ('method', 'route'))
+http_in_flight = registry.gauge(
+    'edgecraft_http_requests_in_flight', 'HTTP requests being handled', ('method', 'route'))
+mongo_latency = registry.histogram(
+    'edgecraft_mongo_command_duration_seconds', 'MongoDB command latency by data layer method',
+    ('operation', 'command'))
+mongo_failures = registry.counter(
+    'edgecraft_mongo_command_failures_total', 'Failed MongoDB commands', ('operation', 'command'))
+cache_hits = registry.counter('edgecraft_cache_hits_total', 'Cache hits', ('cache',))
+cache_misses = registry.counter('edgecraft_cache_misses_total', 'Cache misses', ('cache',))
+registry.add_ratio('edgecraft_cache_hit_ratio', 'Cache hits over lookups',
+                   'edgecraft_cache_hits_total', 'edgecraft_cache_misses_total')
+
+_multiproc_dir = os.getenv('METRICS_MULTIPROC_DIR')
+multiprocess = MultiProcessStore(
+    registry, _multiproc_dir, float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+) if _multiproc_dir else None
+
+def mark_process_dead(pid: int) -> None:
+    """Called from the gunicorn master when a worker exits"""
+    if multiprocess:
+        multiprocess.mark_process_dead(pid)
+
+def register_mongo_listener(current_operation: Callable[[], Optional[str]]) -> None:
+    """Time the commands of every MongoClient created from now on"""
+    monitoring.register(MongoCommandMetrics(current_operation))
+
+def exposition() -> str:
+    """Metrics text for every worker when multi-process mode is on"""
+    if multiprocess:
+        return registry.render(multiprocess.collect())
+    return registry.render()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command, labelled with the data layer method.
+
+    pymongo publishes command events on the thread that runs the command, so
+    the operation name set by ``database.mongodb.traced_operations`` is
+    still current when the event arrives.
+    """
+
+    def __init__(self, current_operation: Callable[[], Optional[str]]):
+        self.current_operation = current_operation
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_latency.observe(
+            event.duration_micros / 1e6,
+            operation=self.current_operation() or 'other',
+            command=event.command_name
+        )
+
+    def failed(self, event):
+        labels = {'operation': self.current_operation() or 'other', 'command': event.command_name}
+        mongo_latency.observe(event.duration_micros / 1e6, **labels)
+        mongo_failures.inc(**labels)
+
+def instrument_app(app) -> None:
+    """Count, time and track in-flight requests per route"""
+    from flask import request
+
+    def route_label() -> str:
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    @app.before_request
+    def start_request_metrics():
+        if multiprocess:
+            multiprocess.ensure_flusher()
+        route = route_label()
+        request.environ['edgecraft.metrics'] = (time.perf_counter(), route)
+        http_in_flight.inc(method=request.method, route=route)
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = request.environ.get('edgecraft.metrics')
+        if started is not None:
+            began, route = started
+            http_latency.observe(time.perf_counter() - began, method=request.method, route=route)
+            http_requests.inc(method=request.method, route=route, status=str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        started = request.environ.pop('edgecraft.metrics', None)
+        if started is not None:
+            http_in_flight.dec(method=request.method, route=started[1])
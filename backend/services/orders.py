@@ -0,0 +1,142 @@
+"""
+Order validation for Edgecraft Glass Platform
+
+Order items are read once into columns (price, quantity and, for cut glass,
+the quote line) and checked in bulk with NumPy: prices, quantities, server
+quotes and the order total take a few array operations whatever the number
+of lines. The normalized items are handed to insertion as they are, so
+contractor orders with hundreds of lines are not parsed a second time by
+the data layer.
+"""
+
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.quotes import QuoteEngine
+
+ITEM_FIELDS = ('id', 'name', 'price', 'quantity')
+
+class OrderValidationError(ValueError):
+    """Raised for an order that cannot be accepted; ``details`` go into the response"""
+
+    def __init__(self, message: str, **details):
+        super().__init__(message)
+        self.details = details
+
+class ValidatedOrder:
+    """Items and total of an order that passed validation"""
+
+    def __init__(self, items: List[Dict], prices: np.ndarray, quantities: np.ndarray, total_amount: float):
+        self.items = items
+        self.prices = prices
+        self.quantities = quantities
+        self.total_amount = total_amount
+
+    @property
+    def subtotal(self) -> float:
+        return round(float(np.dot(self.prices, self.quantities)), 2)
+
+def _first(mask: np.ndarray) -> Optional[int]:
+    positions = np.flatnonzero(mask)
+    return int(positions[0]) if positions.size else None
+
+class OrderValidator:
+    """Validates and normalizes order items and totals in one pass.
+
+    The total must cover the items and may add at most ``tax_rate`` on top
+    of them plus ``shipping_fee``, the charges the storefront applies.
+    Customized catalog items must match the server quote within
+    ``quote_tolerance``. With ``check_total=False`` the total only has to
+    be a positive amount.
+    """
+
+    def __init__(self, quotes: QuoteEngine = None, tax_rate: float = None, shipping_fee: float = None,
+                 total_tolerance: float = None, quote_tolerance: float = None,
+                 max_items: int = None, max_quantity: int = None, check_total: bool = True):
+        if tax_rate is None:
+            tax_rate = float(os.getenv('ORDER_TAX_RATE', '0.18'))
+        if shipping_fee is None:
+            shipping_fee = float(os.getenv('ORDER_SHIPPING_FEE', '50'))
+        if total_tolerance is None:
+            total_tolerance = float(os.getenv('ORDER_TOTAL_TOLERANCE', '0.01'))
+        if quote_tolerance is None:
+            quote_tolerance = float(os.getenv('QUOTE_PRICE_TOLERANCE', '0.01'))
+        if max_items is None:
+            max_items = int(os.getenv('ORDER_MAX_ITEMS', '1000'))
+        if max_quantity is None:
+            max_quantity = int(os.getenv('ORDER_MAX_ITEM_QUANTITY', '100000'))
+        self.quotes = quotes
+        self.tax_rate = tax_rate
+        self.shipping_fee = shipping_fee
+        self.total_tolerance = total_tolerance
+        self.quote_tolerance = quote_tolerance
+        self.max_items = max_items
+        self.max_quantity = max_quantity
+        self.check_total = check_total
+
+    def validate(self, items: Any, total_amount: Any) -> ValidatedOrder:
+        """Check an order's items and total, raising OrderValidationError"""
+        if not isinstance(items, list) or not items:
+            raise OrderValidationError('Items must be a non-empty array')
+        if len(items) > self.max_items:
+            raise OrderValidationError(f'Orders can have at most {self.max_items} items')
+
+        count = len(items)
+        prices = np.empty(count, dtype=np.float64)
+        quantities = np.empty(count, dtype=np.int64)
+        quote_lines = [None] * count
+        normalized = []
+
+        # The only per-item Python pass: copy each item and pull out its columns
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise OrderValidationError(f'Item {i+1} must be an object')
+            missing = [field for field in ITEM_FIELDS if field not in item]
+            if missing:
+                raise OrderValidationError(f'Item {i+1} missing fields: {", ".join(missing)}')
+
+            price, quantity = item['price'], item['quantity']
+            valid_price = isinstance(price, (int, float)) and not isinstance(price, bool)
+            valid_quantity = isinstance(quantity, int) and not isinstance(quantity, bool) and 0 < quantity <= self.max_quantity
+            prices[i] = price if valid_price else math.nan
+            quantities[i] = quantity if valid_quantity else 0
+
+            line = dict(item)
+            if valid_price:
+                line['price'] = float(price)
+            normalized.append(line)
+            if self.quotes is not None:
+                quote_lines[i] = self.quotes.item_line(item)
+
+        invalid = _first(~(np.isfinite(prices) & (prices > 0)))
+        if invalid is not None:
+            raise OrderValidationError(f'Item {invalid+1} has invalid price')
+        invalid = _first(quantities <= 0)
+        if invalid is not None:
+            raise OrderValidationError(f'Item {invalid+1} has invalid quantity')
+
+        if self.quotes is not None:
+            quoted = self.quotes.reprice_lines(quote_lines)
+            # NaN (not quotable) compares False and passes
+            invalid = _first(np.abs(prices - quoted) > self.quote_tolerance)
+            if invalid is not None:
+                raise OrderValidationError(
+                    f'Item {invalid+1} price does not match the current price',
+                    quoted_price=float(quoted[invalid])
+                )
+
+        if not isinstance(total_amount, (int, float)) or isinstance(total_amount, bool) \
+                or not math.isfinite(total_amount) or total_amount <= 0:
+            raise OrderValidationError('Invalid total amount')
+
+        validated = ValidatedOrder(normalized, prices, quantities, float(total_amount))
+        if not self.check_total:
+            return validated
+        subtotal = validated.subtotal
+        ceiling = subtotal * (1 + self.tax_rate) + self.shipping_fee
+        if not subtotal - self.total_tolerance <= total_amount <= ceiling + self.total_tolerance:
+            raise OrderValidationError('Total amount does not match the items', items_subtotal=subtotal)
+        return validated
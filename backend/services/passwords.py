@@ -0,0 +1,135 @@
+"""
+Password hashing service for Edgecraft Glass Platform
+
+PBKDF2 is deliberately slow, so hashing and verification run in a small
+process pool instead of the request threads. The number of outstanding
+jobs is bounded; when the pool is saturated callers get
+``PasswordServiceBusy`` straight away rather than queueing without limit.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+import time
+from typing import Dict
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class PasswordServiceBusy(Exception):
+    """Raised when the hashing pool has no capacity left"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password service is busy")
+        self.retry_after = retry_after
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+def _verify(password: str, password_hash: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+class PasswordService:
+    """Hashes and verifies passwords on a bounded process pool.
+
+    ``workers=0`` runs every job inline in the calling thread, which is
+    what the tests and single-process scripts use.
+    """
+
+    ALGORITHM = 'pbkdf2:sha256'
+
+    def __init__(self, iterations: int = None, workers: int = None,
+                 max_pending: int = None, acquire_timeout: float = None,
+                 retry_after: int = None):
+        if iterations is None:
+            iterations = int(os.getenv('PASSWORD_HASH_ITERATIONS', '600000'))
+        if workers is None:
+            workers = int(os.getenv('PASSWORD_WORKERS', str(min(2, os.cpu_count() or 1))))
+        if max_pending is None:
+            max_pending = int(os.getenv('PASSWORD_MAX_PENDING', str(max(workers, 1) * 4)))
+        if acquire_timeout is None:
+            acquire_timeout = float(os.getenv('PASSWORD_QUEUE_TIMEOUT', '0.5'))
+        if retry_after is None:
+            retry_after = int(os.getenv('PASSWORD_RETRY_AFTER', '2'))
+        self.iterations = iterations
+        self.method = f"{self.ALGORITHM}:{iterations}"
+        self.workers = workers
+        self.max_pending = max_pending
+        self.acquire_timeout = acquire_timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._stats = {
+            'hashed': 0,
+            'verified': 0,
+            'rejected': 0,
+            'in_flight': 0,
+            'busy_seconds': 0.0
+        }
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured work factor"""
+        result = self._run(_hash, password, self.method)
+        self._count('hashed')
+        return result
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """Check a password against a stored hash"""
+        result = self._run(_verify, password, password_hash)
+        self._count('verified')
+        return result
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when a hash was made with other parameters than the current ones"""
+        method = password_hash.split('$', 1)[0]
+        return method != self.method
+
+    def stats(self) -> Dict:
+        """Counters describing the work done by this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'iterations': self.iterations
+        })
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor and self._pid == os.getpid():
+            executor.shutdown(wait=wait)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count('rejected')
+            raise PasswordServiceBusy(self.retry_after)
+
+        self._count('in_flight')
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return func(*args)
+            return self._pool().submit(func, *args).result()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._stats['in_flight'] -= 1
+                self._stats['busy_seconds'] += elapsed
+            self._slots.release()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # The pool is created on first use in each process, so a pool made
+        # before a gunicorn fork is never shared with the workers
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
@@ -0,0 +1,162 @@
+"""
+Asynchronous payment processing for Edgecraft Glass Platform
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger('edgecraft.payments')
+
+class PaymentGateway:
+    """Interface implemented by payment gateways"""
+
+    name = 'gateway'
+
+    def charge(self, payment: Dict, details: Dict) -> Dict:
+        """Charge a payment and return its outcome.
+
+        ``payment`` is the public payment record and ``details`` holds the
+        method specific data (card, UPI ID, bank) which is never persisted.
+        The result must contain ``status`` (``success`` or ``failed``) and a
+        human readable ``message``.
+        """
+        raise NotImplementedError
+
+class SimulatedGateway(PaymentGateway):
+    """Local stand-in gateway that approves every payment after a delay"""
+
+    name = 'simulated'
+
+    def __init__(self, latency: float = None):
+        if latency is None:
+            latency = float(os.getenv('PAYMENT_SIMULATED_LATENCY', '2'))
+        self.latency = latency
+
+    def charge(self, payment: Dict, details: Dict) -> Dict:
+        time.sleep(self.latency)
+        return {
+            'status': 'success',
+            'message': 'Payment processed successfully'
+        }
+
+class PaymentEngine:
+    """Runs gateway charges on a background executor.
+
+    Requests submit a payment and return immediately; the result is
+    tracked in memory (for long-polling in this worker) and mirrored to
+    an optional store so that any worker can report the final status.
+    """
+
+    PENDING = 'pending'
+    SUCCESS = 'success'
+    FAILED = 'failed'
+
+    def __init__(self, gateway: PaymentGateway, store: Callable[[], Optional[object]] = None,
+                 max_workers: int = None, retention_seconds: float = None):
+        if max_workers is None:
+            max_workers = int(os.getenv('PAYMENT_WORKERS', '8'))
+        if retention_seconds is None:
+            retention_seconds = float(os.getenv('PAYMENT_RETENTION_SECONDS', '900'))
+        self.gateway = gateway
+        self.store = store or (lambda: None)
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='payment')
+        self._records: Dict[str, Dict] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._condition = threading.Condition()
+
+    def submit(self, user_id: str, payment_method: str, amount: float, details: Dict = None) -> Dict:
+        """Queue a payment for processing and return its pending record"""
+        record = {
+            'payment_id': f"pay_{uuid.uuid4().hex[:12]}",
+            'user_id': user_id,
+            'amount': amount,
+            'payment_method': payment_method,
+            'gateway': self.gateway.name,
+            'status': self.PENDING,
+            'message': 'Payment submitted for processing',
+            'created_at': datetime.utcnow(),
+            'completed_at': None
+        }
+
+        with self._condition:
+            self._prune()
+            self._records[record['payment_id']] = record
+
+        self._persist('create_payment', dict(record))
+        self._executor.submit(self._process, record['payment_id'], details or {})
+        return dict(record)
+
+    def get(self, payment_id: str, user_id: str = None, wait: float = 0) -> Optional[Dict]:
+        """Return a payment record, optionally waiting up to ``wait`` seconds
+        for a pending payment handled by this worker to finish"""
+        deadline = time.monotonic() + max(wait, 0)
+        with self._condition:
+            record = self._records.get(payment_id)
+            while record is not None and record['status'] == self.PENDING:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                record = self._records.get(payment_id)
+            if record is not None:
+                record = dict(record)
+
+        if record is None:
+            store = self.store()
+            if store is not None:
+                record = store.find_payment_by_id(payment_id)
+
+        if record is None or (user_id is not None and record.get('user_id') != user_id):
+            return None
+        return record
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _process(self, payment_id: str, details: Dict) -> None:
+        with self._condition:
+            record = dict(self._records[payment_id])
+
+        try:
+            outcome = self.gateway.charge(record, details)
+            status = outcome.get('status', self.FAILED)
+            message = outcome.get('message', '')
+        except Exception as e:
+            logger.exception('payment_gateway_error', extra={'fields': {'payment_id': payment_id, 'error': str(e)}})
+            status = self.FAILED
+            message = 'Payment processing failed'
+
+        update = {
+            'status': status,
+            'message': message,
+            'completed_at': datetime.utcnow()
+        }
+        with self._condition:
+            self._records[payment_id].update(update)
+            self._finished_at[payment_id] = time.monotonic()
+            self._condition.notify_all()
+
+        self._persist('update_payment', payment_id, update)
+
+    def _persist(self, method: str, *args) -> None:
+        try:
+            store = self.store()
+            if store is not None:
+                getattr(store, method)(*args)
+        except Exception as e:
+            logger.warning('payment_persist_failed', extra={'fields': {'method': method, 'error': str(e)}})
+
+    def _prune(self) -> None:
+        """Forget finished payments older than the retention period"""
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [pid for pid, finished in self._finished_at.items() if finished < cutoff]
+        for payment_id in expired:
+            del self._finished_at[payment_id]
+            del self._records[payment_id]
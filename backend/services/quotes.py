@@ -0,0 +1,309 @@
+"""
+Price quotes for Edgecraft Glass Platform
+
+Cut glass is priced by area: ``width x height / 144`` square feet per piece
+(dimensions in inches) at the product's ``basePrice`` per square foot, plus
+any option surcharges, less a volume discount, rounded to the configured
+step. Lines are parsed once into arrays and priced with NumPy against a
+table of catalog prices, so a contractor order with hundreds of lines costs
+a handful of array operations rather than a catalog lookup per line.
+
+Rules come from the environment. By default prices are rounded half up to
+0.01 and area is billed exactly, with no minimum area, volume tiers or
+options (the price ``src/utils/quotes.ts`` falls back to). An example
+configuration, not the defaults:
+
+    QUOTE_PRICE_STEP=0.01         round prices half up to this step
+    QUOTE_AREA_STEP=0.25          bill area in steps of this many sq ft (default 0 = exact)
+    QUOTE_MIN_AREA_SQFT=1         minimum billed area per piece (default 0)
+    QUOTE_VOLUME_TIERS=10:0.05,50:0.1
+    QUOTE_OPTIONS={"tempered": {"multiplier": 1.3}, "frosted": {"per_sq_ft": 40}}
+"""
+
+from decimal import Decimal
+import json
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SQ_INCHES_PER_SQ_FT = 144.0
+
+def parse_tiers(spec: str) -> List[Tuple[int, float]]:
+    """Parse ``"<min pieces>:<discount>,..."``, e.g. ``"10:0.05,50:0.1"``"""
+    tiers = []
+    for part in filter(None, (part.strip() for part in (spec or '').split(','))):
+        try:
+            pieces, discount = part.split(':', 1)
+            tiers.append((int(pieces), float(discount)))
+        except ValueError:
+            raise ValueError(f"Invalid volume tier '{part}', expected <min pieces>:<discount>")
+    for pieces, discount in tiers:
+        if pieces < 1 or not 0 <= discount < 1:
+            raise ValueError(f"Invalid volume tier '{pieces}:{discount}'")
+    return sorted(tiers)
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return math.nan
+    return math.nan
+
+class QuoteRules:
+    """Rounding, minimum area, volume tiers and option prices for quotes"""
+
+    def __init__(self, price_step: float = None, area_step: float = None, min_area: float = None,
+                 tiers: List[Tuple[int, float]] = None, options: Dict[str, Dict] = None):
+        if price_step is None:
+            price_step = float(os.getenv('QUOTE_PRICE_STEP', '0.01'))
+        if area_step is None:
+            area_step = float(os.getenv('QUOTE_AREA_STEP', '0'))
+        if min_area is None:
+            min_area = float(os.getenv('QUOTE_MIN_AREA_SQFT', '0'))
+        if tiers is None:
+            tiers = parse_tiers(os.getenv('QUOTE_VOLUME_TIERS', ''))
+        if options is None:
+            options = json.loads(os.getenv('QUOTE_OPTIONS', '{}'))
+        if price_step <= 0:
+            raise ValueError("QUOTE_PRICE_STEP must be positive")
+
+        self.price_step = price_step
+        self.price_decimals = max(0, -Decimal(str(price_step)).as_tuple().exponent)
+        self.area_step = area_step
+        self.min_area = min_area
+        self.tiers = tiers
+        self.tier_pieces = np.array([1] + [pieces for pieces, _ in tiers], dtype=np.int64)
+        self.tier_discounts = np.array([0.0] + [discount for _, discount in tiers])
+
+        self.option_names = sorted(options)
+        self.option_index = {name: column for column, name in enumerate(self.option_names)}
+        self.option_multipliers = np.array(
+            [float(options[name].get('multiplier', 1.0)) for name in self.option_names], dtype=np.float64)
+        self.option_surcharges = np.array(
+            [float(options[name].get('per_sq_ft', 0.0)) for name in self.option_names], dtype=np.float64)
+
+    def round_price(self, values: np.ndarray) -> np.ndarray:
+        """Round half up to the price step"""
+        rounded = np.floor(values / self.price_step + 0.5) * self.price_step
+        return np.round(rounded, self.price_decimals)
+
+    def billable_area(self, area: np.ndarray) -> np.ndarray:
+        area = np.maximum(area, self.min_area)
+        if self.area_step > 0:
+            # The epsilon keeps exact multiples from rounding up a step
+            area = np.ceil(area / self.area_step - 1e-9) * self.area_step
+        return area
+
+    def discount(self, pieces: np.ndarray) -> np.ndarray:
+        """Volume discount for each line's piece count"""
+        tier = np.searchsorted(self.tier_pieces, pieces, side='right') - 1
+        return self.tier_discounts[np.maximum(tier, 0)]
+
+class PriceTable:
+    """``basePrice`` of every catalog product in one array, indexed by product id"""
+
+    def __init__(self, products: Sequence[Dict]):
+        self.index = {str(product['id']): row for row, product in enumerate(products)}
+        self.base_prices = np.array([_number(product.get('basePrice')) for product in products], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def rows(self, product_ids: Sequence[str]) -> np.ndarray:
+        """Row of each product id, -1 for products not in the catalog"""
+        return np.fromiter((self.index.get(product_id, -1) for product_id in product_ids),
+                           dtype=np.intp, count=len(product_ids))
+
+    def base_price(self, rows: np.ndarray) -> np.ndarray:
+        if not len(self.base_prices):
+            return np.full(len(rows), np.nan)
+        return np.where(rows >= 0, self.base_prices[np.maximum(rows, 0)], np.nan)
+
+class QuoteEngine:
+    """Prices batches of cut-glass lines against the catalog.
+
+    ``catalog`` returns the products and ``version`` a token that changes
+    whenever they do; the price table is rebuilt only when the token changes.
+    """
+
+    def __init__(self, catalog: Callable[[], List[Dict]], version: Callable[[], Any],
+                 rules: QuoteRules = None, max_lines: int = None, max_pieces: int = None,
+                 max_dimension: float = None):
+        if max_lines is None:
+            max_lines = int(os.getenv('QUOTE_MAX_LINES', '1000'))
+        if max_pieces is None:
+            max_pieces = int(os.getenv('QUOTE_MAX_PIECES', '100000'))
+        if max_dimension is None:
+            max_dimension = float(os.getenv('QUOTE_MAX_DIMENSION_INCHES', '1000'))
+        self.catalog = catalog
+        self.version = version
+        self.rules = rules or QuoteRules()
+        self.max_lines = max_lines
+        self.max_pieces = max_pieces
+        self.max_dimension = max_dimension
+        self._lock = threading.Lock()
+        self._entry: Tuple[Any, PriceTable] = (None, None)
+
+    def price_table(self) -> PriceTable:
+        version = self.version()
+        table_version, table = self._entry
+        if table is not None and table_version == version:
+            return table
+        with self._lock:
+            table_version, table = self._entry
+            if table is None or table_version != version:
+                table = PriceTable(self.catalog())
+                self._entry = (version, table)
+            return table
+
+    def price(self, product_ids: Sequence[str], widths: np.ndarray, heights: np.ndarray,
+              pieces: np.ndarray, options: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Price lines given as columns; lines of unknown products come out as NaN.
+
+        ``options`` is a boolean matrix with one column per option in
+        ``rules.option_names``.
+        """
+        rules = self.rules
+        if options is None:
+            options = np.zeros((len(product_ids), len(rules.option_names)), dtype=bool)
+
+        table = self.price_table()
+        base = table.base_price(table.rows(product_ids))
+        multiplier = np.prod(np.where(options, rules.option_multipliers, 1.0), axis=1)
+        surcharge = options @ rules.option_surcharges
+
+        area = rules.billable_area(widths * heights / SQ_INCHES_PER_SQ_FT)
+        per_piece = area * (base * multiplier + surcharge)
+        discount = rules.discount(pieces)
+        return {
+            'area_sq_ft': np.round(area, 4),
+            'unit_price': rules.round_price(per_piece),
+            'discount': discount,
+            'line_total': rules.round_price(per_piece * pieces * (1 - discount))
+        }
+
+    def quote(self, lines: Sequence[Dict]) -> List[Dict]:
+        """Quote request lines; invalid lines get an ``error`` instead of prices"""
+        if len(lines) > self.max_lines:
+            raise ValueError(f"At most {self.max_lines} lines can be quoted at once")
+
+        count = len(lines)
+        option_index = self.rules.option_index
+        product_ids = [''] * count
+        widths = np.full(count, np.nan)
+        heights = np.full(count, np.nan)
+        pieces = np.ones(count, dtype=np.int64)
+        options = np.zeros((count, len(option_index)), dtype=bool)
+        errors: List[Any] = [None] * count
+
+        for i, line in enumerate(lines):
+            if not isinstance(line, dict):
+                errors[i] = 'Line must be an object'
+                continue
+            product_ids[i] = str(line.get('product_id') or '')
+            widths[i] = _number(line.get('width'))
+            heights[i] = _number(line.get('height'))
+            quantity = line.get('quantity', 1)
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                errors[i] = 'Quantity must be a positive integer'
+                continue
+            if quantity > self.max_pieces:
+                errors[i] = f'Quantity must be at most {self.max_pieces}'
+                continue
+            pieces[i] = quantity
+            names = line.get('options') or []
+            if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                errors[i] = 'Options must be an array of option names'
+                continue
+            for name in names:
+                column = option_index.get(name)
+                if column is None:
+                    errors[i] = f"Unknown option '{name}'"
+                    break
+                options[i, column] = True
+
+        bad_size = ~(np.isfinite(widths) & np.isfinite(heights) & (widths > 0) & (heights > 0))
+        oversized = ~bad_size & ((widths > self.max_dimension) | (heights > self.max_dimension))
+        bad_size |= oversized
+        prices = self.price(product_ids, np.where(bad_size, 0, widths), np.where(bad_size, 0, heights),
+                            pieces, options)
+        unknown = np.isnan(prices['line_total'])
+
+        quotes = []
+        for i in range(count):
+            error = errors[i]
+            if error is None and oversized[i]:
+                error = f'Width and height must be at most {self.max_dimension:g} inches'
+            if error is None and bad_size[i]:
+                error = 'Width and height must be positive numbers'
+            if error is None and unknown[i]:
+                error = 'Unknown product'
+            if error is not None:
+                quotes.append({'line': i, 'error': error})
+                continue
+            quotes.append({
+                'line': i,
+                'product_id': product_ids[i],
+                'width': float(widths[i]),
+                'height': float(heights[i]),
+                'quantity': int(pieces[i]),
+                'options': [name for name in self.rules.option_names if options[i, option_index[name]]],
+                'area_sq_ft': float(prices['area_sq_ft'][i]),
+                'unit_price': float(prices['unit_price'][i]),
+                'discount': float(prices['discount'][i]),
+                'line_total': float(prices['line_total'][i])
+            })
+        return quotes
+
+    def item_line(self, item: Dict) -> Optional[Tuple[str, float, float, int, List[str]]]:
+        """Quote line ``(product_id, width, height, pieces, options)`` of an order item.
+
+        Cut-glass cart items reference ``<product id>-<timestamp>`` and carry
+        their dimensions and piece count in ``customization``; one cart item
+        costs its whole piece count. Returns ``None`` for items that cannot be
+        quoted, such as gift items or pieces beyond the quote limits.
+        """
+        customization = item.get('customization') if isinstance(item, dict) else None
+        if not isinstance(customization, dict):
+            return None
+        width, height = _number(customization.get('width')), _number(customization.get('height'))
+        pieces = _number(customization.get('quantity', 1))
+        if not (0 < width <= self.max_dimension and 0 < height <= self.max_dimension
+                and 1 <= pieces <= self.max_pieces):
+            return None
+        names = customization.get('options') or []
+        if not isinstance(names, list) or any(not isinstance(name, str) or name not in self.rules.option_index
+                                              for name in names):
+            return None
+        product_id = str(item.get('product_id') or item.get('id') or '').split('-', 1)[0]
+        return product_id, width, height, int(pieces), names
+
+    def reprice_lines(self, lines: Sequence[Optional[Tuple]]) -> np.ndarray:
+        """Line totals for ``item_line`` results, NaN where there is no line or product"""
+        prices = np.full(len(lines), np.nan)
+        positions = [i for i, line in enumerate(lines) if line is not None]
+        if not positions:
+            return prices
+
+        option_index = self.rules.option_index
+        options = np.zeros((len(positions), len(option_index)), dtype=bool)
+        for row, i in enumerate(positions):
+            for name in lines[i][4]:
+                options[row, option_index[name]] = True
+        product_ids, widths, heights, pieces, _ = zip(*(lines[i] for i in positions))
+        quoted = self.price(list(product_ids), np.array(widths, dtype=np.float64),
+                            np.array(heights, dtype=np.float64), np.array(pieces, dtype=np.int64), options)
+        prices[positions] = quoted['line_total']
+        return prices
+
+    def reprice_items(self, items: Sequence[Dict]) -> np.ndarray:
+        """Current price of each order item, NaN for items that cannot be quoted"""
+        return self.reprice_lines([self.item_line(item) for item in items])
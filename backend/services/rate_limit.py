@@ -0,0 +1,114 @@
+"""
+Sliding-window rate limiting for Edgecraft Glass Platform
+
+Each limit keeps one counter per fixed window and weights the previous
+window by how much of it still overlaps the sliding window, which gives a
+smooth limit with two counters per key. Counters live in a window store:
+an in-process one by default, or a shared one (see
+``database.mongodb.RateLimitOperations``) so that all workers see the same
+counts.
+"""
+
+from collections import OrderedDict
+import logging
+import math
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger('edgecraft.rate_limit')
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Parse ``"<limit>/<window seconds>"``, e.g. ``"5/60"``"""
+    try:
+        limit, window = rate.split('/', 1)
+        return int(limit), float(window)
+    except ValueError:
+        raise ValueError(f"Invalid rate limit '{rate}', expected <limit>/<seconds>")
+
+class RateLimitExceeded(Exception):
+    """Raised when a caller is over one of its limits"""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(f"Rate limit exceeded for {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+class MemoryWindowStore:
+    """Window counters held in this process, bounded to ``max_keys`` entries"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[Tuple[str, float], list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, window_start: float, ttl: float) -> int:
+        """Count a hit in a window and return the window's total"""
+        now = time.time()
+        with self._lock:
+            counter = self._counters.get((key, window_start))
+            if counter is None or counter[1] <= now:
+                counter = [0, now + ttl]
+                self._counters[(key, window_start)] = counter
+            counter[0] += 1
+            self._counters.move_to_end((key, window_start))
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return counter[0]
+
+    def get(self, key: str, window_start: float) -> int:
+        with self._lock:
+            counter = self._counters.get((key, window_start))
+            return counter[0] if counter and counter[1] > time.time() else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+class RateLimiter:
+    """Checks sliding-window limits against a window store.
+
+    ``backend`` returns the shared store to use, or ``None`` to fall back to
+    the in-process store. Store failures let the request through: the limiter
+    protects capacity and must not turn a database hiccup into an outage.
+    """
+
+    def __init__(self, backend: Callable[[], Optional[object]] = None, enabled: bool = True):
+        self.backend = backend or (lambda: None)
+        self.local = MemoryWindowStore()
+        self.enabled = enabled
+
+    def _store(self):
+        return self.backend() or self.local
+
+    def hit(self, scope: str, identifier: str, limit: int, window: float) -> None:
+        """Count one request for ``identifier`` and raise if it is over the limit"""
+        if not self.enabled or not identifier:
+            return
+
+        key = f"{scope}:{identifier}"
+        now = time.time()
+        window_start = now - (now % window)
+        try:
+            store = self._store()
+            current = store.incr(key, window_start, ttl=window * 2)
+            previous = store.get(key, window_start - window)
+        except Exception as e:
+            logger.warning('rate_limit_check_skipped', extra={'fields': {'scope': scope, 'error': str(e)}})
+            return
+
+        elapsed = now - window_start
+        estimate = previous * (window - elapsed) / window + current
+        if estimate <= limit:
+            return
+
+        if current >= limit or not previous:
+            retry_after = window - elapsed
+        else:
+            # Wait until enough of the previous window has slid out
+            retry_after = window * (1 - (limit - current) / previous) - elapsed
+        raise RateLimitExceeded(scope, max(1, math.ceil(retry_after)))
+
+    def reset(self) -> None:
+        """Forget the in-process counters"""
+        self.local.clear()
@@ -169,9 +169,12 @@ def setup_mock_database(mock_db):
         'created_at': datetime.utcnow()
     }
     
-    mock_db.orders.find_orders_by_user.return_value = [
-        mock_db.orders.create_order.return_value
-    ]
+    mock_db.checkout.place_order.return_value = mock_db.orders.create_order.return_value
+    
+    mock_db.orders.find_orders_by_user.return_value = {
+        'orders': [mock_db.orders.create_order.return_value],
+        'next_cursor': None
+    }
     
     # Review operations
     mock_db.reviews.create_review.return_value = {
@@ -183,7 +186,7 @@ def setup_mock_database(mock_db):
         'created_at': datetime.utcnow()
     }
     
-    mock_db.reviews.find_reviews_by_product.return_value = []
+    mock_db.reviews.find_reviews_by_product.return_value = {'reviews': [], 'next_cursor': None}
     mock_db.reviews.get_product_rating_stats.return_value = {
         'average_rating': 0.0,
         'total_reviews': 0,
@@ -3,6 +3,7 @@ import os
 import sys
 from datetime import datetime
 from unittest.mock import patch, MagicMock
+from flask_jwt_extended import create_access_token
 from werkzeug.security import generate_password_hash
 
 # Add the backend directory to the Python path
@@ -21,6 +22,13 @@ def client():
         with app.app_context():
             yield client
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with empty login/registration rate limit counters"""
+    from app import auth_rate_limiter
+    auth_rate_limiter.reset()
+    yield
+
 @pytest.fixture
 def mock_db():
     """Mock database for testing"""
@@ -71,6 +79,14 @@ def mock_db():
             'created_at': datetime.utcnow()
         }
         
+        # Checkout delegates to the order and cart mocks so tests can keep
+        # configuring create_order and asserting on clear_cart
+        def place_order(order_data, normalized=False):
+            order = mock_db.orders.create_order(order_data)
+            mock_db.carts.clear_cart(order_data['user_id'])
+            return order
+        mock_db.checkout.place_order.side_effect = place_order
+        
         # Mock order operations
         mock_db.orders.create_order.return_value = {
             'id': '507f1f77bcf86cd799439013',
@@ -98,7 +114,7 @@ def mock_db():
             'created_at': datetime.utcnow()
         }
         
-        mock_db.orders.find_orders_by_user.return_value = []
+        mock_db.orders.find_orders_by_user.return_value = {'orders': [], 'next_cursor': None}
         
         # Mock cart operations
         mock_db.carts.find_cart_by_user.return_value = {
@@ -121,7 +137,7 @@ def mock_db():
             'created_at': datetime.utcnow()
         }
         
-        mock_db.reviews.find_reviews_by_product.return_value = []
+        mock_db.reviews.find_reviews_by_product.return_value = {'reviews': [], 'next_cursor': None}
         mock_db.reviews.get_product_rating_stats.return_value = {
             'average_rating': 0.0,
             'total_reviews': 0,
@@ -143,18 +159,9 @@ def mock_db():
 @pytest.fixture
 def auth_headers(client, mock_db):
     """Get authentication headers for protected routes"""
-    # Register and login a test user
-    register_data = {
-        'name': 'Test User',
-        'email': 'test@example.com',
-        'password': 'password123'
-    }
-    
-    response = client.post('/api/register', json=register_data)
-    assert response.status_code == 201
-    
-    data = response.get_json()
-    token = data['access_token']
+    # Mint the token for the mocked user directly; registering would be
+    # rejected because find_user_by_email already returns that user
+    token = create_access_token(identity=mock_db.users.find_user_by_id.return_value['id'])
     
     return {'Authorization': f'Bearer {token}'}
 
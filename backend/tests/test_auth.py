@@ -1,7 +1,9 @@
 import pytest
 import json
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from werkzeug.security import generate_password_hash
+from services.passwords import PasswordService, PasswordServiceBusy
+from services.rate_limit import RateLimiter, RateLimitExceeded, MemoryWindowStore, parse_rate
 
 class TestAuthentication:
     """Test cases for authentication endpoints"""
@@ -165,4 +167,162 @@ class TestAuthentication:
         
         assert response.status_code == 200
         response_data = response.get_json()
-        assert response_data['user']['role'] == 'admin'
\ No newline at end of file
+        assert response_data['user']['role'] == 'admin'
+
+    def test_login_busy_returns_retry_after(self, client, mock_db):
+        """Test login is rejected with 503 when the password pool is saturated"""
+        data = {
+            'email': 'test@example.com',
+            'password': 'password123'
+        }
+
+        with patch('app.check_password', side_effect=PasswordServiceBusy(3)):
+            response = client.post('/api/login', json=data)
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert 'error' in response.get_json()
+
+    def test_login_rehashes_outdated_hash(self, client, mock_db):
+        """Test a hash made with old parameters is upgraded on login"""
+        mock_db.users.find_user_by_email.return_value = {
+            'id': '507f1f77bcf86cd799439011',
+            'name': 'Test User',
+            'email': 'test@example.com',
+            'password_hash': generate_password_hash('password123', method='pbkdf2:sha256:1000'),
+            'created_at': '2025-01-01T00:00:00'
+        }
+        service = PasswordService(iterations=2000, workers=0)
+
+        with patch('app.password_service', service):
+            response = client.post('/api/login', json={
+                'email': 'test@example.com',
+                'password': 'password123'
+            })
+
+        assert response.status_code == 200
+        user_id, update = mock_db.users.update_user.call_args[0]
+        assert user_id == '507f1f77bcf86cd799439011'
+        assert update['password_hash'].startswith('pbkdf2:sha256:2000$')
+
+    def test_login_rate_limited_per_email(self, client, mock_db):
+        """Test repeated attempts for one email are rejected before any lookup"""
+        data = {
+            'email': 'test@example.com',
+            'password': 'wrongpassword'
+        }
+
+        with patch('app.AUTH_RATE_LIMITS', {'login': {'ip': (100, 60), 'email': (2, 60)}}), \
+             patch('app.check_password', return_value=False):
+            statuses = [client.post('/api/login', json=data).status_code for _ in range(3)]
+            other = client.post('/api/login', json={'email': 'other@example.com', 'password': 'x'})
+
+        assert statuses == [401, 401, 429]
+        assert other.status_code == 401
+        assert mock_db.users.find_user_by_email.call_count == 3
+
+    def test_register_rate_limited_per_ip(self, client, mock_db):
+        """Test registration bursts from one client are throttled"""
+        mock_db.users.find_user_by_email.return_value = None
+        mock_db.users.create_user.side_effect = lambda user: dict(user, id='507f1f77bcf86cd799439011')
+
+        with patch('app.AUTH_RATE_LIMITS', {'register': {'ip': (1, 60), 'email': (10, 60)}}), \
+             patch('app.hash_password', return_value='hashed'):
+            first = client.post('/api/register', json={'name': 'A', 'email': 'a@example.com', 'password': 'x'})
+            second = client.post('/api/register', json={'name': 'B', 'email': 'b@example.com', 'password': 'x'})
+
+        assert first.status_code == 201
+        assert second.status_code == 429
+        assert int(second.headers['Retry-After']) >= 1
+        mock_db.users.create_user.assert_called_once()
+
+class TestRateLimiter:
+    """Test cases for the sliding-window rate limiter"""
+
+    def test_limit_within_window(self):
+        """Test hits over the limit raise with a retry hint"""
+        limiter = RateLimiter()
+
+        with patch('services.rate_limit.time.time', return_value=1000.0):
+            limiter.hit('login:email', 'a@example.com', 2, 60)
+            limiter.hit('login:email', 'a@example.com', 2, 60)
+            with pytest.raises(RateLimitExceeded) as exc:
+                limiter.hit('login:email', 'a@example.com', 2, 60)
+            limiter.hit('login:email', 'b@example.com', 2, 60)
+
+        assert exc.value.retry_after == 20
+
+    def test_previous_window_slides_out(self):
+        """Test the previous window only counts for the part still overlapping"""
+        limiter = RateLimiter()
+
+        with patch('services.rate_limit.time.time', return_value=1170.0):
+            for _ in range(4):
+                limiter.hit('login:ip', '1.2.3.4', 4, 60)
+        with patch('services.rate_limit.time.time', return_value=1185.0):
+            with pytest.raises(RateLimitExceeded):
+                limiter.hit('login:ip', '1.2.3.4', 4, 60)
+        with patch('services.rate_limit.time.time', return_value=1230.0):
+            limiter.hit('login:ip', '1.2.3.4', 4, 60)
+
+    def test_shared_backend_and_fail_open(self):
+        """Test the shared backend is used and its failures let requests through"""
+        shared = MemoryWindowStore()
+        limiter = RateLimiter(backend=lambda: shared)
+
+        limiter.hit('login:ip', '1.2.3.4', 5, 60)
+        assert limiter.local.get('login:ip:1.2.3.4', 0) == 0
+        assert sum(count for count, _ in shared._counters.values()) == 1
+
+        broken = RateLimiter(backend=lambda: Mock(incr=Mock(side_effect=Exception('down'))))
+        broken.hit('login:ip', '1.2.3.4', 0, 60)
+
+    def test_parse_rate(self):
+        """Test rate strings are parsed into limit and window"""
+        assert parse_rate('5/60') == (5, 60.0)
+        with pytest.raises(ValueError):
+            parse_rate('5 per minute')
+
+class TestPasswordService:
+    """Test cases for the password hashing service"""
+
+    def test_hash_and_verify_inline(self):
+        """Test hashing uses the configured work factor"""
+        service = PasswordService(iterations=1000, workers=0)
+
+        password_hash = service.hash('secret')
+
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert service.verify('secret', password_hash)
+        assert not service.verify('wrong', password_hash)
+        assert service.stats()['hashed'] == 1
+        assert service.stats()['verified'] == 2
+
+    def test_hash_and_verify_in_process_pool(self):
+        """Test jobs run on worker processes"""
+        service = PasswordService(iterations=1000, workers=1)
+        try:
+            password_hash = service.hash('secret')
+            assert service.verify('secret', password_hash)
+        finally:
+            service.shutdown()
+
+    def test_needs_rehash(self):
+        """Test hashes with other parameters are flagged"""
+        service = PasswordService(iterations=1000, workers=0)
+
+        assert not service.needs_rehash(generate_password_hash('x', method='pbkdf2:sha256:1000'))
+        assert service.needs_rehash(generate_password_hash('x', method='pbkdf2:sha256:500'))
+        assert service.needs_rehash(generate_password_hash('x', method='scrypt'))
+
+    def test_rejects_when_saturated(self):
+        """Test callers get PasswordServiceBusy instead of queueing forever"""
+        service = PasswordService(iterations=1000, workers=0, max_pending=1,
+                                  acquire_timeout=0, retry_after=5)
+        service._slots.acquire()
+
+        with pytest.raises(PasswordServiceBusy) as exc:
+            service.hash('secret')
+
+        assert exc.value.retry_after == 5
+        assert service.stats()['rejected'] == 1
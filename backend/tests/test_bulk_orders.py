@@ -0,0 +1,113 @@
+import io
+import json
+import pytest
+from unittest.mock import Mock
+
+from services.bulk_orders import OrderImporter, read_ndjson
+from services.orders import OrderValidator
+
+ADMIN_HEADERS = {'Authorization': 'Bearer admin-secret'}
+
+def order_line(**overrides):
+    order = {
+        'user_id': 'erp-customer-1',
+        'items': [{'id': 'sku-1', 'name': 'Window Glass', 'price': 50.0, 'quantity': 2}],
+        'total_amount': 100.0,
+        'payment_method': 'Invoice',
+        'billing_info': {'email': 'buyer@example.com'},
+        'external_id': 'ERP-1'
+    }
+    order.update(overrides)
+    return json.dumps(order)
+
+def stored(orders, normalized=False):
+    return [{'order': dict(order, id=f'id{n}', order_number=f'EG{n}')} for n, order in enumerate(orders)]
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setenv('ADMIN_API_TOKEN', 'admin-secret')
+
+class TestBulkOrders:
+    """Test cases for NDJSON order import and export"""
+
+    def test_read_ndjson(self):
+        """Test lines are numbered, blank lines skipped and bad lines reported"""
+        body = b'{"a": 1}\n\n{oops}\n' + b'{"b": "' + b'x' * 100 + b'"}\n{"c": 3}'
+
+        rows = list(read_ndjson(io.BytesIO(body), max_line_bytes=50))
+
+        assert rows[0] == (1, {'a': 1}, None)
+        assert rows[1][0] == 3 and rows[1][2].startswith('Invalid JSON')
+        assert rows[2] == (4, None, 'Line is longer than 50 bytes')
+        assert rows[3] == (5, {'c': 3}, None)
+
+    def test_importer_chunks_and_reports_each_line(self):
+        """Test valid lines are inserted in chunks and every line gets a result"""
+        create_orders = Mock(side_effect=stored)
+        importer = OrderImporter(OrderValidator(check_total=False), create_orders, chunk_size=2, max_line_bytes=4096)
+        # ERP totals may include discounts below the item subtotal
+        body = '\n'.join([order_line(), order_line(total_amount=0), order_line(total_amount=80.0), order_line(), 'null'])
+
+        results = list(importer.run(read_ndjson(io.BytesIO(body.encode()), 4096)))
+
+        assert [result['line'] for result in results[:5]] == [1, 2, 3, 4, 5]
+        assert [result['status'] for result in results[:5]] == ['created', 'error', 'created', 'created', 'error']
+        assert results[1]['error'] == 'Invalid total amount'
+        assert results[-1] == {'summary': {'created': 3, 'failed': 2}}
+        assert [len(call[0][0]) for call in create_orders.call_args_list] == [2, 1]
+        first = create_orders.call_args_list[0][0][0][0]
+        assert first['source'] == 'import'
+        assert first['status'] == 'confirmed'
+        assert first['external_id'] == 'ERP-1'
+        assert create_orders.call_args_list[0][1] == {'normalized': True}
+
+    def test_import_orders_endpoint(self, client, mock_db, admin_token):
+        """Test the import endpoint streams NDJSON results"""
+        mock_db.orders.create_orders.side_effect = stored
+        body = order_line() + '\n' + order_line(user_id='') + '\n'
+
+        response = client.post('/api/admin/orders/import', data=body,
+                               content_type='application/x-ndjson', headers=ADMIN_HEADERS)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert lines[0]['status'] == 'created'
+        assert lines[1] == {'line': 2, 'status': 'error', 'error': 'user_id must be a non-empty string'}
+        assert lines[2] == {'summary': {'created': 1, 'failed': 1}}
+
+    def test_export_orders_endpoint(self, client, mock_db, admin_token):
+        """Test the export endpoint streams orders from the cursor"""
+        def iter_orders(created_from, created_to, batch_size):
+            for n in range(3):
+                yield {'id': f'id{n}', 'order_number': f'EG{n}', 'total_amount': 10.0}
+        mock_db.orders.iter_orders.side_effect = iter_orders
+
+        response = client.get('/api/admin/orders/export?from=2026-01-01&to=2026-02-01T00:00:00%2B05:30',
+                              headers=ADMIN_HEADERS)
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [line['order_number'] for line in lines] == ['EG0', 'EG1', 'EG2']
+        created_from, created_to = mock_db.orders.iter_orders.call_args[0]
+        assert created_from.isoformat() == '2026-01-01T00:00:00'
+        assert created_to.isoformat() == '2026-01-31T18:30:00'
+
+    def test_export_orders_invalid_dates(self, client, mock_db, admin_token):
+        """Test malformed date ranges are rejected"""
+        response = client.get('/api/admin/orders/export?from=yesterday', headers=ADMIN_HEADERS)
+
+        assert response.status_code == 400
+
+    def test_bulk_endpoints_require_admin_token(self, client, mock_db, monkeypatch):
+        """Test the bulk endpoints are off without a token and reject wrong tokens"""
+        monkeypatch.delenv('ADMIN_API_TOKEN', raising=False)
+        assert client.get('/api/admin/orders/export').status_code == 403
+
+        monkeypatch.setenv('ADMIN_API_TOKEN', 'admin-secret')
+        response = client.post('/api/admin/orders/import', data=order_line(),
+                               headers={'Authorization': 'Bearer wrong'})
+        assert response.status_code == 401
+        response = client.get('/api/admin/orders/export', headers={'Authorization': 'Bearer \xe9'})
+        assert response.status_code == 401
+        mock_db.orders.create_orders.assert_not_called()
@@ -72,6 +72,16 @@ class TestCart:
         assert 'error' in response_data
         assert 'Missing required fields' in response_data['error']
     
+    def test_add_to_cart_invalid_quantity(self, client, mock_db, auth_headers):
+        """Test a non-numeric quantity is rejected instead of failing in the database"""
+        mock_db.carts.add_item_to_cart.side_effect = ValueError('Quantity must be a positive integer')
+        item_data = {'id': 'item123', 'name': 'Test Glass', 'price': 50.0, 'quantity': 'two'}
+        
+        response = client.post('/api/cart/items', json=item_data, headers=auth_headers)
+        
+        assert response.status_code == 400
+        assert 'Quantity must be a positive integer' in response.get_json()['error']
+    
     def test_add_to_cart_unauthorized(self, client, mock_db):
         """Test adding item to cart without authentication"""
         item_data = {
@@ -26,6 +26,69 @@ class TestDatabaseOperations:
         assert db.db is not None
         mock_client.assert_called_once()
     
+    @patch('database.mongodb.MongoClient')
+    def test_mongodb_connect_does_not_build_indexes(self, mock_client):
+        """Test startup only reads the recorded schema version"""
+        from database.mongodb import MongoDB, SCHEMA_VERSION
+        
+        database = mock_client.return_value.__getitem__.return_value
+        database.meta.find_one.return_value = {'_id': 'schema', 'version': SCHEMA_VERSION}
+        
+        db = MongoDB()
+        
+        assert db.schema_version == SCHEMA_VERSION
+        database.meta.find_one.assert_called_once_with({'_id': 'schema'})
+        assert not any('create_index' in str(call) for call in database.mock_calls)
+    
+    def test_reconcile_indexes(self):
+        """Test the index migration creates missing, rebuilds changed and drops stale indexes"""
+        from database import migrations
+        from database.mongodb import SCHEMA_VERSION
+        
+        collections = {}
+        
+        def collection(name):
+            if name not in collections:
+                collections[name] = Mock()
+                collections[name].list_indexes.return_value = [{'name': '_id_', 'key': {'_id': 1}}]
+            return collections[name]
+        
+        orders = collection('orders')
+        orders.list_indexes.return_value = [
+            {'name': '_id_', 'key': {'_id': 1}},
+            {'name': 'orderId_1', 'key': {'orderId': 1}, 'unique': True},
+            {'name': 'order_number_1', 'key': {'order_number': 1}},
+            {'name': 'status_1', 'key': {'status': 1}}
+        ]
+        
+        with patch.object(migrations, 'db') as mock_db:
+            mock_db.mongodb.db.__getitem__ = Mock(side_effect=collection)
+            report = migrations.reconcile_indexes()
+            meta_update = mock_db.mongodb.db.meta.update_one.call_args
+        
+        assert 'orders.orderId_1' in report['dropped']
+        # order_number lost its unique flag, so it is rebuilt
+        assert 'orders.order_number_1' in report['dropped']
+        assert 'orders.order_number_1' in report['created']
+        assert 'orders.status_1' not in report['created']
+        assert 'orders.user_id_1_created_at_-1__id_-1' in report['created']
+        orders.create_index.assert_any_call([('order_number', 1)], name='order_number_1', background=True, unique=True)
+        assert meta_update[0][1]['$set']['version'] == SCHEMA_VERSION
+    
+    def test_reconcile_indexes_keep_stale(self):
+        """Test undeclared indexes survive when dropping is disabled"""
+        from database import migrations
+        
+        collection = Mock()
+        collection.list_indexes.return_value = [{'name': 'orderId_1', 'key': {'orderId': 1}}]
+        
+        with patch.object(migrations, 'db') as mock_db:
+            mock_db.mongodb.db.__getitem__ = Mock(return_value=collection)
+            report = migrations.reconcile_indexes(drop_stale=False)
+        
+        assert report['dropped'] == []
+        collection.drop_index.assert_not_called()
+    
     @patch('database.mongodb.MongoClient')
     def test_mongodb_connection_failure(self, mock_client):
         """Test MongoDB connection failure"""
@@ -37,6 +100,47 @@ class TestDatabaseOperations:
         with pytest.raises(Exception):
             MongoDB()
     
+    def test_lazy_db_handle_defers_connection(self):
+        """Test the database handle connects on first use, not on import"""
+        from database.mongodb import LazyEdgecraftDB
+        
+        factory = Mock()
+        handle = LazyEdgecraftDB(factory)
+        
+        assert handle.connected is False
+        factory.assert_not_called()
+        
+        handle.products
+        handle.orders
+        
+        factory.assert_called_once()
+        assert handle.connected is True
+    
+    def test_lazy_db_handle_reconnects_after_fork(self):
+        """Test a forked process opens its own client instead of reusing the parent's"""
+        from database.mongodb import LazyEdgecraftDB
+        
+        factory = Mock(side_effect=[Mock(name='parent'), Mock(name='child')])
+        handle = LazyEdgecraftDB(factory)
+        
+        parent_products = handle.products
+        with patch('database.mongodb.os.getpid', return_value=-1):
+            child_products = handle.products
+        
+        assert factory.call_count == 2
+        assert parent_products is not child_products
+    
+    def test_lazy_db_handle_close_without_connection(self):
+        """Test closing an unused handle does not connect"""
+        from database.mongodb import LazyEdgecraftDB
+        
+        factory = Mock()
+        handle = LazyEdgecraftDB(factory)
+        handle.close()
+        handle.reset()
+        
+        factory.assert_not_called()
+    
     def test_user_operations_create_user(self):
         """Test user creation operation"""
         from database.mongodb import UserOperations
@@ -109,6 +213,355 @@ class TestDatabaseOperations:
         assert result is None
         mock_collection.find_one.assert_called_once()
     
+    def test_user_cache_serves_repeat_lookups(self):
+        """Test repeated id and email lookups hit the cache"""
+        from database.mongodb import UserOperations
+        
+        mock_db = Mock()
+        user_ops = UserOperations(mock_db)
+        user_id = ObjectId()
+        mock_db.users.find_one.return_value = {
+            '_id': user_id,
+            'name': 'Test User',
+            'email': 'test@example.com',
+            'password_hash': 'hashed_password'
+        }
+        
+        first = user_ops.find_user_by_id(str(user_id))
+        del first['password_hash']
+        second = user_ops.find_user_by_id(str(user_id))
+        by_email = user_ops.find_user_by_email('test@example.com')
+        
+        mock_db.users.find_one.assert_called_once()
+        assert second['password_hash'] == 'hashed_password'
+        assert by_email['id'] == str(user_id)
+        assert user_ops.cache_stats()['hits'] == 2
+        assert user_ops.cache_stats()['misses'] == 1
+    
+    def test_user_cache_remembers_unknown_ids(self):
+        """Test unknown ids are cached as misses"""
+        from database.mongodb import UserOperations
+        
+        mock_db = Mock()
+        user_ops = UserOperations(mock_db)
+        mock_db.users.find_one.return_value = None
+        user_id = str(ObjectId())
+        
+        assert user_ops.find_user_by_id(user_id) is None
+        assert user_ops.find_user_by_id(user_id) is None
+        
+        mock_db.users.find_one.assert_called_once()
+    
+    def test_user_cache_invalidated_by_update(self):
+        """Test update_user drops the cached profile"""
+        from database.mongodb import UserOperations
+        
+        mock_db = Mock()
+        user_ops = UserOperations(mock_db)
+        user_id = ObjectId()
+        mock_db.users.find_one.return_value = {
+            '_id': user_id,
+            'name': 'Test User',
+            'email': 'test@example.com'
+        }
+        user_ops.find_user_by_id(str(user_id))
+        mock_db.users.update_one.return_value.modified_count = 1
+        
+        user_ops.update_user(str(user_id), {'name': 'Renamed'})
+        mock_db.users.find_one.return_value = {
+            '_id': user_id,
+            'name': 'Renamed',
+            'email': 'test@example.com'
+        }
+        
+        assert user_ops.find_user_by_email('test@example.com')['name'] == 'Renamed'
+        assert mock_db.users.find_one.call_count == 2
+    
+    def test_ttl_cache_expires_and_evicts(self):
+        """Test entries expire after the TTL and the oldest are evicted"""
+        from database.mongodb import TTLCache
+        
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('a') == (True, 1)
+        assert cache.get('b') == (False, None)
+        
+        cache.set('c', 3, ttl=-1)
+        
+        assert cache.get('c') == (False, None)
+        assert cache.stats()['size'] == 1
+    
+    def test_rate_limit_counters(self):
+        """Test shared rate limit counters are upserted per window"""
+        from database.mongodb import RateLimitOperations
+        
+        mock_db = Mock()
+        counters = RateLimitOperations(mock_db)
+        mock_db.rate_limits.find_one_and_update.return_value = {'count': 3}
+        mock_db.rate_limits.find_one.return_value = None
+        
+        assert counters.incr('login:ip:1.2.3.4', 1020.0, ttl=120) == 3
+        assert counters.get('login:ip:1.2.3.4', 960.0) == 0
+        
+        query, update = mock_db.rate_limits.find_one_and_update.call_args[0]
+        assert query == {'_id': 'login:ip:1.2.3.4|1020'}
+        assert update['$inc'] == {'count': 1}
+        assert mock_db.rate_limits.find_one_and_update.call_args[1]['upsert'] is True
+    
+    def test_idempotency_claim(self):
+        """Test the first claim wins and later claims see the stored claim"""
+        from database.mongodb import IdempotencyOperations
+        from pymongo.errors import DuplicateKeyError
+        
+        mock_db = Mock()
+        claims = IdempotencyOperations(mock_db)
+        
+        assert claims.claim('u1', 'k1', 'abc', ttl=60, lease=30) is None
+        inserted = mock_db.idempotency_keys.insert_one.call_args[0][0]
+        assert inserted['_id'] == 'u1:k1'
+        assert inserted['state'] == 'in_progress'
+        
+        existing = {'_id': 'u1:k1', 'state': 'completed', 'fingerprint': 'abc'}
+        mock_db.idempotency_keys.insert_one.side_effect = DuplicateKeyError('dup')
+        mock_db.idempotency_keys.find_one_and_update.return_value = None
+        mock_db.idempotency_keys.find_one.return_value = existing
+        
+        assert claims.claim('u1', 'k1', 'abc', ttl=60, lease=30) == existing
+    
+    def test_idempotency_claim_takes_over_expired_lease(self):
+        """Test an abandoned in-progress claim can be taken over"""
+        from database.mongodb import IdempotencyOperations
+        from pymongo.errors import DuplicateKeyError
+        
+        mock_db = Mock()
+        claims = IdempotencyOperations(mock_db)
+        mock_db.idempotency_keys.insert_one.side_effect = DuplicateKeyError('dup')
+        mock_db.idempotency_keys.find_one_and_update.return_value = {'_id': 'u1:k1'}
+        
+        assert claims.claim('u1', 'k1', 'abc', ttl=60, lease=30) is None
+        query = mock_db.idempotency_keys.find_one_and_update.call_args[0][0]
+        assert query['state'] == 'in_progress'
+        assert '$lt' in query['locked_until']
+    
+    def test_order_operations_create_orders_batch(self):
+        """Test a batch is one unordered insert_many and per-order failures are reported"""
+        from pymongo.errors import BulkWriteError
+        from database.mongodb import OrderOperations
+        
+        mock_db = Mock()
+        mock_db.orders.insert_many.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'E11000 duplicate key'}]
+        })
+        orders = OrderOperations(mock_db)
+        orders._generate_order_number = Mock(side_effect=['EG1', 'EG2'])
+        base = {'user_id': 'u1', 'total_amount': 10.0, 'payment_method': 'UPI', 'billing_info': {},
+                'items': [{'id': 'a', 'price': 10.0, 'quantity': 1}]}
+        
+        results = orders.create_orders([dict(base), {'user_id': 'u1'}, dict(base, order_number='EG0')],
+                                       normalized=True)
+        
+        assert results[0]['order']['order_number'] == 'EG1'
+        assert results[1] == {'error': 'Missing required field: total_amount'}
+        assert results[2] == {'error': 'Duplicate order number'}
+        inserted = mock_db.orders.insert_many.call_args
+        assert len(inserted[0][0]) == 2
+        assert inserted[1] == {'ordered': False}
+    
+    def test_order_operations_iter_orders(self):
+        """Test exports read a date range from a batched server-side cursor"""
+        from database.mongodb import OrderOperations
+        
+        mock_db = Mock()
+        cursor = mock_db.orders.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__ = Mock(return_value=iter([
+            {'_id': ObjectId(), 'order_number': 'EG1', 'schema_version': 2, 'created_at': datetime(2026, 1, 2)}
+        ]))
+        orders = OrderOperations(mock_db)
+        
+        exported = list(orders.iter_orders(datetime(2026, 1, 1), datetime(2026, 2, 1), batch_size=100))
+        
+        assert exported[0]['order_number'] == 'EG1'
+        assert exported[0]['created_at'] == '2026-01-02T00:00:00'
+        query = mock_db.orders.find.call_args[0][0]
+        assert query == {'created_at': {'$gte': datetime(2026, 1, 1), '$lt': datetime(2026, 2, 1)}}
+        mock_db.orders.find.return_value.sort.return_value.batch_size.assert_called_once_with(100)
+        cursor.close.assert_called_once()
+    
+    def _order_placement(self, mode):
+        from database.mongodb import OrderPlacement
+        
+        mock_db = MagicMock()
+        orders = Mock()
+        orders.create_order.side_effect = lambda order_data, session=None, normalized=False: dict(order_data, id='o1')
+        carts = Mock()
+        products = Mock()
+        products.stock_shards.return_value = 0
+        mock_db.products.update_many.return_value.modified_count = 0
+        placement = OrderPlacement(mock_db, orders, carts, products, mode=mode, max_retries=2)
+        return placement, mock_db, orders, carts
+    
+    def test_order_placement_requested_stock(self):
+        """Test cart lines map to catalog products and glass pieces"""
+        from database.mongodb import OrderPlacement
+        
+        first, second = str(ObjectId()), str(ObjectId())
+        items = [
+            {'id': f'{second}-1735689600000', 'quantity': 1, 'customization': {'quantity': 3}},
+            {'id': f'{first}-1735689600001', 'quantity': 2},
+            {'id': f'{second}-1735689600002', 'quantity': 1},
+            {'id': 'gift-set-1735689600003', 'quantity': 1}
+        ]
+        
+        assert OrderPlacement.requested_stock(items) == sorted([(first, 2), (second, 4)])
+    
+    def test_order_placement_compensates_when_short(self):
+        """Test stock taken for earlier lines is given back when a later line is short"""
+        from database.mongodb import InsufficientStock
+        
+        placement, mock_db, orders, carts = self._order_placement('off')
+        first, second = sorted([str(ObjectId()), str(ObjectId())])
+        mock_db.products.update_one.side_effect = [
+            Mock(modified_count=1), Mock(modified_count=0), Mock(), Mock(modified_count=1)
+        ]
+        mock_db.products.find_one.return_value = {'stock_quantity': 0}
+        
+        with pytest.raises(InsufficientStock) as exc:
+            placement.place_order({'user_id': 'u1', 'items': [
+                {'id': first, 'quantity': 2}, {'id': second, 'quantity': 1}
+            ]})
+        
+        assert exc.value.product_ids == [second]
+        release = mock_db.products.update_one.call_args_list[2][0]
+        assert release[0] == {'_id': ObjectId(first)}
+        assert release[1]['$inc'] == {'stock_quantity': 2}
+        restock = mock_db.products.update_one.call_args_list[3][0]
+        assert restock == (
+            {'_id': ObjectId(first), 'in_stock': False, 'sold_out_by_stock': True},
+            {'$set': {'in_stock': True}, '$unset': {'sold_out_by_stock': ''}}
+        )
+        placement.products.cache.invalidate.assert_called_once()
+        orders.create_order.assert_not_called()
+        carts.clear_cart.assert_not_called()
+        assert placement.stats['insufficient'] == 1
+    
+    def test_order_placement_without_transactions(self):
+        """Test the standalone path reserves conditionally, then inserts and clears the cart"""
+        placement, mock_db, orders, carts = self._order_placement('off')
+        product_id = str(ObjectId())
+        mock_db.products.update_one.return_value.modified_count = 1
+        
+        order = placement.place_order({'user_id': 'u1', 'items': [{'id': product_id, 'quantity': 3}]})
+        
+        query, update = mock_db.products.update_one.call_args[0]
+        assert query == {'_id': ObjectId(product_id), 'stock_quantity': {'$gte': 3}}
+        assert update['$inc'] == {'stock_quantity': -3}
+        assert order['id'] == 'o1'
+        carts.clear_cart.assert_called_once_with('u1')
+        mock_db.products.update_many.assert_called_once()
+    
+    def test_order_placement_untracked_products(self):
+        """Test products without a stock level do not block the order"""
+        placement, mock_db, orders, carts = self._order_placement('off')
+        mock_db.products.update_one.return_value.modified_count = 0
+        mock_db.products.find_one.return_value = {'_id': ObjectId()}
+        
+        placement.place_order({'user_id': 'u1', 'items': [{'id': str(ObjectId()), 'quantity': 1}]})
+        
+        orders.create_order.assert_called_once()
+    
+    def test_order_placement_sharded_product(self):
+        """Test hot products reserve from their stock counters instead of the product"""
+        placement, mock_db, orders, carts = self._order_placement('off')
+        product_id = str(ObjectId())
+        placement.products.stock_shards.return_value = 8
+        placement.products.stock.decrement.return_value = True
+        placement.products.stock.totals.return_value = {product_id: 0}
+        
+        placement.place_order({'user_id': 'u1', 'items': [{'id': product_id, 'quantity': 2}]})
+        
+        placement.products.stock.decrement.assert_called_once_with(product_id, 2, 8, None)
+        mock_db.products.update_one.assert_not_called()
+        sold_out = mock_db.products.update_many.call_args[0][0]['$or'][1]
+        assert sold_out == {'_id': {'$in': [ObjectId(product_id)]}}
+        assert mock_db.products.update_many.call_args[0][1] == {'$set': {'in_stock': False, 'sold_out_by_stock': True}}
+        placement.products.stock.rebalance_due.assert_called_once()
+    
+    def test_order_placement_transaction_retries_conflicts(self):
+        """Test write conflicts on hot products are retried a bounded number of times"""
+        from pymongo.errors import OperationFailure
+        from database.mongodb import OrderPlacementConflict
+        
+        placement, mock_db, orders, carts = self._order_placement('on')
+        conflict = OperationFailure('WriteConflict', code=112, details={'errorLabels': ['TransientTransactionError']})
+        mock_db.products.update_one.side_effect = [conflict, Mock(modified_count=1)]
+        session = mock_db.client.start_session.return_value.__enter__.return_value
+        
+        with patch('database.mongodb.time.sleep'):
+            order = placement.place_order({'user_id': 'u1', 'items': [{'id': str(ObjectId()), 'quantity': 1}]})
+        
+        assert order['id'] == 'o1'
+        assert placement.stats['retries'] == 1
+        assert orders.create_order.call_args[1]['session'] is session
+        carts.clear_cart.assert_called_once_with('u1', session=session)
+        session.commit_transaction.assert_called_once()
+        
+        mock_db.products.update_one.side_effect = conflict
+        with patch('database.mongodb.time.sleep'), pytest.raises(OrderPlacementConflict):
+            placement.place_order({'user_id': 'u1', 'items': [{'id': str(ObjectId()), 'quantity': 1}]})
+        assert placement.stats['conflicts'] == 1
+    
+    def test_order_placement_retries_conflict_on_order_insert(self):
+        """Test write conflicts on the order insert or cart clear retry the whole transaction"""
+        from pymongo.errors import OperationFailure
+        from database.mongodb import OrderPlacement, OrderOperations, CartOperations
+        
+        mock_db = MagicMock()
+        conflict = OperationFailure('WriteConflict', code=112, details={'errorLabels': ['TransientTransactionError']})
+        # The insert conflicts on the first attempt, the cart clear on the second
+        mock_db.orders.insert_one.side_effect = [conflict] + [Mock(inserted_id=ObjectId()) for _ in range(2)]
+        mock_db.carts.update_one.side_effect = [conflict, Mock(upserted_id=None)]
+        mock_db.products.update_one.return_value.modified_count = 1
+        mock_db.products.update_many.return_value.modified_count = 0
+        orders = OrderOperations(mock_db)
+        orders._generate_order_number = Mock(return_value='EG1')
+        products = Mock()
+        products.stock_shards.return_value = 0
+        placement = OrderPlacement(mock_db, orders, CartOperations(mock_db), products, mode='on', max_retries=3)
+        order_data = {'user_id': 'u1', 'total_amount': 10.0, 'payment_method': 'UPI', 'billing_info': {},
+                      'items': [{'id': str(ObjectId()), 'name': 'Glass', 'price': 10.0, 'quantity': 1}]}
+        
+        with patch('database.mongodb.time.sleep'):
+            order = placement.place_order(order_data)
+        
+        assert order['order_number'] == 'EG1'
+        assert placement.stats['retries'] == 2
+        assert mock_db.orders.insert_one.call_count == 3
+        assert mock_db.carts.update_one.call_count == 2
+        mock_db.client.start_session.return_value.__enter__.return_value.commit_transaction.assert_called_once()
+    
+    def test_order_placement_sold_out_invalidates_after_commit(self):
+        """Test the catalog version is bumped only once the sold-out flag is committed"""
+        placement, mock_db, orders, carts = self._order_placement('on')
+        mock_db.products.update_one.return_value.modified_count = 1
+        mock_db.products.update_many.return_value.modified_count = 1
+        session = mock_db.client.start_session.return_value.__enter__.return_value
+        placement.products.cache.invalidate.side_effect = (
+            lambda: session.commit_transaction.assert_called_once()
+        )
+        
+        placement.place_order({'user_id': 'u1', 'items': [{'id': str(ObjectId()), 'quantity': 1}]})
+        
+        placement.products.cache.invalidate.assert_called_once()
+        
+        mock_db.products.update_many.return_value.modified_count = 0
+        placement.place_order({'user_id': 'u1', 'items': [{'id': str(ObjectId()), 'quantity': 1}]})
+        
+        placement.products.cache.invalidate.assert_called_once()
+    
     def test_product_operations_create_product(self):
         """Test product creation operation"""
         from database.mongodb import ProductOperations
@@ -169,6 +622,272 @@ class TestDatabaseOperations:
         assert all('_id' not in product for product in result)
         mock_collection.find.assert_called_once()
     
+    def test_product_operations_catalog_cache(self):
+        """Test repeated catalog reads are served from the in-memory snapshot"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = Mock()
+        mock_db.meta.find_one.return_value = {'_id': 'catalog', 'version': 1}
+        
+        product_ops = ProductOperations(mock_db)
+        product_id = ObjectId()
+        mock_db.products.find.return_value.sort.return_value = [
+            {'_id': product_id, 'name': 'Mirror Glass', 'category': 'Mirrors'}
+        ]
+        
+        assert len(product_ops.find_all_products()) == 1
+        assert product_ops.find_products_by_category('Mirrors')[0]['name'] == 'Mirror Glass'
+        assert product_ops.find_product_by_id(str(product_id))['id'] == str(product_id)
+        
+        mock_db.products.find.assert_called_once()
+        mock_db.products.find_one.assert_not_called()
+    
+    def test_product_operations_cache_invalidated_on_write(self):
+        """Test catalog writes bump the shared version and drop the snapshot"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = Mock()
+        mock_db.meta.find_one.return_value = {'_id': 'catalog', 'version': 1}
+        mock_db.products.find.return_value.sort.return_value = []
+        mock_db.products.insert_one.return_value.inserted_id = ObjectId()
+        
+        product_ops = ProductOperations(mock_db)
+        product_ops.find_all_products()
+        product_ops.create_product({'name': 'Tinted Glass', 'category': 'Decorative'})
+        product_ops.find_all_products()
+        
+        assert mock_db.products.find.call_count == 2
+        mock_db.meta.update_one.assert_called_once()
+        assert mock_db.meta.update_one.call_args[0][1]['$inc'] == {'version': 1}
+    
+    def test_product_operations_cache_follows_shared_version(self):
+        """Test a version bump from another worker triggers a rebuild"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = Mock()
+        mock_db.meta.find_one.return_value = {'_id': 'catalog', 'version': 1}
+        mock_db.products.find.return_value.sort.return_value = []
+        
+        product_ops = ProductOperations(mock_db)
+        product_ops.cache.poll_interval = 0
+        product_ops.find_all_products()
+        product_ops.find_all_products()
+        assert mock_db.products.find.call_count == 1
+        
+        mock_db.meta.find_one.return_value = {'_id': 'catalog', 'version': 2}
+        product_ops.find_all_products()
+        assert mock_db.products.find.call_count == 2
+    
+    def test_stock_counters_split(self):
+        """Test stock is spread evenly over the shards"""
+        from database.mongodb import StockCounters
+        
+        assert StockCounters.split(10, 4) == [3, 3, 2, 2]
+        assert StockCounters.split(0, 3) == [0, 0, 0]
+    
+    def test_stock_counters_decrement_one_shard(self):
+        """Test a reservation decrements one randomly picked shard conditionally"""
+        from database.mongodb import StockCounters
+        
+        collection = Mock()
+        collection.update_one.return_value.modified_count = 1
+        counters = StockCounters(collection)
+        
+        with patch('database.mongodb.random.randrange', return_value=2):
+            assert counters.decrement('p1', 3, shards=4) is True
+        
+        query, update = collection.update_one.call_args[0]
+        assert query == {'_id': 'p1:2', 'count': {'$gte': 3}}
+        assert update == {'$inc': {'count': -3}}
+        collection.find.assert_not_called()
+    
+    def test_stock_counters_decrement_across_shards(self):
+        """Test a short shard falls back to the fullest shards and flags a rebalance"""
+        from database.mongodb import StockCounters
+        
+        collection = Mock()
+        collection.find.return_value = [
+            {'_id': 'p1:0', 'count': 0}, {'_id': 'p1:1', 'count': 2}, {'_id': 'p1:2', 'count': 3}
+        ]
+        collection.update_one.side_effect = [Mock(modified_count=0), Mock(modified_count=1), Mock(modified_count=1)]
+        counters = StockCounters(collection, rebalance_interval=0)
+        
+        assert counters.decrement('p1', 4, shards=3) is True
+        
+        taken = [c[0] for c in collection.update_one.call_args_list[1:]]
+        assert taken[0] == ({'_id': 'p1:2', 'count': {'$gte': 3}}, {'$inc': {'count': -3}})
+        assert taken[1] == ({'_id': 'p1:1', 'count': {'$gte': 1}}, {'$inc': {'count': -1}})
+        assert 'p1' in counters._uneven
+        
+        collection.update_one.side_effect = None
+        collection.update_one.return_value.modified_count = 0
+        assert counters.decrement('p1', 6, shards=3) is False
+    
+    def test_stock_counters_rebalance(self):
+        """Test rebalancing moves units between shards without changing the total"""
+        from database.mongodb import StockCounters
+        
+        collection = Mock()
+        collection.find.return_value = [
+            {'_id': 'p1:0', 'count': 9}, {'_id': 'p1:1', 'count': 0}, {'_id': 'p1:2', 'count': 3}
+        ]
+        collection.update_one.return_value.modified_count = 1
+        counters = StockCounters(collection)
+        
+        assert counters.rebalance('p1') == 5
+        
+        moves = {}
+        for call in collection.update_one.call_args_list:
+            query, update = call[0]
+            moves[query['_id']] = moves.get(query['_id'], 0) + update['$inc']['count']
+        assert moves == {'p1:0': -5, 'p1:1': 4, 'p1:2': 1}
+    
+    def test_stock_counters_totals_cached(self):
+        """Test totals come from one aggregation and are cached briefly"""
+        from database.mongodb import StockCounters
+        
+        collection = Mock()
+        collection.aggregate.return_value = [{'_id': 'p1', 'count': 7}]
+        counters = StockCounters(collection, level_ttl=60)
+        
+        assert counters.totals(['p1', 'p2']) == {'p1': 7, 'p2': 0}
+        assert counters.totals(['p1']) == {'p1': 7}
+        collection.aggregate.assert_called_once()
+        
+        counters.totals(['p1'], fresh=True)
+        assert collection.aggregate.call_count == 2
+    
+    def test_product_operations_sharded_stock_overlay(self):
+        """Test stock levels report the summed counters of sharded products, cached catalog reads none"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = Mock()
+        mock_db.meta.find_one.return_value = {'_id': 'catalog', 'version': 1}
+        product_id = ObjectId()
+        mock_db.products.find.return_value.sort.return_value = [
+            {'_id': product_id, 'name': 'Promo Glass', 'category': 'Clear', 'stock_shards': 4, 'in_stock': True},
+            {'_id': ObjectId(), 'name': 'Plain Glass', 'category': 'Clear', 'stock_quantity': 5}
+        ]
+        mock_db.stock_counters.aggregate.return_value = [{'_id': str(product_id), 'count': 0}]
+        product_ops = ProductOperations(mock_db)
+        
+        products = product_ops.find_all_products()
+        
+        assert 'stock_quantity' not in products[0]
+        assert 'stock_quantity' not in products[1]
+        mock_db.stock_counters.aggregate.assert_not_called()
+        assert product_ops.stock_shards(str(product_id)) == 4
+        mock_db.products.find_one.return_value = {'_id': product_id, 'stock_shards': 4, 'in_stock': True}
+        assert product_ops.stock_level(str(product_id)) == {
+            'product_id': str(product_id), 'stock_quantity': 0, 'in_stock': False
+        }
+        assert product_ops.stock_level('not-an-id') is None
+    
+    def test_product_operations_enable_stock_shards(self):
+        """Test sharding moves stock_quantity into counters"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = Mock()
+        product_id = str(ObjectId())
+        mock_db.products.find_one_and_update.return_value = {'_id': ObjectId(product_id), 'stock_quantity': 10}
+        product_ops = ProductOperations(mock_db)
+        
+        assert product_ops.enable_stock_shards(product_id, 4) == 10
+        
+        update = mock_db.products.find_one_and_update.call_args[0][1]
+        assert update['$set']['stock_shards'] == 4
+        assert update['$unset'] == {'stock_quantity': ''}
+        inserted = mock_db.stock_counters.insert_many.call_args[0][0]
+        assert [counter['count'] for counter in inserted] == [3, 3, 2, 2]
+        assert inserted[0]['_id'] == f"{product_id}:0"
+        
+        with pytest.raises(ValueError):
+            product_ops.enable_stock_shards(product_id, 1)
+    
+    def test_product_operations_find_page(self):
+        """Test keyset pagination with a pushed-down projection"""
+        from database.mongodb import ProductOperations, decode_cursor
+        
+        mock_db = Mock()
+        product_ops = ProductOperations(mock_db)
+        
+        first_id, second_id = ObjectId(), ObjectId()
+        created_at = datetime(2025, 1, 1, 12, 0, 0)
+        mock_db.products.find.return_value.sort.return_value.limit.return_value = [
+            {'_id': first_id, 'name': 'Product 1', 'created_at': created_at},
+            {'_id': second_id, 'name': 'Product 2', 'created_at': created_at}
+        ]
+        
+        page = product_ops.find_products_page(category='Mirrors', limit=1, fields=['name'])
+        
+        query, projection = mock_db.products.find.call_args[0]
+        assert query == {'category': 'Mirrors'}
+        assert projection == {'name': 1, 'created_at': 1}
+        mock_db.products.find.return_value.sort.return_value.limit.assert_called_once_with(2)
+        assert page['products'] == [{'name': 'Product 1', 'id': str(first_id)}]
+        assert decode_cursor(page['next_cursor']) == (created_at, first_id)
+        
+        mock_db.products.find.return_value.sort.return_value.limit.return_value = []
+        product_ops.find_products_page(after=page['next_cursor'])
+        
+        query = mock_db.products.find.call_args[0][0]
+        assert query['$or'][1] == {'created_at': created_at, '_id': {'$lt': first_id}}
+    
+    def test_product_operations_update_in_stock_clears_sold_out_tag(self):
+        """Test an admin's in_stock flag is not restored by a compensated order"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = MagicMock()
+        product_ops = ProductOperations(mock_db)
+        product_id = ObjectId()
+        mock_db.products.update_one.return_value.modified_count = 1
+        
+        product_ops.update_product(str(product_id), {'in_stock': False})
+        
+        update = mock_db.products.update_one.call_args[0][1]
+        assert update['$set']['in_stock'] is False
+        assert update['$unset'] == {'sold_out_by_stock': ''}
+        
+        product_ops.update_product(str(product_id), {'name': 'Renamed'})
+        
+        assert '$unset' not in mock_db.products.update_one.call_args[0][1]
+    
+    def test_product_operations_find_page_strips_helper_fields(self):
+        """Test a sparse page returns only the requested fields plus the id"""
+        from database.mongodb import ProductOperations
+        
+        mock_db = MagicMock()
+        product_ops = ProductOperations(mock_db)
+        
+        product_id = ObjectId()
+        mock_db.products.find.return_value.sort.return_value.limit.return_value = [
+            {'_id': product_id, 'name': 'Product 1', 'in_stock': True, 'stock_shards': 4,
+             'created_at': datetime(2025, 1, 1, 12, 0, 0)}
+        ]
+        mock_db.stock_counters.aggregate.return_value = [{'_id': str(product_id), 'count': 0}]
+        
+        page = product_ops.find_products_page(fields=['name', 'in_stock'])
+        
+        projection = mock_db.products.find.call_args[0][1]
+        assert projection == {'name': 1, 'in_stock': 1, 'created_at': 1, 'stock_shards': 1}
+        assert page['products'] == [{'id': str(product_id), 'name': 'Product 1', 'in_stock': False}]
+        assert set(page['products'][0]) == {'id', 'name', 'in_stock'}
+    
+    def test_product_operations_find_page_invalid_arguments(self):
+        """Test invalid pagination arguments are rejected"""
+        from database.mongodb import ProductOperations
+        
+        product_ops = ProductOperations(Mock())
+        
+        with pytest.raises(ValueError):
+            product_ops.find_products_page(limit=1000)
+        with pytest.raises(ValueError):
+            product_ops.find_products_page(limit=0)
+        with pytest.raises(ValueError):
+            product_ops.find_products_page(fields=['password_hash'])
+        with pytest.raises(ValueError):
+            product_ops.find_products_page(after='not-a-cursor')
+    
     def test_order_operations_create_order(self):
         """Test order creation operation"""
         from database.mongodb import OrderOperations
@@ -181,7 +900,7 @@ class TestDatabaseOperations:
         
         # Mock successful insertion
         mock_collection.insert_one.return_value.inserted_id = ObjectId()
-        mock_collection.find_one.return_value = None  # For order number uniqueness check
+        mock_db.counters.find_one_and_update.return_value = {'_id': 'order_number', 'seq': 50}
         
         order_data = {
             'user_id': 'user123',
@@ -213,23 +932,160 @@ class TestDatabaseOperations:
         assert result['total_amount'] == 100.0
         mock_collection.insert_one.assert_called_once()
     
+    def test_order_operations_normalize_is_read_only(self):
+        """Test reading legacy orders never writes back to the collection"""
+        from database.mongodb import OrderOperations
+        from bson.decimal128 import Decimal128
+        
+        mock_db = Mock()
+        order_ops = OrderOperations(mock_db)
+        
+        legacy_order = {
+            '_id': ObjectId(),
+            'order_number': 'EG20240101ABC123',
+            'total_amount': Decimal128('150.50'),
+            'items': [{'id': 'item1', 'price': '150.50', 'quantity': 1}]
+        }
+        
+        result = order_ops._normalize_order(legacy_order)
+        
+        assert result['total_amount'] == 150.5
+        assert result['items'][0]['price'] == 150.5
+        mock_db.orders.update_one.assert_not_called()
+    
+    def test_backfill_orders(self):
+        """Test the order backfill normalizes amounts in bulk"""
+        from database import migrations
+        from database.mongodb import ORDER_SCHEMA_VERSION
+        
+        legacy_id = ObjectId()
+        with patch.object(migrations, 'db') as mock_db:
+            collection = mock_db.orders.collection
+            collection.find.return_value = [
+                {'_id': legacy_id, 'total_amount': '99.90', 'items': [{'price': '99.90', 'quantity': 1}]}
+            ]
+            collection.bulk_write.return_value.modified_count = 1
+            
+            migrated = migrations.backfill_orders(batch_size=100)
+        
+        assert migrated == 1
+        operations = collection.bulk_write.call_args[0][0]
+        assert len(operations) == 1
+        update = operations[0]._doc['$set']
+        assert update['total_amount'] == 99.9
+        assert update['items'][0]['price'] == 99.9
+        assert update['schema_version'] == ORDER_SCHEMA_VERSION
+        assert collection.bulk_write.call_args[1] == {'ordered': False}
+    
+    def test_backfill_orders_from_older_version(self):
+        """Test orders stored at an older, non-null schema version are matched and migrated"""
+        from database import migrations
+        from database.mongodb import ORDER_SCHEMA_VERSION
+        
+        order_id = ObjectId()
+        stored = {'_id': order_id, 'schema_version': 1, 'total_amount': 10.0,
+                  'items': [{'price': 10.0, 'quantity': 1}], 'billing_info': {}}
+        with patch.object(migrations, 'db') as mock_db:
+            collection = mock_db.orders.collection
+            # Only projected fields come back, as from the server
+            collection.find.side_effect = lambda query, projection, **kwargs: [
+                {key: value for key, value in stored.items() if key == '_id' or key in projection}
+            ]
+            collection.bulk_write.return_value.modified_count = 1
+            
+            assert migrations.backfill_orders(batch_size=100) == 1
+        
+        operation = collection.bulk_write.call_args[0][0][0]
+        assert operation._filter == {'_id': order_id, 'schema_version': 1}
+        assert operation._doc['$set']['schema_version'] == ORDER_SCHEMA_VERSION
+    
+    def test_order_operations_find_orders_invalid_limit(self):
+        """Test a zero or oversized page limit is rejected rather than defaulted"""
+        from database.mongodb import OrderOperations
+        
+        order_ops = OrderOperations(Mock())
+        
+        for limit in (0, -1, 1000):
+            with pytest.raises(ValueError, match='Limit must be between'):
+                order_ops.find_orders_by_user('user123', limit=limit)
+    
+    def test_order_operations_find_orders_by_user_summaries(self):
+        """Test order history is a projected, keyset-paginated summary"""
+        from database.mongodb import OrderOperations, decode_cursor
+        from bson.decimal128 import Decimal128
+        
+        mock_db = Mock()
+        order_ops = OrderOperations(mock_db)
+        
+        first_id, second_id = ObjectId(), ObjectId()
+        created_at = datetime(2025, 1, 1, 12, 0, 0)
+        mock_db.orders.find.return_value.sort.return_value.limit.return_value = [
+            {'_id': first_id, 'order_number': 'EG1', 'status': 'confirmed',
+             'total_amount': Decimal128('10.50'), 'item_count': 3, 'created_at': created_at},
+            {'_id': second_id, 'order_number': 'EG2', 'status': 'confirmed',
+             'total_amount': 5.0, 'item_count': 1, 'created_at': created_at}
+        ]
+        
+        page = order_ops.find_orders_by_user('user123', limit=1)
+        
+        query, projection = mock_db.orders.find.call_args[0]
+        assert query == {'user_id': 'user123'}
+        assert 'items' not in projection and 'billing_info' not in projection
+        assert page['orders'] == [{
+            'id': str(first_id),
+            'order_number': 'EG1',
+            'created_at': created_at.isoformat(),
+            'status': 'confirmed',
+            'total_amount': 10.5,
+            'payment_method': None,
+            'item_count': 3
+        }]
+        assert decode_cursor(page['next_cursor']) == (created_at, first_id)
+        mock_db.orders.update_one.assert_not_called()
+    
     def test_order_operations_generate_order_number(self):
         """Test order number generation"""
         from database.mongodb import OrderOperations
         
         mock_db = Mock()
-        mock_collection = Mock()
-        mock_db.orders = mock_collection
+        mock_db.counters.find_one_and_update.return_value = {'_id': 'order_number', 'seq': 50}
         
         order_ops = OrderOperations(mock_db)
         
-        # Mock no existing order with same number
-        mock_collection.find_one.return_value = None
-        
         order_number = order_ops._generate_order_number()
         
         assert order_number.startswith('EG')
+        assert order_number.endswith('000001')
         assert len(order_number) >= 10  # EG + date + unique part
+        mock_db.orders.find_one.assert_not_called()
+    
+    def test_order_number_allocator_reserves_blocks(self):
+        """Test order numbers come from in-memory blocks reserved with $inc"""
+        from database.mongodb import OrderNumberAllocator
+        
+        counters = Mock()
+        counters.find_one_and_update.side_effect = [
+            {'_id': 'order_number', 'seq': 3},
+            {'_id': 'order_number', 'seq': 9}
+        ]
+        
+        allocator = OrderNumberAllocator(counters, block_size=3)
+        numbers = [allocator.allocate() for _ in range(4)]
+        
+        assert [number[-6:] for number in numbers] == ['000001', '000002', '000003', '000007']
+        assert counters.find_one_and_update.call_count == 2
+        assert counters.find_one_and_update.call_args[0][1] == {'$inc': {'seq': 3}}
+    
+    def test_order_number_fallback_when_counter_unavailable(self):
+        """Test a counter failure still yields an order number"""
+        from database.mongodb import OrderOperations
+        
+        mock_db = Mock()
+        mock_db.counters.find_one_and_update.side_effect = Exception("Counter unavailable")
+        
+        order_ops = OrderOperations(mock_db)
+        
+        assert order_ops._generate_order_number().startswith('EG')
     
     def test_cart_operations_add_item(self):
         """Test adding item to cart"""
@@ -262,6 +1118,58 @@ class TestDatabaseOperations:
         
         assert result is True
         mock_collection.update_one.assert_called_once()
+        mock_collection.find_one.assert_not_called()
+        assert mock_collection.update_one.call_args[1] == {'upsert': True}
+    
+    def test_cart_operations_add_item_creates_cart(self):
+        """Test the first add upserts the cart in the same round trip"""
+        from database.mongodb import CartOperations
+        
+        mock_db = Mock()
+        cart_ops = CartOperations(mock_db)
+        
+        mock_db.carts.update_one.return_value.modified_count = 0
+        mock_db.carts.update_one.return_value.upserted_id = ObjectId()
+        
+        result = cart_ops.add_item_to_cart('user123', {'id': 'item123', 'quantity': 2})
+        
+        assert result is True
+        mock_db.carts.insert_one.assert_not_called()
+        mock_db.carts.update_one.assert_called_once()
+    
+    def test_cart_operations_add_item_retries_duplicate_upsert(self):
+        """Test a racing first add retries instead of failing on the unique index"""
+        from database.mongodb import CartOperations
+        from pymongo.errors import DuplicateKeyError
+        
+        mock_db = Mock()
+        cart_ops = CartOperations(mock_db)
+        
+        updated = Mock(modified_count=1, upserted_id=None)
+        mock_db.carts.update_one.side_effect = [DuplicateKeyError('dup'), updated]
+        
+        assert cart_ops.add_item_to_cart('user123', {'id': 'item123', 'quantity': 1}) is True
+        assert mock_db.carts.update_one.call_count == 2
+    
+    def test_cart_operations_add_item_escapes_client_values(self):
+        """Test item ids and quantities cannot inject pipeline expressions"""
+        from database.mongodb import CartOperations
+        
+        mock_db = Mock()
+        cart_ops = CartOperations(mock_db)
+        mock_db.carts.update_one.return_value.modified_count = 1
+        
+        cart_ops.add_item_to_cart('user123', {'id': '$user_id', 'quantity': 2})
+        
+        items = mock_db.carts.update_one.call_args[0][1][0]['$set']['items']['$let']['in']['$cond']
+        assert items[0] == {'$in': [{'$literal': '$user_id'}, '$$items.id']}
+        merged = items[1]['$map']['in']['$cond'][1]['$mergeObjects'][1]
+        assert merged['quantity']['$add'][1] == {'$literal': 2}
+        
+        for quantity in ('2', 0, True, {'$literal': 1}):
+            with pytest.raises(ValueError, match='Quantity must be a positive integer'):
+                cart_ops.add_item_to_cart('user123', {'id': 'item123', 'quantity': quantity})
+        assert mock_db.carts.update_one.call_count == 1
     
     def test_cart_operations_clear_cart(self):
         """Test clearing cart"""
@@ -287,6 +1195,9 @@ class TestDatabaseOperations:
         
         assert result is True
         mock_collection.update_one.assert_called_once()
+        mock_collection.find_one.assert_not_called()
+        mock_collection.insert_one.assert_not_called()
+        assert mock_collection.update_one.call_args[1] == {'upsert': True, 'session': None}
     
     def test_review_operations_create_review(self):
         """Test review creation operation"""
@@ -315,6 +1226,72 @@ class TestDatabaseOperations:
         assert result['rating'] == 5
         mock_collection.insert_one.assert_called_once()
     
+    def test_review_operations_create_review_updates_stats(self):
+        """Test creating a review increments the product rating summary"""
+        from database.mongodb import ReviewOperations
+        
+        mock_db = Mock()
+        mock_db.reviews.insert_one.return_value.inserted_id = ObjectId()
+        
+        review_ops = ReviewOperations(mock_db)
+        review_ops.create_review({'user_id': 'user123', 'product_id': 'product123', 'rating': 4})
+        
+        mock_db.product_ratings.update_one.assert_called_once_with(
+            {'_id': 'product123'},
+            {'$inc': {'count': 1, 'sum': 4, 'distribution.4': 1}},
+            upsert=True
+        )
+    
+    def test_review_operations_find_by_product(self):
+        """Test review listing is a single indexed query without $lookup"""
+        from database.mongodb import ReviewOperations
+        
+        mock_db = Mock()
+        review_ops = ReviewOperations(mock_db)
+        
+        review_id = ObjectId()
+        mock_db.reviews.find.return_value.sort.return_value.limit.return_value = [
+            {'_id': review_id, 'product_id': 'product123', 'rating': 5,
+             'user_name': 'Jane', 'created_at': datetime(2025, 1, 1)}
+        ]
+        
+        page = review_ops.find_reviews_by_product('product123', limit=10)
+        
+        assert mock_db.reviews.find.call_args[0][0] == {'product_id': 'product123'}
+        mock_db.reviews.find.return_value.sort.assert_called_once_with([('created_at', -1), ('_id', -1)])
+        mock_db.reviews.aggregate.assert_not_called()
+        assert page['reviews'][0]['id'] == str(review_id)
+        assert page['reviews'][0]['user_name'] == 'Jane'
+        assert page['next_cursor'] is None
+    
+    def test_review_operations_find_by_product_invalid_limit(self):
+        """Test a zero or oversized page limit is rejected rather than defaulted"""
+        from database.mongodb import ReviewOperations
+        
+        review_ops = ReviewOperations(Mock())
+        
+        for limit in (0, -1, 1000):
+            with pytest.raises(ValueError, match='Limit must be between'):
+                review_ops.find_reviews_by_product('product123', limit=limit)
+    
+    def test_backfill_review_authors(self):
+        """Test legacy reviews get the author's name from the users collection"""
+        from database import migrations
+        
+        user_id = ObjectId()
+        review_id = ObjectId()
+        with patch.object(migrations, 'db') as mock_db:
+            mock_db.reviews.collection.find.return_value = [{'_id': review_id, 'user_id': str(user_id)}]
+            mock_db.users.collection.find.return_value = [{'_id': user_id, 'name': 'Jane'}]
+            mock_db.reviews.collection.bulk_write.return_value.modified_count = 1
+            
+            assert migrations.backfill_review_authors() == 1
+            
+            operations = mock_db.reviews.collection.bulk_write.call_args[0][0]
+        
+        assert operations[0]._filter == {'_id': review_id}
+        assert operations[0]._doc == {'$set': {'user_name': 'Jane'}}
+    
     def test_review_operations_get_rating_stats(self):
         """Test getting rating statistics"""
         from database.mongodb import ReviewOperations
@@ -325,22 +1302,58 @@ class TestDatabaseOperations:
         
         review_ops = ReviewOperations(mock_db)
         
-        # Mock aggregation result
-        mock_collection.aggregate.return_value = [
-            {
-                '_id': None,
-                'average_rating': 4.5,
-                'total_reviews': 10,
-                'rating_distribution': [5, 5, 4, 4, 4, 3, 3, 2, 1, 1]
-            }
-        ]
+        # Mock precomputed summary document
+        mock_db.product_ratings.find_one.return_value = {
+            '_id': 'product123',
+            'count': 10,
+            'sum': 32,
+            'distribution': {'1': 2, '2': 1, '3': 2, '4': 3, '5': 2}
+        }
         
         result = review_ops.get_product_rating_stats('product123')
         
-        assert result['average_rating'] == 4.5
+        assert result['average_rating'] == 3.2
         assert result['total_reviews'] == 10
-        assert len(result['rating_distribution']) == 5
-        mock_collection.aggregate.assert_called_once()
+        assert result['rating_distribution'] == [2, 1, 2, 3, 2]
+        mock_db.product_ratings.find_one.assert_called_once_with({'_id': 'product123'})
+        mock_collection.aggregate.assert_not_called()
+    
+    def test_review_operations_get_rating_stats_no_reviews(self):
+        """Test rating statistics for a product without reviews"""
+        from database.mongodb import ReviewOperations
+        
+        mock_db = Mock()
+        mock_db.product_ratings.find_one.return_value = None
+        
+        result = ReviewOperations(mock_db).get_product_rating_stats('product123')
+        
+        assert result == {
+            'average_rating': 0.0,
+            'total_reviews': 0,
+            'rating_distribution': [0, 0, 0, 0, 0]
+        }
+    
+    def test_rebuild_rating_stats(self):
+        """Test the rating stats rebuild command"""
+        from database import migrations
+        
+        with patch.object(migrations, 'db') as mock_db:
+            mock_db.reviews.collection.aggregate.return_value = [
+                {'_id': {'product_id': 'p1', 'rating': 5}, 'count': 2, 'sum': 10},
+                {'_id': {'product_id': 'p1', 'rating': 3}, 'count': 1, 'sum': 3},
+                {'_id': {'product_id': 'p2', 'rating': 1}, 'count': 1, 'sum': 1}
+            ]
+            
+            rebuilt = migrations.rebuild_rating_stats()
+            
+            operations = mock_db.reviews.rating_stats.bulk_write.call_args[0][0]
+            pipeline = mock_db.reviews.collection.aggregate.call_args[0][0]
+        
+        assert pipeline[0] == {'$match': {'rating': {'$type': ['int', 'long', 'double']}}}
+        assert rebuilt == 2
+        summaries = {operation._filter['_id']: operation._doc for operation in operations}
+        assert summaries['p1'] == {'count': 3, 'sum': 13, 'distribution': {'5': 2, '3': 1}}
+        assert summaries['p2'] == {'count': 1, 'sum': 1, 'distribution': {'1': 1}}
     
     def test_database_stats(self):
         """Test getting database statistics"""
@@ -351,11 +1364,11 @@ class TestDatabaseOperations:
             mock_mongodb.return_value.db = mock_db_instance
             
             # Mock collection counts
-            mock_db_instance.users.count_documents.return_value = 5
-            mock_db_instance.products.count_documents.return_value = 10
-            mock_db_instance.orders.count_documents.return_value = 3
-            mock_db_instance.reviews.count_documents.return_value = 8
-            mock_db_instance.carts.count_documents.return_value = 2
+            mock_db_instance.users.estimated_document_count.return_value = 5
+            mock_db_instance.products.estimated_document_count.return_value = 10
+            mock_db_instance.orders.estimated_document_count.return_value = 3
+            mock_db_instance.reviews.estimated_document_count.return_value = 8
+            mock_db_instance.carts.estimated_document_count.return_value = 2
             mock_db_instance.name = 'test_db'
             mock_db_instance.list_collection_names.return_value = ['users', 'products', 'orders', 'reviews', 'carts']
             
@@ -368,4 +1381,26 @@ class TestDatabaseOperations:
             assert stats['reviews_count'] == 8
             assert stats['carts_count'] == 2
             assert stats['database_name'] == 'test_db'
-            assert len(stats['collections']) == 5
\ No newline at end of file
+            assert len(stats['collections']) == 5
+            
+            # Served from the cache until DB_STATS_CACHE_SECONDS pass
+            db.get_db_stats()
+            mock_db_instance.users.estimated_document_count.assert_called_once()
+            mock_db_instance.users.count_documents.assert_not_called()
+    
+    def test_database_ping_cached(self):
+        """Test readiness pings are cached and report failures"""
+        from database.mongodb import EdgecraftDB
+        
+        with patch('database.mongodb.MongoDB') as mock_mongodb:
+            mock_client = mock_mongodb.return_value.client
+            db = EdgecraftDB()
+            
+            assert db.ping() is True
+            assert db.ping() is True
+            mock_client.admin.command.assert_called_once_with('ping')
+            
+            db._ping_at = 0.0
+            db.ping_cache_seconds = 0
+            mock_client.admin.command.side_effect = Exception("timed out")
+            assert db.ping() is False
\ No newline at end of file
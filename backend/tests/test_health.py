@@ -97,4 +97,34 @@ class TestHealth:
         assert isinstance(response_data['orders_count'], int)
         assert isinstance(response_data['reviews_count'], int)
         assert isinstance(response_data['database_name'], str)
-        assert isinstance(response_data['collections'], list)
\ No newline at end of file
+        assert isinstance(response_data['collections'], list)
+    
+    def test_liveness_does_no_io(self, client, mock_db):
+        """Test the liveness probe never touches the database"""
+        response = client.get('/api/health/live')
+        
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 'alive'
+        assert mock_db.mock_calls == []
+    
+    def test_readiness_ready(self, client, mock_db):
+        """Test readiness when the database answers the ping"""
+        mock_db.ping.return_value = True
+        
+        response = client.get('/api/health/ready')
+        
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 'ready'
+        mock_db.get_db_stats.assert_not_called()
+    
+    def test_readiness_not_ready(self, client, mock_db):
+        """Test readiness fails when the ping fails or the connection cannot open"""
+        mock_db.ping.return_value = False
+        failed_ping = client.get('/api/health/ready')
+        
+        mock_db.ping.side_effect = Exception("Failed to connect to MongoDB")
+        failed_connect = client.get('/api/health/ready')
+        
+        assert failed_ping.status_code == 503
+        assert failed_connect.status_code == 503
+        assert failed_ping.get_json()['status'] == 'not ready'
@@ -122,16 +122,19 @@ class TestIntegration:
         assert response.status_code == 201
         
         # Step 2: Get reviews for product
-        mock_db.reviews.find_reviews_by_product.return_value = [
-            {
-                'id': '507f1f77bcf86cd799439015',
-                'product_id': product_id,
-                'rating': 5,
-                'comment': 'Excellent product quality!',
-                'user_name': 'Test User',
-                'created_at': '2025-01-01T00:00:00'
-            }
-        ]
+        mock_db.reviews.find_reviews_by_product.return_value = {
+            'reviews': [
+                {
+                    'id': '507f1f77bcf86cd799439015',
+                    'product_id': product_id,
+                    'rating': 5,
+                    'comment': 'Excellent product quality!',
+                    'user_name': 'Test User',
+                    'created_at': '2025-01-01T00:00:00'
+                }
+            ],
+            'next_cursor': None
+        }
         
         response = client.get(f'/api/reviews/{product_id}')
         assert response.status_code == 200
@@ -145,12 +148,20 @@ class TestIntegration:
         # Step 1: Process payment
         payment_data = {
             'payment_method': 'Credit Card',
-            'amount': 150.0
+            'amount': 150.0,
+            'card_details': {
+                'card_number': '4532015112830366',
+                'expiry_date': '08/26',
+                'cvv': '456',
+                'card_name': 'Test User'
+            }
         }
         
         response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
-        assert response.status_code == 200
+        assert response.status_code == 202
         
+        payment_id = response.get_json()['payment_id']
+        response = client.get(f'/api/payment/{payment_id}?wait=10', headers=auth_headers)
         payment_result = response.get_json()
         assert payment_result['status'] == 'success'
         
@@ -176,6 +187,9 @@ class TestIntegration:
             }
         }
         
+        mock_db.orders.create_order.return_value = dict(
+            mock_db.orders.create_order.return_value, total_amount=150.0
+        )
         response = client.post('/api/orders', json=order_data, headers=auth_headers)
         assert response.status_code == 201
         
@@ -0,0 +1,84 @@
+import pytest
+import io
+import json
+import logging
+from unittest.mock import patch
+
+from services.logs import JsonFormatter, NonBlockingQueueHandler, RequestIdFilter, log_event
+
+class TestStructuredLogging:
+    """Test cases for JSON queue logging"""
+    
+    def test_json_formatter_includes_fields(self):
+        """Test records are rendered as one JSON object with their fields"""
+        record = logging.makeLogRecord({
+            'name': 'edgecraft.api',
+            'levelno': logging.INFO,
+            'levelname': 'INFO',
+            'msg': 'order_created',
+            'fields': {'order_number': 'EG20250101000001', 'item_count': 2},
+            'request_id': 'abc123'
+        })
+        
+        entry = json.loads(JsonFormatter().format(record))
+        
+        assert entry['event'] == 'order_created'
+        assert entry['level'] == 'info'
+        assert entry['request_id'] == 'abc123'
+        assert entry['order_number'] == 'EG20250101000001'
+        assert entry['item_count'] == 2
+    
+    def test_queue_handler_writes_through_listener(self):
+        """Test records reach the stream via the background listener"""
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonFormatter())
+        handler = NonBlockingQueueHandler(target, maxsize=100)
+        handler.addFilter(RequestIdFilter())
+        logger = logging.getLogger('edgecraft.test_listener')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        try:
+            logger.info('cart_cleared', extra={'fields': {'user_id': 'u1'}})
+        finally:
+            handler.stop()
+            logger.removeHandler(handler)
+        
+        entry = json.loads(stream.getvalue().strip())
+        assert entry['event'] == 'cart_cleared'
+        assert entry['user_id'] == 'u1'
+        assert 'request_id' not in entry
+    
+    def test_queue_handler_drops_when_full(self):
+        """Test a full queue drops records instead of blocking"""
+        handler = NonBlockingQueueHandler(logging.NullHandler(), maxsize=1)
+        handler._ensure_listener()
+        handler._listener.stop()
+        record = logging.makeLogRecord({'msg': 'event'})
+        
+        handler.enqueue(record)
+        handler.enqueue(record)
+        
+        assert handler.dropped == 1
+    
+    def test_log_event_respects_level_and_sampling(self):
+        """Test disabled levels and sampled-out events are skipped"""
+        logger = logging.getLogger('edgecraft.test_sampling')
+        logger.setLevel(logging.INFO)
+        
+        with patch.object(logger, 'log') as mock_log:
+            log_event(logger, logging.DEBUG, 'order_payload', payload={})
+            with patch('services.logs.random.random', return_value=0.5):
+                log_event(logger, logging.INFO, 'request', sample_rate=0.1)
+                log_event(logger, logging.INFO, 'request', sample_rate=0.9, status=200)
+        
+        mock_log.assert_called_once_with(logging.INFO, 'request', extra={'fields': {'status': 200}})
+    
+    def test_request_id_header(self, client):
+        """Test responses echo the caller's request id or assign one"""
+        echoed = client.get('/api/health/unknown', headers={'X-Request-ID': 'req-42'})
+        assigned = client.get('/api/health/unknown')
+        
+        assert echoed.headers['X-Request-ID'] == 'req-42'
+        assert len(assigned.headers['X-Request-ID']) == 32
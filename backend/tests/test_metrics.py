@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import Mock, patch
+
+from services.metrics import (
+    Registry, MultiProcessStore, MongoCommandMetrics, merge, render, mongo_latency
+)
+
+class TestMetrics:
+    """Test cases for the metrics registry and /api/metrics"""
+    
+    def test_histogram_rendering(self):
+        """Test histograms render cumulative buckets, sum and count"""
+        registry = Registry()
+        latency = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+        latency.observe(0.05, route='/a')
+        latency.observe(0.5, route='/a')
+        latency.observe(3, route='/a')
+        
+        text = registry.render()
+        
+        assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+        assert 'latency_seconds_sum{route="/a"} 3.55' in text
+        assert 'latency_seconds_count{route="/a"} 3' in text
+    
+    def test_merge_and_hit_ratio(self):
+        """Test snapshots from several workers add up and derive the hit ratio"""
+        registry = Registry()
+        hits = registry.counter('hits_total', 'Hits', ('cache',))
+        misses = registry.counter('misses_total', 'Misses', ('cache',))
+        registry.add_ratio('hit_ratio', 'Ratio', 'hits_total', 'misses_total')
+        hits.inc(3, cache='users')
+        misses.inc(1, cache='users')
+        snapshot = registry.snapshot()
+        
+        text = registry.render([snapshot, snapshot])
+        
+        assert 'hits_total{cache="users"} 6' in text
+        assert 'misses_total{cache="users"} 2' in text
+        assert 'hit_ratio{cache="users"} 0.75' in text
+    
+    def test_dead_worker_counters_archived(self, tmp_path):
+        """Test counters of exited workers are kept while their gauges are dropped"""
+        worker = Registry()
+        worker.counter('requests_total', 'Requests').inc(5)
+        worker.gauge('in_flight', 'In flight').inc(2)
+        store = MultiProcessStore(worker, str(tmp_path))
+        store.flush()
+        pid = int(next(tmp_path.glob('*.json')).stem)
+        
+        store.mark_process_dead(pid)
+        survivor = MultiProcessStore(Registry(), str(tmp_path))
+        merged = merge(survivor.collect())
+        
+        assert merged['requests_total']['samples'][()] == 5
+        assert 'in_flight' not in merged
+        assert not (tmp_path / f"{pid}.json").exists()
+    
+    def test_mongo_listener_labels_operation(self):
+        """Test command timings carry the data layer method name"""
+        listener = MongoCommandMetrics(lambda: 'OrderOperations.create_order')
+        before = mongo_latency.samples().get(('OrderOperations.create_order', 'insert'), [0])[-1]
+        
+        listener.succeeded(Mock(duration_micros=1500, command_name='insert'))
+        
+        assert mongo_latency.samples()[('OrderOperations.create_order', 'insert')][-1] == before + 1
+    
+    def test_traced_operations_sets_current_operation(self):
+        """Test Operations methods publish their name while running"""
+        from database.mongodb import OrderOperations, current_operation
+        
+        seen = []
+        mock_db = Mock()
+        mock_db.orders.find_one.side_effect = lambda *args, **kwargs: seen.append(current_operation())
+        
+        OrderOperations(mock_db).find_order_by_id('507f1f77bcf86cd799439011')
+        
+        assert seen == ['OrderOperations.find_order_by_id']
+        assert current_operation() is None
+    
+    def test_metrics_endpoint(self, client, mock_db):
+        """Test /api/metrics reports per-route request metrics"""
+        client.get('/api/products')
+        
+        response = client.get('/api/metrics')
+        text = response.get_data(as_text=True)
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert 'edgecraft_http_requests_total{method="GET",route="/api/products",status="200"}' in text
+        assert 'edgecraft_http_request_duration_seconds_bucket{method="GET",route="/api/products"' in text
+        assert 'edgecraft_http_requests_in_flight{method="GET",route="/api/metrics"} 1' in text
+    
+    def test_metrics_endpoint_token(self, client):
+        """Test METRICS_TOKEN protects the endpoint"""
+        with patch.dict('os.environ', {'METRICS_TOKEN': 'secret'}):
+            denied = client.get('/api/metrics')
+            wrong = client.get('/api/metrics', headers={'Authorization': 'Bearer secreT'})
+            non_ascii = client.get('/api/metrics', headers={'Authorization': 'Bearer sécret'})
+            allowed = client.get('/api/metrics', headers={'Authorization': 'Bearer secret'})
+        
+        assert denied.status_code == 401
+        assert wrong.status_code == 401
+        assert non_ascii.status_code == 401
+        assert allowed.status_code == 200
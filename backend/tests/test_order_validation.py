@@ -0,0 +1,122 @@
+import pytest
+from unittest.mock import Mock
+
+from services.orders import OrderValidator, OrderValidationError
+from services.quotes import QuoteEngine, QuoteRules
+
+PRODUCT_ID = '507f1f77bcf86cd799439012'
+
+def make_validator(quotes=None, check_total=True):
+    return OrderValidator(quotes=quotes, tax_rate=0.18, shipping_fee=50, total_tolerance=0.01,
+                          quote_tolerance=0.01, max_items=1000, check_total=check_total)
+
+def contractor_items(count):
+    return [
+        {'id': f'{PRODUCT_ID}-{n}', 'name': 'Mirror Glass', 'price': 90.0, 'quantity': 2,
+         'customization': {'width': 36, 'height': 24, 'quantity': 1}}
+        for n in range(count)
+    ]
+
+class TestOrderValidation:
+    """Test cases for single-pass order validation"""
+
+    def test_validate_normalizes_items(self):
+        """Test items are copied with float prices and the subtotal is computed in bulk"""
+        items = [
+            {'id': 'a', 'name': 'A', 'price': 10, 'quantity': 3},
+            {'id': 'b', 'name': 'B', 'price': 2.5, 'quantity': 2}
+        ]
+
+        validated = make_validator().validate(items, 35.0)
+
+        assert validated.subtotal == 35.0
+        assert validated.items[0]['price'] == 10.0
+        assert isinstance(validated.items[0]['price'], float)
+        assert validated.items[0] is not items[0]
+        assert validated.total_amount == 35.0
+
+    def test_validate_reports_first_bad_item(self):
+        """Test bulk checks still name the first offending line"""
+        items = [{'id': str(n), 'name': 'A', 'price': 10.0, 'quantity': 1} for n in range(300)]
+        items[120]['price'] = 'ten'
+        items[200]['quantity'] = 0
+
+        with pytest.raises(OrderValidationError, match='Item 121 has invalid price'):
+            make_validator().validate(items, 3000.0)
+
+        items[120]['price'] = 10.0
+        with pytest.raises(OrderValidationError, match='Item 201 has invalid quantity'):
+            make_validator().validate(items, 3000.0)
+
+        del items[5]['name']
+        with pytest.raises(OrderValidationError, match='Item 6 missing fields: name'):
+            make_validator().validate(items, 3000.0)
+
+    @pytest.mark.parametrize('items,message', [
+        ([], 'Items must be a non-empty array'),
+        ('items', 'Items must be a non-empty array'),
+        ([{'id': 'a', 'name': 'A', 'price': True, 'quantity': 1}], 'Item 1 has invalid price'),
+        ([{'id': 'a', 'name': 'A', 'price': 1.0, 'quantity': 1.5}], 'Item 1 has invalid quantity'),
+    ])
+    def test_validate_invalid_items(self, items, message):
+        """Test malformed item lists are rejected"""
+        with pytest.raises(OrderValidationError, match=message):
+            make_validator().validate(items, 100.0)
+
+    def test_validate_total_consistency(self):
+        """Test the total must cover the items and at most add tax and shipping"""
+        items = [{'id': 'a', 'name': 'A', 'price': 90.0, 'quantity': 1}]
+        validator = make_validator()
+
+        assert validator.validate(items, 90.0).total_amount == 90.0
+        assert validator.validate(items, 90 * 1.18 + 50).total_amount == pytest.approx(156.2)
+
+        with pytest.raises(OrderValidationError, match='Total amount does not match') as exc:
+            validator.validate(items, 80.0)
+        assert exc.value.details == {'items_subtotal': 90.0}
+        with pytest.raises(OrderValidationError, match='Total amount does not match'):
+            validator.validate(items, 500.0)
+        with pytest.raises(OrderValidationError, match='Invalid total amount'):
+            validator.validate(items, '90')
+
+        unchecked = make_validator(check_total=False)
+        assert unchecked.validate(items, 80.0).total_amount == 80.0
+        with pytest.raises(OrderValidationError, match='Invalid total amount'):
+            unchecked.validate(items, 0)
+
+    def test_validate_reprices_large_orders_once(self):
+        """Test hundreds of cut-glass lines are quoted in one batch"""
+        catalog = Mock(return_value=[{'id': PRODUCT_ID, 'basePrice': 15}])
+        engine = QuoteEngine(catalog=catalog, version=Mock(return_value=1),
+                             rules=QuoteRules(price_step=0.01, area_step=0, min_area=0, tiers=[], options={}))
+        items = contractor_items(500)
+
+        validated = make_validator(engine).validate(items, 90000.0)
+
+        assert validated.subtotal == 90000.0
+        catalog.assert_called_once()
+
+        items[321]['price'] = 80.0
+        with pytest.raises(OrderValidationError, match='Item 322 price does not match') as exc:
+            make_validator(engine).validate(items, 89980.0)
+        assert exc.value.details == {'quoted_price': 90.0}
+
+    def test_create_order_skips_normalization_when_validated(self):
+        """Test validated orders are inserted without parsing their items again"""
+        from database.mongodb import OrderOperations
+
+        mock_db = Mock()
+        mock_db.orders.insert_one.return_value.inserted_id = 'id'
+        orders = OrderOperations(mock_db)
+        orders._generate_order_number = Mock(return_value='EG1')
+        orders._normalize_new_order = Mock()
+        order_data = {
+            'user_id': 'u1', 'total_amount': 100.0, 'payment_method': 'UPI',
+            'billing_info': {}, 'items': [{'id': 'a', 'price': 100.0, 'quantity': 1}]
+        }
+
+        orders.create_order(dict(order_data), normalized=True)
+        orders._normalize_new_order.assert_not_called()
+
+        orders.create_order(dict(order_data))
+        orders._normalize_new_order.assert_called_once()
@@ -1,5 +1,7 @@
 import pytest
 import json
+import hashlib
+from unittest.mock import patch
 
 class TestOrders:
     """Test cases for order endpoints"""
@@ -110,10 +112,11 @@ class TestOrders:
                 'order_number': 'EG20250101ABC123',
                 'total_amount': 100.0,
                 'status': 'confirmed',
-                'created_at': '2025-01-01T00:00:00'
+                'created_at': '2025-01-01T00:00:00',
+                'item_count': 1
             }
         ]
-        mock_db.orders.find_orders_by_user.return_value = mock_orders
+        mock_db.orders.find_orders_by_user.return_value = {'orders': mock_orders, 'next_cursor': None}
         
         response = client.get('/api/orders', headers=auth_headers)
         
@@ -122,6 +125,24 @@ class TestOrders:
         assert 'orders' in response_data
         assert len(response_data['orders']) == 1
         assert response_data['orders'][0]['order_number'] == 'EG20250101ABC123'
+        assert response_data['next_cursor'] is None
+    
+    def test_get_orders_paginated(self, client, mock_db, auth_headers):
+        """Test order history pagination parameters"""
+        response = client.get('/api/orders?limit=10&after=abc', headers=auth_headers)
+        
+        assert response.status_code == 200
+        mock_db.orders.find_orders_by_user.assert_called_once_with(
+            '507f1f77bcf86cd799439011', limit=10, after='abc'
+        )
+    
+    def test_get_orders_invalid_cursor(self, client, mock_db, auth_headers):
+        """Test invalid order history cursor returns 400"""
+        mock_db.orders.find_orders_by_user.side_effect = ValueError("Invalid cursor")
+        
+        response = client.get('/api/orders?after=bogus', headers=auth_headers)
+        
+        assert response.status_code == 400
     
     def test_get_orders_unauthorized(self, client, mock_db):
         """Test getting orders without authentication"""
@@ -187,4 +208,132 @@ class TestOrders:
         assert response.status_code == 500
         response_data = response.get_json()
         assert 'error' in response_data
-        assert 'Failed to get orders' in response_data['error']
\ No newline at end of file
+        assert 'Failed to get orders' in response_data['error']
+    
+    def _post_with_key(self, client, auth_headers, order, key='checkout-1'):
+        body = json.dumps(order)
+        headers = dict(auth_headers, **{'Idempotency-Key': key})
+        response = client.post('/api/orders', data=body, content_type='application/json', headers=headers)
+        return response, hashlib.sha256(body.encode('utf-8')).hexdigest()
+    
+    def test_create_order_idempotency_key_stores_response(self, client, mock_db, auth_headers, sample_order):
+        """Test the first request with a key stores its response"""
+        mock_db.idempotency.claim.return_value = None
+        
+        response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 201
+        user_id, key, status, body = mock_db.idempotency.complete.call_args[0]
+        assert key == 'checkout-1'
+        assert status == 201
+        assert json.loads(body)['order'] == response.get_json()['order']
+    
+    def test_create_order_idempotency_key_replays(self, client, mock_db, auth_headers, sample_order):
+        """Test a retry replays the stored response without creating another order"""
+        body = json.dumps({'message': 'Order created successfully', 'order': {'order_number': 'EG1'}})
+        fingerprint = hashlib.sha256(json.dumps(sample_order).encode('utf-8')).hexdigest()
+        mock_db.idempotency.claim.return_value = {
+            'fingerprint': fingerprint,
+            'state': 'completed',
+            'response': {'status': 201, 'body': body}
+        }
+        
+        response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 201
+        assert response.headers['Idempotent-Replayed'] == 'true'
+        assert response.get_json()['order']['order_number'] == 'EG1'
+        mock_db.orders.create_order.assert_not_called()
+        mock_db.carts.clear_cart.assert_not_called()
+    
+    def test_create_order_idempotency_key_reused_for_other_request(self, client, mock_db, auth_headers, sample_order):
+        """Test a key reused with a different body is rejected"""
+        mock_db.idempotency.claim.return_value = {'fingerprint': 'other', 'state': 'completed'}
+        
+        response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 422
+        mock_db.orders.create_order.assert_not_called()
+    
+    def test_create_order_idempotency_key_in_progress(self, client, mock_db, auth_headers, sample_order):
+        """Test a duplicate waits for the in-flight request, then gives up with 409"""
+        fingerprint = hashlib.sha256(json.dumps(sample_order).encode('utf-8')).hexdigest()
+        mock_db.idempotency.claim.return_value = {'fingerprint': fingerprint, 'state': 'in_progress'}
+        
+        with patch('app.IDEMPOTENCY_WAIT_SECONDS', 0):
+            response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 409
+        assert 'Retry-After' in response.headers
+        mock_db.orders.create_order.assert_not_called()
+    
+    def test_create_order_idempotency_key_waits_for_result(self, client, mock_db, auth_headers, sample_order):
+        """Test a duplicate replays the first response once it completes"""
+        fingerprint = hashlib.sha256(json.dumps(sample_order).encode('utf-8')).hexdigest()
+        mock_db.idempotency.claim.side_effect = [
+            {'fingerprint': fingerprint, 'state': 'in_progress'},
+            {'fingerprint': fingerprint, 'state': 'completed',
+             'response': {'status': 201, 'body': '{"order": {"order_number": "EG1"}}'}}
+        ]
+        
+        with patch('app.time.sleep') as mock_sleep:
+            response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 201
+        mock_sleep.assert_called_once()
+        mock_db.orders.create_order.assert_not_called()
+    
+    def test_create_order_idempotency_key_released_on_error(self, client, mock_db, auth_headers, sample_order):
+        """Test a failed order frees the key for a retry"""
+        mock_db.idempotency.claim.return_value = None
+        mock_db.orders.create_order.side_effect = Exception("Database connection failed")
+        
+        response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 500
+        mock_db.idempotency.release.assert_called_once()
+        mock_db.idempotency.complete.assert_not_called()
+    
+    def test_create_order_out_of_stock(self, client, mock_db, auth_headers, sample_order):
+        """Test orders for more units than are in stock are rejected with 409"""
+        from database.mongodb import InsufficientStock
+        mock_db.checkout.place_order.side_effect = InsufficientStock(['507f1f77bcf86cd799439012'])
+        
+        response = client.post('/api/orders', json=sample_order, headers=auth_headers)
+        
+        assert response.status_code == 409
+        assert response.get_json()['product_ids'] == ['507f1f77bcf86cd799439012']
+    
+    def test_create_order_out_of_stock_releases_idempotency_key(self, client, mock_db, auth_headers, sample_order):
+        """Test an out-of-stock 409 is not replayed once the cart has been fixed"""
+        from database.mongodb import InsufficientStock
+        mock_db.idempotency.claim.return_value = None
+        mock_db.checkout.place_order.side_effect = InsufficientStock(['507f1f77bcf86cd799439012'])
+        
+        response, _ = self._post_with_key(client, auth_headers, sample_order)
+        
+        assert response.status_code == 409
+        mock_db.idempotency.release.assert_called_once()
+        mock_db.idempotency.complete.assert_not_called()
+    
+    def test_create_order_price_mismatch(self, client, mock_db, auth_headers, sample_order):
+        """Test cut-glass items are re-priced on the server instead of trusting the client"""
+        sample_order['items'][0]['id'] = '507f1f77bcf86cd799439012-1735689600000'
+        sample_order['items'][0]['price'] = 1.0
+        
+        response = client.post('/api/orders', json=sample_order, headers=auth_headers)
+        
+        assert response.status_code == 400
+        assert response.get_json()['quoted_price'] == 90.0
+        mock_db.checkout.place_order.assert_not_called()
+    
+    def test_create_order_total_mismatch(self, client, mock_db, auth_headers, sample_order):
+        """Test orders whose total does not cover the items are rejected"""
+        sample_order['total_amount'] = 10.0
+        
+        response = client.post('/api/orders', json=sample_order, headers=auth_headers)
+        
+        assert response.status_code == 400
+        assert response.get_json()['items_subtotal'] == 100.0
+        mock_db.checkout.place_order.assert_not_called()
+
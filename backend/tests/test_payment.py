@@ -1,6 +1,9 @@
 import pytest
 import json
-from unittest.mock import patch
+import time
+from unittest.mock import patch, Mock
+
+from services.payments import PaymentEngine, PaymentGateway, SimulatedGateway
 
 class TestPayment:
     """Test cases for payment endpoints"""
@@ -20,9 +23,9 @@ class TestPayment:
         
         response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
         
-        assert response.status_code == 200
+        assert response.status_code == 202
         response_data = response.get_json()
-        assert response_data['status'] == 'success'
+        assert response_data['status'] == 'pending'
         assert 'payment_id' in response_data
         assert response_data['amount'] == payment_data['amount']
         assert response_data['payment_method'] == payment_data['payment_method']
@@ -38,9 +41,9 @@ class TestPayment:
         
         response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
         
-        assert response.status_code == 200
+        assert response.status_code == 202
         response_data = response.get_json()
-        assert response_data['status'] == 'success'
+        assert response_data['status'] == 'pending'
         assert response_data['payment_method'] == 'UPI'
         assert response_data['amount'] == 75.25
     
@@ -54,9 +57,9 @@ class TestPayment:
         
         response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
         
-        assert response.status_code == 200
+        assert response.status_code == 202
         response_data = response.get_json()
-        assert response_data['status'] == 'success'
+        assert response_data['status'] == 'pending'
         assert response_data['payment_method'] == 'Net Banking'
         assert response_data['amount'] == 200.00
     
@@ -72,7 +75,7 @@ class TestPayment:
         assert response.status_code == 400
         response_data = response.get_json()
         assert 'error' in response_data
-        assert 'Missing payment details' in response_data['error']
+        assert 'Payment method is required' in response_data['error']
     
     def test_process_payment_missing_amount(self, client, mock_db, auth_headers):
         """Test payment processing with missing amount"""
@@ -86,7 +89,7 @@ class TestPayment:
         assert response.status_code == 400
         response_data = response.get_json()
         assert 'error' in response_data
-        assert 'Missing payment details' in response_data['error']
+        assert 'Payment amount is required' in response_data['error']
     
     def test_process_payment_zero_amount(self, client, mock_db, auth_headers):
         """Test payment processing with zero amount"""
@@ -100,7 +103,7 @@ class TestPayment:
         assert response.status_code == 400
         response_data = response.get_json()
         assert 'error' in response_data
-        assert 'Missing payment details' in response_data['error']
+        assert 'Payment amount is required' in response_data['error']
     
     def test_process_payment_negative_amount(self, client, mock_db, auth_headers):
         """Test payment processing with negative amount"""
@@ -114,7 +117,7 @@ class TestPayment:
         assert response.status_code == 400
         response_data = response.get_json()
         assert 'error' in response_data
-        assert 'Missing payment details' in response_data['error']
+        assert 'Invalid payment amount' in response_data['error']
     
     def test_process_payment_unauthorized(self, client, mock_db):
         """Test payment processing without authentication"""
@@ -142,44 +145,77 @@ class TestPayment:
         
         response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
         
-        assert response.status_code == 200
+        assert response.status_code == 202
         response_data = response.get_json()
-        assert response_data['status'] == 'success'
+        assert response_data['status'] == 'pending'
         assert 'payment_id' in response_data
         assert response_data['payment_id'].startswith('pay_')
         assert len(response_data['payment_id']) == 16  # pay_ + 12 characters
     
-    def test_process_payment_simulation_delay(self, client, mock_db, auth_headers):
-        """Test that payment processing includes simulation delay"""
-        import time
-        
+    def test_process_payment_does_not_wait_for_gateway(self, client, mock_db, auth_headers):
+        """Test that payment submission returns before the gateway latency elapses"""
         payment_data = {
             'payment_method': 'UPI',
             'amount': 50.00,
             'upi_id': 'test@upi'
         }
         
-        start_time = time.time()
-        response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
-        end_time = time.time()
+        with patch('services.payments.time.sleep') as mock_sleep:
+            mock_sleep.side_effect = lambda seconds: None
+            start_time = time.time()
+            response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
+            end_time = time.time()
         
-        # Should take at least 2 seconds due to simulation delay
-        assert (end_time - start_time) >= 2.0
-        assert response.status_code == 200
+        assert (end_time - start_time) < 2.0
+        assert response.status_code == 202
+        assert response.headers['Location'].startswith('/api/payment/pay_')
+    
+    def test_get_payment_status(self, client, mock_db, auth_headers):
+        """Test polling a submitted payment until it completes"""
+        payment_data = {
+            'payment_method': 'Net Banking',
+            'amount': 120.00,
+            'bank': 'HDFC Bank'
+        }
+        
+        with patch('services.payments.time.sleep'):
+            response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
+            payment_id = response.get_json()['payment_id']
+            status = client.get(f'/api/payment/{payment_id}?wait=5', headers=auth_headers)
+        
+        assert status.status_code == 200
+        status_data = status.get_json()
+        assert status_data['payment_id'] == payment_id
+        assert status_data['status'] == 'success'
+        assert 'user_id' not in status_data
+    
+    def test_get_payment_not_found(self, client, mock_db, auth_headers):
+        """Test polling an unknown payment"""
+        mock_db.payments.find_payment_by_id.return_value = None
+        
+        response = client.get('/api/payment/pay_unknown', headers=auth_headers)
+        
+        assert response.status_code == 404
     
     def test_process_payment_generates_unique_id(self, client, mock_db, auth_headers):
         """Test that each payment generates a unique payment ID"""
         payment_data = {
             'payment_method': 'Credit Card',
-            'amount': 100.00
+            'amount': 100.00,
+            'card_details': {
+                'card_number': '4532015112830366',
+                'expiry_date': '08/26',
+                'cvv': '456',
+                'card_name': 'Jane Smith'
+            }
         }
         
         # Make two payment requests
         response1 = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
         response2 = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
         
-        assert response1.status_code == 200
-        assert response2.status_code == 200
+        assert response1.status_code == 202
+        assert response2.status_code == 202
         
         data1 = response1.get_json()
         data2 = response2.get_json()
@@ -190,16 +226,75 @@ class TestPayment:
         assert data2['payment_id'].startswith('pay_')
     
     def test_process_payment_error_handling(self, client, mock_db, auth_headers):
-        """Test payment processing error handling"""
-        with patch('time.sleep', side_effect=Exception("Payment gateway error")):
+        """Test a gateway error is reported through the payment status"""
+        with patch('services.payments.time.sleep', side_effect=Exception("Payment gateway error")):
             payment_data = {
-                'payment_method': 'Credit Card',
-                'amount': 100.00
+                'payment_method': 'UPI',
+                'amount': 100.00,
+                'upi_id': 'user@paytm'
             }
             
             response = client.post('/api/payment/process', json=payment_data, headers=auth_headers)
+            payment_id = response.get_json()['payment_id']
+            status = client.get(f'/api/payment/{payment_id}?wait=5', headers=auth_headers)
             
-            assert response.status_code == 500
-            response_data = response.get_json()
-            assert 'error' in response_data
-            assert 'Payment processing failed' in response_data['error']
\ No newline at end of file
+            assert status.status_code == 200
+            assert status.get_json()['status'] == 'failed'
+
+class TestPaymentEngine:
+    """Test cases for the background payment engine"""
+    
+    def test_submit_returns_pending_record(self):
+        """Test submission is queued rather than charged inline"""
+        engine = PaymentEngine(SimulatedGateway(latency=0.2), max_workers=1)
+        
+        payment = engine.submit('user123', 'UPI', 50.0, {'upi_id': 'test@upi'})
+        
+        assert payment['status'] == 'pending'
+        assert payment['payment_id'].startswith('pay_')
+        assert len(payment['payment_id']) == 16
+        engine.shutdown()
+    
+    def test_get_long_polls_until_complete(self):
+        """Test get waits for a pending payment to finish"""
+        engine = PaymentEngine(SimulatedGateway(latency=0.05), max_workers=1)
+        
+        payment = engine.submit('user123', 'UPI', 50.0)
+        result = engine.get(payment['payment_id'], user_id='user123', wait=5)
+        
+        assert result['status'] == 'success'
+        assert result['completed_at'] is not None
+        engine.shutdown()
+    
+    def test_get_hides_other_users_payments(self):
+        """Test payments are only visible to the submitting user"""
+        engine = PaymentEngine(SimulatedGateway(latency=0), max_workers=1)
+        
+        payment = engine.submit('user123', 'UPI', 50.0)
+        
+        assert engine.get(payment['payment_id'], user_id='someone-else') is None
+        engine.shutdown()
+    
+    def test_records_persisted_without_details(self):
+        """Test records are mirrored to the store without sensitive details"""
+        store = Mock()
+        engine = PaymentEngine(SimulatedGateway(latency=0), store=lambda: store, max_workers=1)
+        
+        payment = engine.submit('user123', 'Credit Card', 10.0, {'card_details': {'cvv': '123'}})
+        engine.shutdown()
+        
+        created = store.create_payment.call_args[0][0]
+        assert 'card_details' not in created
+        assert store.update_payment.call_args[0][0] == payment['payment_id']
+        assert store.update_payment.call_args[0][1]['status'] == 'success'
+    
+    def test_unknown_payment_falls_back_to_store(self):
+        """Test payments handled by another worker are read from the store"""
+        store = Mock()
+        store.find_payment_by_id.return_value = {
+            'payment_id': 'pay_abc', 'user_id': 'user123', 'status': 'success'
+        }
+        engine = PaymentEngine(PaymentGateway(), store=lambda: store, max_workers=1)
+        
+        assert engine.get('pay_abc', user_id='user123')['status'] == 'success'
+        engine.shutdown()
@@ -32,6 +32,32 @@ class TestProducts:
         assert 'products' in response_data
         mock_db.products.find_products_by_category.assert_called_once_with('Mirrors')
     
+    def test_get_products_paginated(self, client, mock_db):
+        """Test cursor pagination and field projection query parameters"""
+        mock_db.products.find_products_page.return_value = {
+            'products': [{'id': '507f1f77bcf86cd799439012', 'name': 'Mirror Glass'}],
+            'next_cursor': 'abc'
+        }
+        
+        response = client.get('/api/products?category=Mirrors&limit=1&after=xyz&fields=name,basePrice')
+        
+        assert response.status_code == 200
+        response_data = response.get_json()
+        assert response_data['next_cursor'] == 'abc'
+        mock_db.products.find_products_page.assert_called_once_with(
+            category='Mirrors', limit=1, after='xyz', fields=['name', 'basePrice']
+        )
+    
+    def test_get_products_invalid_pagination(self, client, mock_db):
+        """Test invalid pagination parameters return 400"""
+        response = client.get('/api/products?limit=abc')
+        assert response.status_code == 400
+        
+        mock_db.products.find_products_page.side_effect = ValueError("Invalid cursor")
+        response = client.get('/api/products?after=bogus')
+        assert response.status_code == 400
+        assert 'Invalid cursor' in response.get_json()['error']
+    
     def test_get_product_by_id_success(self, client, mock_db):
         """Test getting a specific product by ID"""
         product_id = '507f1f77bcf86cd799439012'
@@ -62,6 +88,81 @@ class TestProducts:
         assert 'error' in response_data
         assert 'Product not found' in response_data['error']
     
+    def test_get_products_etag_not_modified(self, client, mock_db):
+        """Test conditional GET returns 304 without re-reading the catalog"""
+        response = client.get('/api/products')
+        
+        assert response.status_code == 200
+        assert response.headers.get('ETag')
+        assert response.headers.get('Last-Modified')
+        
+        conditional = client.get('/api/products', headers={'If-None-Match': response.headers['ETag']})
+        
+        assert conditional.status_code == 304
+        assert conditional.data == b''
+        mock_db.products.find_all_products.assert_called_once()
+    
+    def test_get_products_if_modified_since(self, client, mock_db):
+        """Test If-Modified-Since against the catalog Last-Modified header"""
+        response = client.get('/api/products')
+        
+        conditional = client.get(
+            '/api/products',
+            headers={'If-Modified-Since': response.headers['Last-Modified']}
+        )
+        
+        assert conditional.status_code == 304
+    
+    def test_get_products_last_modified_follows_catalog_version(self, client, mock_db):
+        """Test Last-Modified is when the catalog version was built, not a product timestamp"""
+        from datetime import datetime
+        mock_db.products.catalog_version.return_value = (3, datetime(2026, 1, 2, 3, 4, 5, 600))
+        
+        response = client.get('/api/products')
+        
+        assert response.headers['Last-Modified'] == 'Fri, 02 Jan 2026 03:04:05 GMT'
+        
+        # A delete bumps the version; the old date must no longer match
+        mock_db.products.catalog_version.return_value = (4, datetime(2026, 1, 3))
+        conditional = client.get(
+            '/api/products',
+            headers={'If-Modified-Since': response.headers['Last-Modified']}
+        )
+        
+        assert conditional.status_code == 200
+    
+    def test_get_products_gzip(self, client, mock_db):
+        """Test large catalog payloads are served pre-gzipped when accepted"""
+        import gzip
+        mock_db.products.find_all_products.return_value = [
+            {'id': str(i), 'name': f'Glass {i}', 'description': 'x' * 100}
+            for i in range(50)
+        ]
+        
+        response = client.get('/api/products', headers={'Accept-Encoding': 'gzip'})
+        
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(json.loads(gzip.decompress(response.data))['products']) == 50
+    
+    def test_get_product_etag_not_modified(self, client, mock_db):
+        """Test conditional GET on a single product"""
+        product_id = '507f1f77bcf86cd799439012'
+        mock_db.products.find_product_by_id.return_value = {
+            'id': product_id,
+            'name': 'Mirror Glass'
+        }
+        
+        response = client.get(f'/api/products/{product_id}')
+        conditional = client.get(
+            f'/api/products/{product_id}',
+            headers={'If-None-Match': response.headers['ETag']}
+        )
+        
+        assert conditional.status_code == 304
+        mock_db.products.find_product_by_id.assert_called_once_with(product_id)
+    
     def test_create_product_success(self, client, mock_db, auth_headers, sample_product):
         """Test creating a new product"""
         response = client.post('/api/products', json=sample_product, headers=auth_headers)
@@ -113,4 +214,24 @@ class TestProducts:
         assert response.status_code == 500
         response_data = response.get_json()
         assert 'error' in response_data
-        assert 'Failed to create product' in response_data['error']
\ No newline at end of file
+        assert 'Failed to create product' in response_data['error']
+    
+    def test_get_product_stock(self, client, mock_db):
+        """Test reading the current stock of a product"""
+        mock_db.products.stock_level.return_value = {
+            'product_id': '507f1f77bcf86cd799439011', 'stock_quantity': 12, 'in_stock': True
+        }
+        
+        response = client.get('/api/products/507f1f77bcf86cd799439011/stock')
+        
+        assert response.status_code == 200
+        assert response.get_json()['stock_quantity'] == 12
+    
+    def test_get_product_stock_not_found(self, client, mock_db):
+        """Test reading the stock of an unknown product"""
+        mock_db.products.stock_level.return_value = None
+        
+        response = client.get('/api/products/unknown/stock')
+        
+        assert response.status_code == 404
+
@@ -0,0 +1,149 @@
+import pytest
+from unittest.mock import Mock
+
+import numpy as np
+
+from services.quotes import QuoteEngine, QuoteRules, parse_tiers
+
+PRODUCT_ID = '507f1f77bcf86cd799439012'
+
+def make_engine(**rules):
+    catalog = Mock(return_value=[
+        {'id': PRODUCT_ID, 'name': 'Mirror Glass', 'basePrice': 15},
+        {'id': '507f1f77bcf86cd799439013', 'name': 'Window Glass', 'basePrice': '12'}
+    ])
+    defaults = {'price_step': 0.01, 'area_step': 0, 'min_area': 0, 'tiers': [], 'options': {}}
+    defaults.update(rules)
+    engine = QuoteEngine(catalog=catalog, version=Mock(return_value=1), rules=QuoteRules(**defaults))
+    return engine, catalog
+
+class TestQuotes:
+    """Test cases for the quote engine and /api/quotes"""
+
+    def test_quote_matches_customizer_price(self):
+        """Test a plain quote is area x basePrice x pieces, like the customizer shows"""
+        engine, _ = make_engine()
+
+        quote = engine.quote([{'product_id': PRODUCT_ID, 'width': 36, 'height': 24, 'quantity': 2}])[0]
+
+        assert quote['area_sq_ft'] == 6.0
+        assert quote['unit_price'] == 90.0
+        assert quote['line_total'] == 180.0
+
+    def test_quote_rules(self):
+        """Test area steps, minimum area, options, volume tiers and rounding"""
+        engine, _ = make_engine(
+            price_step=1, area_step=0.25, min_area=1,
+            tiers=parse_tiers('10:0.05,50:0.1'),
+            options={'tempered': {'multiplier': 1.5}, 'frosted': {'per_sq_ft': 4}}
+        )
+
+        small, large = engine.quote([
+            {'product_id': PRODUCT_ID, 'width': 6, 'height': 6, 'quantity': 1},
+            {'product_id': PRODUCT_ID, 'width': 13, 'height': 12, 'quantity': 10,
+             'options': ['tempered', 'frosted']}
+        ])
+
+        assert small['area_sq_ft'] == 1.0
+        assert small['line_total'] == 15.0
+        # 13 x 12 in is 1.083 sq ft, billed as 1.25 at 15 x 1.5 + 4 per sq ft
+        assert large['area_sq_ft'] == 1.25
+        assert large['unit_price'] == 33.0
+        assert large['discount'] == 0.05
+        assert large['line_total'] == 315.0
+
+    def test_quote_line_errors(self):
+        """Test invalid lines get an error while the rest are still priced"""
+        engine, _ = make_engine()
+
+        quotes = engine.quote([
+            {'product_id': 'unknown', 'width': 10, 'height': 10},
+            {'product_id': PRODUCT_ID, 'width': -1, 'height': 10},
+            {'product_id': PRODUCT_ID, 'width': 10, 'height': 10, 'quantity': 0},
+            {'product_id': PRODUCT_ID, 'width': 10, 'height': 10, 'options': ['gold']},
+            {'product_id': PRODUCT_ID, 'width': '12', 'height': 12}
+        ])
+
+        assert [quote.get('error') for quote in quotes[:4]] == [
+            'Unknown product',
+            'Width and height must be positive numbers',
+            'Quantity must be a positive integer',
+            "Unknown option 'gold'"
+        ]
+        assert quotes[4]['line_total'] == 15.0
+
+    def test_quote_rejects_malformed_and_oversized_lines(self):
+        """Test bad option lists and out-of-range sizes become line errors, not 500s or Infinity"""
+        engine, _ = make_engine()
+
+        quotes = engine.quote([
+            {'product_id': PRODUCT_ID, 'width': 10, 'height': 10, 'options': 5},
+            {'product_id': PRODUCT_ID, 'width': 10, 'height': 10, 'options': 'tempered'},
+            {'product_id': PRODUCT_ID, 'width': 10, 'height': 10, 'quantity': 10**20},
+            {'product_id': PRODUCT_ID, 'width': 1e308, 'height': 1e308},
+            {'product_id': PRODUCT_ID, 'width': 12, 'height': 12}
+        ])
+
+        assert [quote.get('error') for quote in quotes[:4]] == [
+            'Options must be an array of option names',
+            'Options must be an array of option names',
+            'Quantity must be at most 100000',
+            'Width and height must be at most 1000 inches'
+        ]
+        assert quotes[4]['line_total'] == 15.0
+        assert engine.item_line({'id': PRODUCT_ID, 'customization': {'width': 1e308, 'height': 12}}) is None
+        assert engine.item_line({'id': PRODUCT_ID, 'customization': {'width': 12, 'height': 12,
+                                                                     'quantity': 10**20}}) is None
+
+    def test_price_table_memoized_by_catalog_version(self):
+        """Test the price table is rebuilt only when the catalog version changes"""
+        engine, catalog = make_engine()
+
+        engine.quote([{'product_id': PRODUCT_ID, 'width': 12, 'height': 12}])
+        engine.quote([{'product_id': PRODUCT_ID, 'width': 12, 'height': 12}])
+        assert catalog.call_count == 1
+
+        engine.version.return_value = 2
+        engine.quote([{'product_id': PRODUCT_ID, 'width': 12, 'height': 12}])
+        assert catalog.call_count == 2
+
+    def test_reprice_items(self):
+        """Test order items are re-priced from their customization, gift items are skipped"""
+        engine, _ = make_engine()
+
+        prices = engine.reprice_items([
+            {'id': f'{PRODUCT_ID}-1735689600000', 'price': 270.0, 'quantity': 1,
+             'customization': {'width': 36, 'height': 24, 'quantity': 3}},
+            {'id': 'gift-1-1735689600000', 'price': 499.0, 'quantity': 1,
+             'customization': {'type': 'gift'}},
+            {'id': 'item1', 'price': 10.0, 'quantity': 1}
+        ])
+
+        assert prices[0] == 270.0
+        assert np.isnan(prices[1:]).all()
+
+    def test_parse_tiers_invalid(self):
+        """Test malformed volume tiers are rejected"""
+        with pytest.raises(ValueError):
+            parse_tiers('10')
+        with pytest.raises(ValueError):
+            parse_tiers('10:1.5')
+
+    def test_quotes_endpoint(self, client, mock_db):
+        """Test batch quoting through the API"""
+        response = client.post('/api/quotes', json={'lines': [
+            {'product_id': '507f1f77bcf86cd799439012', 'width': 36, 'height': 24, 'quantity': 1},
+            {'product_id': 'unknown', 'width': 36, 'height': 24}
+        ]})
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['quotes'][0]['line_total'] == 90.0
+        assert data['quotes'][1]['error'] == 'Unknown product'
+        assert data['total'] == 90.0
+
+    def test_quotes_endpoint_invalid(self, client, mock_db):
+        """Test quoting without lines"""
+        response = client.post('/api/quotes', json={'lines': []})
+
+        assert response.status_code == 400
@@ -84,7 +84,7 @@ class TestReviews:
             'rating_distribution': [0, 1, 2, 3, 4]
         }
         
-        mock_db.reviews.find_reviews_by_product.return_value = mock_reviews
+        mock_db.reviews.find_reviews_by_product.return_value = {'reviews': mock_reviews, 'next_cursor': None}
         mock_db.reviews.get_product_rating_stats.return_value = mock_stats
         
         response = client.get(f'/api/reviews/{product_id}')
@@ -99,7 +99,7 @@ class TestReviews:
     def test_get_reviews_empty_product(self, client, mock_db):
         """Test getting reviews for a product with no reviews"""
         product_id = '507f1f77bcf86cd799439999'
-        mock_db.reviews.find_reviews_by_product.return_value = []
+        mock_db.reviews.find_reviews_by_product.return_value = {'reviews': [], 'next_cursor': None}
         mock_db.reviews.get_product_rating_stats.return_value = {
             'average_rating': 0.0,
             'total_reviews': 0,
@@ -115,6 +115,25 @@ class TestReviews:
         assert len(response_data['reviews']) == 0
         assert response_data['stats']['total_reviews'] == 0
     
+    def test_get_reviews_paginated(self, client, mock_db):
+        """Test review listing pagination parameters"""
+        product_id = '507f1f77bcf86cd799439012'
+        mock_db.reviews.find_reviews_by_product.return_value = {'reviews': [], 'next_cursor': 'abc'}
+        
+        response = client.get(f'/api/reviews/{product_id}?limit=5&after=xyz')
+        
+        assert response.status_code == 200
+        assert response.get_json()['next_cursor'] == 'abc'
+        mock_db.reviews.find_reviews_by_product.assert_called_once_with(product_id, limit=5, after='xyz')
+    
+    def test_create_review_stores_author_name(self, client, mock_db, auth_headers, sample_review):
+        """Test the author's name is denormalized onto the review"""
+        response = client.post('/api/reviews', json=sample_review, headers=auth_headers)
+        
+        assert response.status_code == 201
+        review_data = mock_db.reviews.create_review.call_args[0][0]
+        assert review_data['user_name'] == 'Test User'
+    
     def test_create_review_database_error(self, client, mock_db, auth_headers, sample_review):
         """Test handling database errors when creating reviews"""
         mock_db.reviews.create_review.side_effect = Exception("Database error")
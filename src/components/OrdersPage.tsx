@@ -36,9 +36,21 @@ interface Order {
   created_at: string;
 }
 
+interface OrderSummary {
+  id: string;
+  order_number: string;
+  total_amount: number | string | null;
+  status: string;
+  payment_method: string;
+  item_count: number;
+  created_at: string;
+}
+
 export const OrdersPage: React.FC = () => {
-  const [orders, setOrders] = useState<Order[]>([]);
+  const [orders, setOrders] = useState<OrderSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [selectedOrder, setSelectedOrder] = useState<Order | null>(null);
   const { user } = useAuth();
@@ -68,6 +80,7 @@ export const OrdersPage: React.FC = () => {
       setError(null);
       const response = await apiService.getOrders();
       setOrders(response.orders || []);
+      setNextCursor(response.next_cursor || null);
     } catch (err: any) {
       console.error('Failed to fetch orders:', err);
       setError('Failed to load orders. Please try again.');
@@ -76,6 +89,31 @@ export const OrdersPage: React.FC = () => {
     }
   };
 
+  const fetchMoreOrders = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await apiService.getOrders(nextCursor);
+      setOrders((current) => [...current, ...(response.orders || [])]);
+      setNextCursor(response.next_cursor || null);
+    } catch (err: any) {
+      console.error('Failed to fetch more orders:', err);
+      setError('Failed to load orders. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const viewOrder = async (orderId: string) => {
+    try {
+      const response = await apiService.getOrder(orderId);
+      setSelectedOrder(response.order);
+    } catch (err: any) {
+      console.error('Failed to fetch order:', err);
+      setError('Failed to load order details. Please try again.');
+    }
+  };
+
   const getStatusIcon = (status: string) => {
     switch (status.toLowerCase()) {
       case 'confirmed':
@@ -283,7 +321,7 @@ export const OrdersPage: React.FC = () => {
                         ₹{formatCurrency(order.total_amount)}
                       </div>
                       <div className="text-sm text-gray-600">
-                        {order.items.length} item{order.items.length !== 1 ? 's' : ''}
+                        {order.item_count} item{order.item_count !== 1 ? 's' : ''}
                       </div>
                     </div>
                     
@@ -296,33 +334,9 @@ export const OrdersPage: React.FC = () => {
                   </div>
                 </div>
 
-                {/* Order Items Preview */}
-                <div className="mb-4">
-                  <div className="space-y-2">
-                    {order.items.slice(0, 2).map((item, index) => (
-                      <div key={index} className="flex items-center justify-between text-sm">
-                        <div className="flex-1">
-                          <span className="font-medium text-gray-800">{item.name}</span>
-                          {item.customization && item.customization.height && item.customization.width && (
-                            <span className="text-gray-600 ml-2">
-                              ({item.customization.height}" × {item.customization.width}")
-                            </span>
-                          )}
-                        </div>
-                        <span className="text-gray-600">Qty: {item.quantity}</span>
-                      </div>
-                    ))}
-                    {order.items.length > 2 && (
-                      <div className="text-sm text-gray-500">
-                        +{order.items.length - 2} more item{order.items.length - 2 !== 1 ? 's' : ''}
-                      </div>
-                    )}
-                  </div>
-                </div>
-
                 <div className="flex justify-end">
                   <button
-                    onClick={() => setSelectedOrder(order)}
+                    onClick={() => viewOrder(order.id)}
                     className="flex items-center space-x-2 px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition-colors"
                   >
                     <Eye className="h-4 w-4" />
@@ -332,6 +346,17 @@ export const OrdersPage: React.FC = () => {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <div className="text-center">
+              <button
+                onClick={fetchMoreOrders}
+                disabled={loadingMore}
+                className="px-6 py-2 border border-blue-600 text-blue-600 rounded-lg hover:bg-blue-50 transition-colors disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more orders'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import { ArrowLeft, CreditCard, Smartphone, Building, Shield, Lock, CheckCircle } from 'lucide-react';
 import { useCart } from '../contexts/CartContext';
 import { apiService } from '../services/api';
@@ -12,6 +12,8 @@ export const PaymentScreen: React.FC<PaymentScreenProps> = ({ onBack, onPaymentC
   const { cartItems, getCartTotal } = useCart();
   const [paymentMethod, setPaymentMethod] = useState<'card' | 'upi' | 'netbanking'>('card');
   const [isProcessing, setIsProcessing] = useState(false);
+  // One key per checkout so a retried submission cannot place the order twice
+  const idempotencyKey = useRef(crypto.randomUUID());
   const [formData, setFormData] = useState({
     // Card details
     cardNumber: '',
@@ -106,13 +108,19 @@ export const PaymentScreen: React.FC<PaymentScreenProps> = ({ onBack, onPaymentC
       }
 
       console.log('✅ Order data validation passed');
-      await apiService.createOrder(orderData);
+      await apiService.createOrder(orderData, idempotencyKey.current);
       console.log('✅ Order created successfully');
       setIsProcessing(false);
       onPaymentComplete();
     } catch (error) {
       console.error('Payment failed:', error);
       setIsProcessing(false);
+      // The order was rejected, not lost; let the corrected
+      // submission use a fresh key
+      if (error instanceof Error && (/status: (400|422)\b/.test(error.message) ||
+          (/status: 409\b/.test(error.message) && error.message.includes('out of stock')))) {
+        idempotencyKey.current = crypto.randomUUID();
+      }
       
       // Show user-friendly error message
       let errorMessage = 'Payment failed. Please try again.';
@@ -121,6 +129,8 @@ export const PaymentScreen: React.FC<PaymentScreenProps> = ({ onBack, onPaymentC
           errorMessage = 'Your cart is empty. Please add items before checkout.';
         } else if (error.message.includes('billing information')) {
           errorMessage = 'Please fill in all required billing information.';
+        } else if (error.message.includes('out of stock')) {
+          errorMessage = 'Some items in your cart are out of stock. Please update your cart and try again.';
         } else if (error.message.includes('server')) {
           errorMessage = 'Server error. Please try again later.';
         }
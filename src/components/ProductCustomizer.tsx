@@ -3,6 +3,7 @@ import { X, Calculator, ShoppingCart } from 'lucide-react';
 import { Product } from './ProductCatalog';
 import { useCart } from '../contexts/CartContext';
 import { resolveProductImage } from '../utils/productImages';
+import { useQuote } from '../utils/quotes';
 
 interface ProductCustomizerProps {
   product: Product;
@@ -17,9 +18,15 @@ export const ProductCustomizer: React.FC<ProductCustomizerProps> = ({ product, o
   const { src, placeholder } = resolveProductImage(product);
 
   const area = (height * width) / 144; // Convert to square feet
-  const totalPrice = area * product.basePrice * quantity;
+  const { total: totalPrice, pending: quotePending } = useQuote(
+    product.id, width, height, quantity, area * product.basePrice * quantity
+  );
 
   const handleAddToCart = () => {
+    // The cart must hold the price the server will charge
+    if (quotePending) {
+      return;
+    }
     addToCart({
       id: `${product.id}-${Date.now()}`,
       name: product.name,
@@ -171,10 +178,11 @@ export const ProductCustomizer: React.FC<ProductCustomizerProps> = ({ product, o
             </button>
             <button
               onClick={handleAddToCart}
-              className="flex-1 px-6 py-3 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition-colors flex items-center justify-center space-x-2"
+              disabled={quotePending}
+              className="flex-1 px-6 py-3 bg-blue-600 text-white rounded-lg hover:bg-blue-700 disabled:bg-gray-400 transition-colors flex items-center justify-center space-x-2"
             >
               <ShoppingCart className="h-5 w-5" />
-              <span>Add to Cart</span>
+              <span>{quotePending ? 'Updating price...' : 'Add to Cart'}</span>
             </button>
           </div>
         </div>
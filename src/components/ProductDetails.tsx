@@ -3,6 +3,7 @@ import { ArrowLeft, Calculator, ShoppingCart, Star, Shield, Truck, Award } from
 import { Product } from './ProductCatalog';
 import { useCart } from '../contexts/CartContext';
 import { resolveProductImage } from '../utils/productImages';
+import { useQuote } from '../utils/quotes';
 
 interface ProductDetailsProps {
   product: Product;
@@ -17,9 +18,15 @@ export const ProductDetails: React.FC<ProductDetailsProps> = ({ product, onBack
   const { src, placeholder } = resolveProductImage(product);
 
   const area = (height * width) / 144; // Convert to square feet
-  const totalPrice = area * product.basePrice * quantity;
+  const { total: totalPrice, pending: quotePending } = useQuote(
+    product.id, width, height, quantity, area * product.basePrice * quantity
+  );
 
   const handleAddToCart = () => {
+    // The cart must hold the price the server will charge
+    if (quotePending) {
+      return;
+    }
     addToCart({
       id: `${product.id}-${Date.now()}`,
       name: product.name,
@@ -196,10 +203,11 @@ export const ProductDetails: React.FC<ProductDetailsProps> = ({ product, onBack
             {/* Add to Cart Button */}
             <button
               onClick={handleAddToCart}
-              className="w-full bg-blue-600 hover:bg-blue-700 text-white py-4 rounded-lg font-semibold text-lg transition-colors duration-200 flex items-center justify-center space-x-3"
+              disabled={quotePending}
+              className="w-full bg-blue-600 hover:bg-blue-700 disabled:bg-gray-400 text-white py-4 rounded-lg font-semibold text-lg transition-colors duration-200 flex items-center justify-center space-x-3"
             >
               <ShoppingCart className="h-6 w-6" />
-              <span>Add to Cart</span>
+              <span>{quotePending ? 'Updating price...' : 'Add to Cart'}</span>
             </button>
           </div>
 
@@ -101,25 +101,33 @@ class ApiService {
     total_amount: number;
     payment_method: string;
     billing_info: any;
-  }) {
+  }, idempotencyKey?: string) {
+    // Retries that reuse the same key get the original order back instead of a duplicate
     const response = await makeRequest(`${API_BASE_URL}/orders`, {
       method: 'POST',
-      headers: this.getAuthHeaders(),
+      headers: {
+        ...this.getAuthHeaders(),
+        ...(idempotencyKey && { 'Idempotency-Key': idempotencyKey })
+      },
       body: JSON.stringify(orderData)
     });
     
     return response.json();
   }
 
-  async getOrders() {
-    const response = await makeRequest(`${API_BASE_URL}/orders`, {
+  async getOrders(after?: string) {
+    const url = after
+      ? `${API_BASE_URL}/orders?after=${encodeURIComponent(after)}`
+      : `${API_BASE_URL}/orders`;
+
+    const response = await makeRequest(url, {
       headers: this.getAuthHeaders()
     });
     
     return response.json();
   }
 
-  async getOrder(orderId: number) {
+  async getOrder(orderId: string) {
     const response = await makeRequest(`${API_BASE_URL}/orders/${orderId}`, {
       headers: this.getAuthHeaders()
     });
@@ -188,6 +196,21 @@ class ApiService {
     return response.json();
   }
 
+  // Quotes
+  async getQuotes(lines: Array<{
+    product_id: string;
+    width: number;
+    height: number;
+    quantity: number;
+    options?: string[];
+  }>) {
+    const response = await makeRequest(`${API_BASE_URL}/quotes`, {
+      method: 'POST',
+      body: JSON.stringify({ lines })
+    });
+    return response.json();
+  }
+
   async createProduct(productData: any) {
     const response = await makeRequest(`${API_BASE_URL}/products`, {
       method: 'POST',
@@ -0,0 +1,75 @@
+import { useEffect, useState } from 'react';
+import { apiService } from '../services/api';
+
+const QUOTE_DEBOUNCE_MS = 300;
+
+// The server's default QUOTE_PRICE_STEP; its other rules default to none
+const PRICE_STEP = 0.01;
+
+// Round half up to the price step, as services/quotes.py does
+const roundPrice = (value: number): number =>
+  Math.round(Math.floor(value / PRICE_STEP + 0.5) * PRICE_STEP * 100) / 100;
+
+export interface Quote {
+  total: number;
+  // True until the server has answered for the current inputs
+  pending: boolean;
+}
+
+/**
+ * Server price for `quantity` pieces of a cut-glass product.
+ *
+ * Orders are re-priced on the server, so the customizer shows the server
+ * quote and should not add to the cart while it is `pending`. When it
+ * cannot be fetched (e.g. offline demo products), `fallback` (area x
+ * basePrice x quantity) is used instead, rounded like a quote under the
+ * server's default rules; deployments that set area steps, tiers or
+ * options are only matched by the server quote.
+ */
+export function useQuote(
+  productId: string,
+  width: number,
+  height: number,
+  quantity: number,
+  fallback: number
+): Quote {
+  const [quote, setQuote] = useState<{ key: string; total: number | null } | null>(null);
+  const key = `${productId}:${width}:${height}:${quantity}`;
+  const valid = width > 0 && height > 0 && quantity >= 1;
+
+  useEffect(() => {
+    if (!valid) {
+      return;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      let total: number | null = null;
+      try {
+        const response = await apiService.getQuotes([
+          { product_id: productId, width, height, quantity }
+        ]);
+        const line = response.quotes?.[0];
+        if (line && typeof line.line_total === 'number') {
+          total = line.line_total;
+        }
+      } catch (error) {
+        console.warn('Quote unavailable, using local price:', error);
+      }
+      if (!cancelled) {
+        setQuote({ key, total });
+      }
+    }, QUOTE_DEBOUNCE_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [key, valid, productId, width, height, quantity]);
+
+  const current = quote && quote.key === key ? quote : null;
+  return {
+    total: current?.total ?? roundPrice(fallback),
+    pending: valid && current === null
+  };
+}